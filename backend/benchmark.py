@@ -0,0 +1,306 @@
+"""
+Benchmarks for the ChainSleuth analysis pipeline.
+
+Each benchmark checks that the optimized path produces the same results as
+the reference implementation it replaced, then prints timings.
+
+Usage:
+    python benchmark.py wallet-aggregation|layering|wire-format|layout|all [--datasets darkpool_network.csv ...]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from ingest import map_columns, read_csv_header, iter_csv_chunks, WalletAggregator
+from graph_store import ProjectGraph
+from graph_core import CompactGraph
+from detectors import detect_layering_pattern
+from detector_registry import DETECTORS
+from layout import LAYOUT_EDGE_LENGTH, force_layout, undirected_pairs, _repulsion
+from paging import AnalysisTotals, transaction_json, wallet_json
+from scoring import ScoringConfig, detector_hits, score_features, wallet_features
+from wire import columnar_frames, decode_frames
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_chunks(dataset: str) -> list:
+    """Read a bundled dataset into normalized ingest chunks"""
+    path = dataset if os.path.isabs(dataset) else os.path.join(DATASET_DIR, dataset)
+    with open(path, "rb") as source:
+        column_mapping = map_columns(read_csv_header(source))
+        return list(iter_csv_chunks(source, column_mapping))
+
+
+def load_graph(dataset: str) -> CompactGraph:
+    """Read a bundled dataset into the compact graph the detectors consume"""
+    project_graph = ProjectGraph()
+    for chunk in load_chunks(dataset):
+        project_graph.add_chunk(chunk)
+    return CompactGraph.from_project_graph(project_graph)
+
+
+def timed(fn, *args, repeat: int = 3):
+    """Best-of-`repeat` wall-clock time of fn(*args), with its result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# ============================================================================
+# WALLET AGGREGATION
+# ============================================================================
+
+def reference_wallet_aggregation(chunks: list) -> dict:
+    """The original per-row `wallets_dict` loop from create_project"""
+    wallets_dict = {}
+    for chunk in chunks:
+        for from_wallet, to_wallet, amount in zip(chunk['from_wallet'], chunk['to_wallet'], chunk['amount']):
+            if from_wallet not in wallets_dict:
+                wallets_dict[from_wallet] = {'inflow': 0, 'outflow': 0, 'tx_count': 0}
+            if to_wallet not in wallets_dict:
+                wallets_dict[to_wallet] = {'inflow': 0, 'outflow': 0, 'tx_count': 0}
+
+            wallets_dict[from_wallet]['outflow'] += amount
+            wallets_dict[from_wallet]['tx_count'] += 1
+            wallets_dict[to_wallet]['inflow'] += amount
+            wallets_dict[to_wallet]['tx_count'] += 1
+    return wallets_dict
+
+
+def vectorized_wallet_aggregation(chunks: list) -> dict:
+    """Columnar aggregation via WalletAggregator"""
+    aggregator = WalletAggregator()
+    for chunk in chunks:
+        aggregator.add_chunk(chunk)
+    return aggregator.to_dict()
+
+
+def assert_same_wallet_stats(expected: dict, actual: dict):
+    """Wallet order, counts and (to float tolerance) flows must match"""
+    assert list(expected) == list(actual), "wallet sets/order differ"
+    for field in ('inflow', 'outflow'):
+        exp = np.array([stats[field] for stats in expected.values()], dtype=np.float64)
+        act = np.array([stats[field] for stats in actual.values()], dtype=np.float64)
+        assert np.allclose(exp, act, rtol=1e-9, atol=1e-9), f"{field} differs"
+    exp_counts = [stats['tx_count'] for stats in expected.values()]
+    act_counts = [stats['tx_count'] for stats in actual.values()]
+    assert exp_counts == act_counts, "tx_count differs"
+
+
+def bench_wallet_aggregation(datasets: list):
+    print("Wallet aggregation: per-row dict loop vs columnar bincount")
+    for dataset in datasets:
+        chunks = load_chunks(dataset)
+        rows = sum(len(chunk) for chunk in chunks)
+        ref_time, expected = timed(reference_wallet_aggregation, chunks)
+        vec_time, actual = timed(vectorized_wallet_aggregation, chunks)
+        assert_same_wallet_stats(expected, actual)
+        print(f"  {dataset}: {rows} rows, {len(actual)} wallets | "
+              f"dict {ref_time * 1000:.1f} ms, vectorized {vec_time * 1000:.1f} ms "
+              f"({ref_time / vec_time:.1f}x) ✓ identical")
+
+
+# ============================================================================
+# LAYERING
+# ============================================================================
+
+def reference_layering(graph: CompactGraph) -> dict:
+    """The original per-wallet depth-3 BFS of detect_layering_pattern"""
+    layering_wallets = {}
+    successors = graph.successor_lists()
+
+    def bfs_branching(start: int) -> int:
+        visited = {start}
+        frontier = [start]
+        max_branches = 1
+        intermediaries = set()
+        for _ in range(3):
+            next_frontier = []
+            for node in frontier:
+                neighbors = successors[node]
+                if len(neighbors) >= 2:
+                    max_branches = max(max_branches, len(neighbors))
+                    intermediaries.update(neighbors)
+                for neighbor in neighbors:
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return max_branches if len(intermediaries) >= 5 else 0
+
+    for wallet in range(graph.num_nodes):
+        branches = bfs_branching(wallet)
+        if branches >= 2:
+            layering_wallets[graph.wallets[wallet]] = branches
+    return layering_wallets
+
+
+def bench_layering(datasets: list):
+    print("Layering: per-wallet BFS vs batched sparse reachability")
+    for dataset in datasets:
+        graph = load_graph(dataset)
+        ref_time, expected = timed(reference_layering, graph)
+        vec_time, actual = timed(detect_layering_pattern, graph)
+        assert expected == actual, "layering results differ"
+        print(f"  {dataset}: {graph.num_nodes} wallets, {len(graph.succ)} pairs, {len(actual)} flagged | "
+              f"BFS {ref_time * 1000:.1f} ms, sparse {vec_time * 1000:.1f} ms "
+              f"({ref_time / vec_time:.1f}x) ✓ identical")
+
+
+# ============================================================================
+# WIRE FORMAT
+# ============================================================================
+
+def analysis_rows(dataset: str, page_size: int = 1000) -> tuple:
+    """Wallet and transaction pages of a dataset as the analysis endpoints return them"""
+    project_graph = ProjectGraph()
+    chunks = load_chunks(dataset)
+    for chunk in chunks:
+        project_graph.add_chunk(chunk)
+    graph = CompactGraph.from_project_graph(project_graph)
+    wallets_dict = project_graph.aggregator.to_dict()
+    codes = graph.codes(list(wallets_dict))
+    # Structural factors only; detector hits don't change the payload shape
+    state = {spec.key: {} for spec in DETECTORS}
+    risk = score_features(wallet_features(graph, codes, wallets_dict), detector_hits(graph, codes, state, DETECTORS),
+                          ScoringConfig.load(), DETECTORS)
+    rng = np.random.default_rng(0)
+
+    wallets = sorted((wallet_json({
+        "id": str(uuid.uuid4()),
+        "wallet_hash": wallet_hash,
+        "risk_score": score,
+        "risk_factors": factors,
+        "inflow": stats['inflow'],
+        "outflow": stats['outflow'],
+        "transaction_count": stats['tx_count'],
+        "position_x": rng.uniform(-300, 300),
+        "position_y": rng.uniform(-250, 250),
+    }) for (wallet_hash, stats), score, factors in zip(wallets_dict.items(), risk.scores.tolist(), risk.factor_rows())),
+        key=lambda w: w['hash'])
+    transactions = []
+    for chunk in chunks:
+        for record in chunk.to_dict('records'):
+            # Stored as timestamptz, which the database returns with an offset
+            record['timestamp'] = f"{record['timestamp']}+00:00" if record.get('timestamp') else None
+            transactions.append(transaction_json(dict(record, id=str(uuid.uuid4()))))
+    transactions.sort(key=lambda t: t['id'])
+
+    def pages(rows):
+        return [rows[start:start + page_size] for start in range(0, len(rows), page_size)]
+    return pages(wallets), pages(transactions)
+
+
+def json_document(wallet_pages: list, transaction_pages: list) -> bytes:
+    totals = AnalysisTotals()
+    wallets, transactions = [], []
+    for page in wallet_pages:
+        totals.add_wallets(page)
+        wallets.extend(page)
+    for page in transaction_pages:
+        totals.add_transactions(page)
+        transactions.extend(page)
+    return json.dumps({"name": "benchmark", "wallets": wallets, "transactions": transactions,
+                       "statistics": totals.statistics()}).encode()
+
+
+def bench_wire_format(datasets: list):
+    print("Analysis payload: JSON document vs columnar frames (size raw / gzip, Python decode)")
+    project = {"id": "benchmark", "name": "benchmark"}
+    for dataset in datasets:
+        wallet_pages, transaction_pages = analysis_rows(dataset)
+        document = json_document(wallet_pages, transaction_pages)
+        columnar = b"".join(columnar_frames(project, wallet_pages, transaction_pages))
+
+        json_time, decoded = timed(json.loads, document)
+        columnar_time, frames = timed(decode_frames, columnar)
+        edges = [frame for frame in frames if frame[0]['type'] == 'transactions']
+        assert sum(header['rows'] for header, _ in edges) == len(decoded['transactions']), "edge counts differ"
+        amounts = np.concatenate([columns['amount'] for _, columns in edges])
+        assert np.array_equal(amounts, [t['amount'] for t in decoded['transactions']]), "amounts differ"
+
+        wallets, transactions = len(decoded['wallets']), len(decoded['transactions'])
+        print(f"  {dataset}: {wallets} wallets, {transactions} transactions | "
+              f"JSON {len(document) / 1024:.0f} / {len(gzip.compress(document)) / 1024:.0f} KiB, "
+              f"{json_time * 1000:.1f} ms | "
+              f"columnar {len(columnar) / 1024:.0f} / {len(gzip.compress(columnar)) / 1024:.0f} KiB, "
+              f"{columnar_time * 1000:.1f} ms ({len(document) / len(columnar):.1f}x smaller) ✓ same edges")
+
+
+# ============================================================================
+# LAYOUT
+# ============================================================================
+
+def reference_repulsion(pos: np.ndarray, block: int = 1024) -> np.ndarray:
+    """Exact all-pairs repulsion (|f| = 1 / d), in blocks of rows"""
+    disp = np.zeros_like(pos)
+    for start in range(0, len(pos), block):
+        delta = pos[start:start + block, None, :] - pos[None, :, :]
+        distance2 = (delta ** 2).sum(axis=2)
+        distance2[distance2 == 0] = np.inf
+        disp[start:start + block] = (delta / distance2[..., None]).sum(axis=1)
+    return disp
+
+
+def bench_layout(datasets: list):
+    print("Layout: multilevel force-directed layout; grid repulsion vs exact all-pairs")
+    for dataset in datasets:
+        graph = load_graph(dataset)
+        layout_time, positions = timed(force_layout, graph, repeat=1)
+        pos = positions / LAYOUT_EDGE_LENGTH  # back to layout units (linked wallets ~1 apart)
+        ref_time, expected = timed(reference_repulsion, pos, repeat=1)
+
+        def grid_repulsion(pos):
+            disp = np.zeros_like(pos)
+            _repulsion(pos, disp)
+            return disp
+
+        grid_time, actual = timed(grid_repulsion, pos)
+        error = np.linalg.norm(actual - expected, axis=1) / np.linalg.norm(expected, axis=1)
+        assert np.median(error) < 0.05, "grid repulsion is too far from the exact forces"
+
+        u, v = undirected_pairs(graph)
+        rng = np.random.default_rng(0)
+        a, b = rng.integers(0, graph.num_nodes, (2, 10000))
+        linked = np.median(np.linalg.norm(positions[u] - positions[v], axis=1))
+        spread = np.median(np.linalg.norm(positions[a] - positions[b], axis=1))
+        print(f"  {dataset}: {graph.num_nodes} wallets, {len(u)} pairs | layout {layout_time:.2f} s, "
+              f"linked {linked:.0f} px vs random {spread:.0f} px apart | repulsion: all-pairs "
+              f"{ref_time * 1000:.1f} ms, grid {grid_time * 1000:.1f} ms "
+              f"({ref_time / grid_time:.1f}x) ✓ median error {np.median(error):.1%}")
+
+
+BENCHMARKS = {
+    "wallet-aggregation": (bench_wallet_aggregation, ["darkpool_network.csv", "high_volume_exchange.csv"]),
+    "layering": (bench_layering, ["darkpool_network.csv"]),
+    "wire-format": (bench_wire_format, ["darkpool_network.csv", "high_volume_exchange.csv"]),
+    "layout": (bench_layout, ["darkpool_network.csv", "high_volume_exchange.csv"]),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ChainSleuth pipeline benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--datasets", nargs="+", help="CSV files (default: bundled datasets)")
+    args = parser.parse_args(argv)
+
+    names = sorted(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    for name in names:
+        fn, default_datasets = BENCHMARKS[name]
+        fn(args.datasets or default_datasets)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Bounded cycle enumeration over the compact graph.
+
+Only strongly connected components can contain cycles, so the graph is split
+into SCCs first and every acyclic wallet is skipped outright. Inside an SCC
+wallet-pair cycles (used when an upload has no timestamps) are enumerated
+with an iterative, Johnson-style depth-first search:
+one on-path flag per wallet instead of copied path/visited sets, walks limited
+to the root's SCC, and a length barrier that prunes any step which can no
+longer close back to the root within the cycle-length cap.
+
+Temporal cycles follow individual transfers instead of wallet pairs: hop
+timestamps must strictly increase and the cycle must close within a time
+window of its first hop. Each wallet's transfers are time-sorted in the
+compact graph, so the admissible next hops from a wallet reached at time t
+are one binary-searched range (t, window end] of its out-edges. Roots are
+pre-filtered in bulk to transfers whose sender is paid back within the window.
+
+Enumeration stops when the per-project time budget runs out; counts found so
+far are kept and the result is marked truncated.
+"""
+
+import os
+import time
+from bisect import bisect_right
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from graph_core import CompactGraph, NAT
+
+MIN_CYCLE_LENGTH = 3
+MAX_CYCLE_LENGTH = 7
+# Seconds of cycle search allowed per project analysis (0 = unbounded)
+CYCLE_TIME_BUDGET_SECONDS = float(os.getenv("CYCLE_TIME_BUDGET_SECONDS", "60"))
+
+
+def strongly_connected_components(graph: CompactGraph) -> tuple:
+    """(number of SCCs, SCC label per wallet)"""
+    adjacency = csr_matrix(
+        (np.ones(len(graph.succ), dtype=np.int8), graph.succ, graph.succ_ptr),
+        shape=(graph.num_nodes, graph.num_nodes),
+    )
+    return connected_components(adjacency, directed=True, connection='strong')
+
+
+class CycleSearch:
+    """Bounded wallet-pair and temporal cycle counting within SCCs"""
+
+    def __init__(self, graph: CompactGraph, max_length: int = MAX_CYCLE_LENGTH,
+                 time_budget_seconds: float = CYCLE_TIME_BUDGET_SECONDS):
+        self.graph = graph
+        self.max_length = max_length
+        self.deadline = time.perf_counter() + time_budget_seconds if time_budget_seconds > 0 else None
+        self.truncated = False
+        self.num_sccs, self.labels = strongly_connected_components(graph)
+        self.scc_sizes = np.bincount(self.labels, minlength=self.num_sccs)
+
+        # Wallet-pair adjacency lists, built on the first static search
+        self._succ = None
+        self._pred = None
+        # Time-sorted SCC-internal transfers per wallet, materialized on first visit
+        self._transfers = {}
+
+    def cyclic(self) -> np.ndarray:
+        """Mask of wallets inside a non-trivial SCC"""
+        return self.scc_sizes[self.labels] >= MIN_CYCLE_LENGTH
+
+    def _build_adjacency(self):
+        # Drop every pair that leaves its SCC: no cycle can use it
+        graph = self.graph
+        src = graph.succ_src
+        internal = self.labels[src] == self.labels[graph.succ]
+        self._succ = [[] for _ in range(graph.num_nodes)]
+        self._pred = [[] for _ in range(graph.num_nodes)]
+        for u, v in zip(src[internal].tolist(), graph.succ[internal].tolist()):
+            self._succ[u].append(v)
+            self._pred[v].append(u)
+
+    def _distances_to(self, root: int) -> dict:
+        """Hops from wallets back to `root`, for those within the length cap (reverse BFS)"""
+        dist = {root: 0}
+        frontier = [root]
+        for hops in range(1, self.max_length):
+            next_frontier = []
+            for node in frontier:
+                for prev in self._pred[node]:
+                    if prev not in dist:
+                        dist[prev] = hops
+                        next_frontier.append(prev)
+            frontier = next_frontier
+        return dist
+
+    def count_through(self, root: int, accept=None) -> tuple:
+        """Count simple cycles of MIN..max_length wallets through `root`.
+
+        `accept(path)` may reject a closed cycle (e.g. a time constraint).
+        Returns (cycle count, codes of every wallet on a counted cycle).
+        """
+        if self._succ is None:
+            self._build_adjacency()
+        succ = self._succ
+        # A step to `neighbor` at depth d can still close iff d + 1 + dist <= cap
+        dist = self._distances_to(root)
+        budget = self.max_length - 1
+
+        count = 0
+        members = set()
+        on_path = {root}
+        path = [root]
+        iters = [iter(succ[root])]
+        found = [False]
+        steps = 0
+        while iters:
+            depth = len(path) - 1
+            for neighbor in iters[-1]:
+                if neighbor == root:
+                    if depth + 1 >= MIN_CYCLE_LENGTH and (accept is None or accept(path)):
+                        count += 1
+                        found[-1] = True
+                elif neighbor not in on_path and depth + dist.get(neighbor, self.max_length) <= budget:
+                    path.append(neighbor)
+                    on_path.add(neighbor)
+                    iters.append(iter(succ[neighbor]))
+                    found.append(False)
+                    break
+            else:
+                node = path.pop()
+                iters.pop()
+                on_path.discard(node)
+                if found.pop():
+                    members.add(node)
+                    if found:
+                        found[-1] = True
+
+            steps += 1
+            if self.deadline is not None and steps % 4096 == 0 and time.perf_counter() > self.deadline:
+                self.truncated = True
+                break
+
+        return count, members
+
+    def _timed_transfers(self, node: int) -> tuple:
+        """(receivers, timestamps) of a wallet's timestamped SCC-internal transfers, by time"""
+        cached = self._transfers.get(node)
+        if cached is None:
+            graph = self.graph
+            lo, hi = graph.out_ptr[node], graph.out_ptr[node + 1]
+            receivers = graph.out_nbr[lo:hi]
+            timestamps = graph.out_timestamp[lo:hi]
+            keep = (self.labels[receivers] == self.labels[node]) & (timestamps != NAT)
+            cached = (receivers[keep].tolist(), timestamps[keep].tolist())
+            self._transfers[node] = cached
+        return cached
+
+    def opening_transfers(self, window_ns: int) -> np.ndarray:
+        """Mask over out-edges that could open a temporal cycle.
+
+        A transfer from v at time t qualifies only if it stays in v's SCC and
+        v receives an SCC-internal transfer in (t, t + window]. Checked for
+        all edges at once by packing (wallet, second) into one int64 key:
+        in-edges are sorted by (receiver, time), so their keys are sorted,
+        and the out-edge windows are sorted too, which keeps the binary
+        searches cache-friendly. Whole seconds make this a superset filter;
+        the exact bounds are applied during the search.
+        """
+        graph = self.graph
+        labels = self.labels
+        out_src = graph.out_src
+        out_ok = ((graph.out_timestamp != NAT) & (labels[out_src] == labels[graph.out_nbr])
+                  & (out_src != graph.out_nbr))
+        in_dst = np.repeat(np.arange(graph.num_nodes, dtype=np.int64), np.diff(graph.in_ptr))
+        in_ok = (graph.in_timestamp != NAT) & (labels[in_dst] == labels[graph.in_nbr])
+        if not out_ok.any() or not in_ok.any():
+            return np.zeros(graph.num_edges, dtype=bool)
+
+        in_times = graph.in_timestamp[in_ok]
+        out_times = graph.out_timestamp[out_ok]
+        origin = min(in_times.min(), out_times.min())
+        span = (max(in_times.max(), out_times.max()) - origin + window_ns) // 10 ** 9 + 2
+        if span * graph.num_nodes >= np.iinfo(np.int64).max:
+            return out_ok  # keys would overflow; search every candidate
+
+        in_keys = in_dst[in_ok] * span + (in_times - origin) // 10 ** 9
+        senders = out_src[out_ok].astype(np.int64) * span
+        window_lo = senders + (out_times - origin) // 10 ** 9
+        window_hi = senders + (out_times + window_ns - origin) // 10 ** 9
+        returns = np.searchsorted(in_keys, window_lo, 'left') < np.searchsorted(in_keys, window_hi, 'right')
+
+        opening = np.zeros(graph.num_edges, dtype=bool)
+        opening[np.flatnonzero(out_ok)[returns]] = True
+        return opening
+
+    def count_temporal(self, window_ns: int) -> dict:
+        """Count time-respecting cycles of MIN..max_length wallets per origin wallet.
+
+        Hop timestamps strictly increase and the closing hop lands at most
+        `window_ns` after the first one. A temporal cycle is counted once, at
+        the wallet whose transfer starts it. Returns {origin code: count}.
+        """
+        graph = self.graph
+        opening = np.flatnonzero(self.opening_transfers(window_ns))
+        roots = graph.out_src[opening]
+        bounds = np.flatnonzero(np.diff(roots)) + 1
+        counts = {}
+        for root, edges in zip(roots[np.r_[0, bounds]].tolist(), np.split(opening, bounds)) if len(opening) else []:
+            count = self._count_temporal_from(root, graph.out_nbr[edges].tolist(),
+                                              graph.out_timestamp[edges].tolist(), window_ns)
+            if count:
+                counts[root] = count
+            if self.out_of_time():
+                break
+        return counts
+
+    def _count_temporal_from(self, root: int, first_receivers: list, first_times: list, window_ns: int) -> int:
+        # The time window is the main bound here: a static distance barrier
+        # would cost a 6-hop reverse BFS per root, more than the search itself
+        count = 0
+        steps = 0
+        for first_receiver, start in zip(first_receivers, first_times):
+            window_end = start + window_ns
+            receivers, times = self._timed_transfers(first_receiver)
+            # One frame per wallet after the root: [receivers, times, next candidate, end of candidates]
+            frames = [[receivers, times, bisect_right(times, start), bisect_right(times, window_end)]]
+            path = [root, first_receiver]
+            on_path = {root, first_receiver}
+            while frames:
+                frame = frames[-1]
+                receivers, times, k, end = frame
+                depth = len(path) - 1
+                pushed = False
+                while k < end:
+                    neighbor = receivers[k]
+                    k += 1
+                    if neighbor == root:
+                        if depth + 1 >= MIN_CYCLE_LENGTH:
+                            count += 1
+                    elif neighbor not in on_path and depth + 2 <= self.max_length:
+                        frame[2] = k
+                        next_receivers, next_times = self._timed_transfers(neighbor)
+                        frames.append([next_receivers, next_times, bisect_right(next_times, times[k - 1]),
+                                       bisect_right(next_times, window_end)])
+                        path.append(neighbor)
+                        on_path.add(neighbor)
+                        pushed = True
+                        break
+                if not pushed:
+                    frames.pop()
+                    on_path.discard(path.pop())
+
+                steps += 1
+                if self.deadline is not None and steps % 4096 == 0 and time.perf_counter() > self.deadline:
+                    self.truncated = True
+                    break
+            if self.truncated:
+                break
+
+        return count
+
+    def out_of_time(self) -> bool:
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.truncated = True
+        return self.truncated
@@ -0,0 +1,173 @@
+"""
+Content-addressed cache of analysis results.
+
+Uploads are keyed by the SHA-256 of their bytes. The graph, detector outputs
+and risk scores computed for an upload are stored under that hash, so
+creating another project from identical data only pays for persistence.
+
+Keys also carry a fingerprint of the analysis code (ingest, detector,
+layout and scoring modules, plus ANALYSIS_CACHE_VERSION), so changing
+detectors or weights invalidates every older entry. The cache is bounded in bytes and evicts the
+least recently used entries first.
+
+Usage:
+    python dataset_cache.py stats|clear
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from typing import Optional
+
+# Entries are pickles, so the directory must be private to this user: the
+# default lives under the user's cache home, not the shared temp directory
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "chainsleuth", "analyses"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+ANALYSIS_CACHE_VERSION = os.getenv("ANALYSIS_CACHE_VERSION", "1")
+
+# Modules and config files whose contents determine analysis results
+FINGERPRINT_MODULES = ["cycles.py", "detector_registry.py", "detectors.py", "exposure.py", "graph_core.py",
+                       "ingest.py", "layout.py", "patterns.py", "pipeline.py", "scoring.py", "taint.py", "timeline.py",
+                       os.getenv("RISK_WEIGHTS_PATH", "risk_weights.json")]
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def content_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def analysis_fingerprint() -> str:
+    """Fingerprint of the detector/scoring code and the cache version"""
+    digest = hashlib.sha256(ANALYSIS_CACHE_VERSION.encode())
+    # Plugin detectors change results too; bump ANALYSIS_CACHE_VERSION when their code changes
+    digest.update(os.getenv("DETECTOR_PLUGINS", "").encode())
+    for module in FINGERPRINT_MODULES:
+        with open(os.path.join(_BACKEND_DIR, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def private_directory(path: str) -> str:
+    """Create `path` with mode 0700 if needed, refusing one that another user
+    owns or that others can read or write (a planted pickle runs code on load)"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.stat(path)
+    if stat.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {path} is owned by uid {stat.st_uid}, not {os.getuid()}")
+    if stat.st_mode & 0o077:
+        raise PermissionError(f"Cache directory {path} is accessible to other users (mode {stat.st_mode & 0o777:o}), "
+                              f"expected 700")
+    return path
+
+
+class AnalysisCache:
+    """Byte-bounded LRU of pickled analysis results on local disk"""
+
+    def __init__(self, directory: str = ANALYSIS_CACHE_DIR, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = analysis_fingerprint()
+        self._lock = threading.Lock()
+        private_directory(directory)
+        self.prune_stale()
+
+    def key(self, upload_hash: str) -> str:
+        return f"{upload_hash}-{self.fingerprint}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _entries(self) -> list:
+        """(path, size, last access) of every entry, oldest first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def get(self, upload_hash: str) -> Optional[dict]:
+        path = self._path(self.key(upload_hash))
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                print(f"⚠️ Dropping unreadable cache entry {path}: {e}")
+                os.remove(path)
+                return None
+            os.utime(path)  # mark as recently used
+        return value
+
+    def put(self, upload_hash: str, value: dict):
+        path = self._path(self.key(upload_hash))
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            print(f"⚠️ Analysis for {upload_hash[:12]} ({len(data)} bytes) exceeds the cache size, not cached")
+            return
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            print(f"  Evicted cached analysis {os.path.basename(path)}")
+
+    def prune_stale(self) -> int:
+        """Remove entries computed by a different version of the analysis code"""
+        removed = 0
+        with self._lock:
+            for path, _, _ in self._entries():
+                if not path.endswith(f"-{self.fingerprint}.pkl"):
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            entries = self._entries()
+            for path, _, _ in entries:
+                os.remove(path)
+        return len(entries)
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "maxBytes": self.max_bytes,
+            "fingerprint": self.fingerprint,
+        }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = AnalysisCache()
+    if command == "clear":
+        print(f"Removed {cache.clear()} cached analyses")
+    else:
+        print(cache.stats())
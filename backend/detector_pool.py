@@ -0,0 +1,168 @@
+"""
+Concurrent detector execution.
+
+Detector stages are independent reads of the same graph, so on large graphs
+they run side by side in a process pool. The graph is not pickled per worker:
+its arrays are written once per run as .npy files (under /dev/shm when
+available) and every worker memory-maps them read-only, so all processes
+share one copy through the page cache. Results come back per stage and are
+merged into the job state in registry order, whatever order the
+workers finish in.
+
+Which detectors run, and in what order, comes from the detector registry.
+Before a detector is scheduled its cost on this graph is estimated; one over
+its time or memory budget runs its approximation, or is skipped with an empty
+result, so a huge graph never stalls the whole analysis on one detector.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from graph_core import CompactGraph
+from detector_registry import DETECTORS, get_detector
+
+# Worker processes for detector stages (<= 1 runs them in-process, one by one)
+DETECTOR_WORKERS = int(os.getenv("DETECTOR_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Graphs smaller than this run in-process: a pool round-trip would cost more
+DETECTOR_POOL_MIN_EDGES = int(os.getenv("DETECTOR_POOL_MIN_EDGES", "200000"))
+DETECTOR_SHARED_DIR = os.getenv("DETECTOR_SHARED_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the API process runs threads (jobs, persistence)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=DETECTOR_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def timed_detector(stage_name: str, state, approximate: bool = False) -> tuple:
+    """(detector output, wall-clock seconds)"""
+    started = time.perf_counter()
+    result = get_detector(stage_name).call(state, approximate)
+    return result, time.perf_counter() - started
+
+
+# ----------------------------------------------------------------------
+# Shared inputs
+# ----------------------------------------------------------------------
+
+def export_inputs(state: dict, directory: str):
+    """Write the detector inputs in `state` as .npy files a worker can memory-map"""
+    graph = state['compact_graph']
+    os.makedirs(directory)
+    for name, array in graph.to_arrays().items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    # Wallet stats as arrays aligned to graph codes
+    wallets_dict = state['wallets_dict']
+    codes = graph.codes(list(wallets_dict))
+    stats = np.zeros((3, graph.num_nodes))
+    for code, wallet_stats in zip(codes.tolist(), wallets_dict.values()):
+        stats[:, code] = (wallet_stats['inflow'], wallet_stats['outflow'], wallet_stats['tx_count'])
+    np.save(os.path.join(directory, "wallet_stats.npy"), stats)
+
+
+class SharedInputs:
+    """Detector inputs rebuilt in a worker from memory-mapped arrays (read-only)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._values = {}
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+
+    def __getitem__(self, key: str):
+        if key not in self._values:
+            if key == 'compact_graph':
+                names = [name[:-4] for name in os.listdir(self.directory) if name != "wallet_stats.npy"]
+                self._values[key] = CompactGraph.from_arrays({name: self._load(name) for name in names})
+            elif key == 'wallets_dict':
+                wallets = self['compact_graph'].wallets
+                inflow, outflow, tx_count = self._load("wallet_stats")
+                self._values[key] = {
+                    wallet: {'inflow': i, 'outflow': o, 'tx_count': int(c)}
+                    for wallet, i, o, c in zip(wallets, inflow.tolist(), outflow.tolist(), tx_count.tolist())
+                }
+            else:
+                raise KeyError(key)
+        return self._values[key]
+
+
+def _run_in_worker(directory: str, stage_name: str, approximate: bool) -> tuple:
+    # Mappings are dropped with the inputs when the stage returns, so an idle
+    # worker never pins a finished run's files
+    return timed_detector(stage_name, SharedInputs(directory), approximate)
+
+
+# ----------------------------------------------------------------------
+# Scheduling
+# ----------------------------------------------------------------------
+
+def _stage_detail(spec, result, seconds: float, approximate: bool, reason) -> dict:
+    detail = {"flagged": len(result), "seconds": round(seconds, 3)}
+    if approximate:
+        detail.update(approximate=True, reason=reason)
+    if seconds > spec.time_budget_seconds:
+        detail["overBudget"] = True
+        print(f"    ⚠️ {spec.name} took {seconds:.1f}s, over its {spec.time_budget_seconds:g}s budget")
+    return detail
+
+
+def run_detector_stages(job, state: dict, detectors: list = DETECTORS):
+    """Run detector stages (concurrently on large graphs) and merge their outputs into `state`"""
+    graph = state['compact_graph']
+    pending = []
+    for spec in detectors:
+        if job.stages[spec.name]["status"] == "completed":
+            continue
+        action, reason = spec.plan(graph)
+        if action == 'skip':
+            print(f"    ⏭️ Skipping {spec.name}: {reason}")
+            state[spec.key] = {}
+            job.skip_stage(spec.name, {"flagged": 0, "skipped": True, "reason": reason})
+            continue
+        if action == 'approximate':
+            print(f"    ≈ Approximating {spec.name}: {reason}")
+        pending.append((spec, action == 'approximate', reason))
+
+    if DETECTOR_WORKERS <= 1 or len(pending) <= 1 or graph.num_edges < DETECTOR_POOL_MIN_EDGES:
+        for spec, approximate, reason in pending:
+            def run_detector(spec=spec, approximate=approximate, reason=reason):
+                state[spec.key], seconds = timed_detector(spec.name, state, approximate)
+                return _stage_detail(spec, state[spec.key], seconds, approximate, reason)
+            job.run_stage(spec.name, run_detector)
+        return
+
+    directory = os.path.join(DETECTOR_SHARED_DIR, f"chainsleuth-detect-{uuid.uuid4().hex}")
+    futures = {}
+    try:
+        export_inputs(state, directory)
+        pool = _get_pool()
+        for spec, approximate, _ in pending:
+            futures[spec.name] = pool.submit(_run_in_worker, directory, spec.name, approximate)
+        print(f"  Running {len(pending)} detectors on {DETECTOR_WORKERS} worker processes")
+        # Merge in stage order, whatever order the workers finish in
+        for spec, approximate, reason in pending:
+            def collect(spec=spec, approximate=approximate, reason=reason):
+                state[spec.key], seconds = futures[spec.name].result()
+                return _stage_detail(spec, state[spec.key], seconds, approximate, reason)
+            job.run_stage(spec.name, collect)
+    finally:
+        for future in futures.values():
+            future.cancel()
+        shutil.rmtree(directory, ignore_errors=True)
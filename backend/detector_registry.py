@@ -0,0 +1,168 @@
+"""
+Detector registry.
+
+Every detector is registered once with what it reads, what it returns, the
+risk points a flag is worth and a time/memory budget. The pipeline builds its
+detector stages, worker dispatch and pattern scoring from this table, so a
+new detector only needs a register() call, built in below or in a plugin
+module named in DETECTOR_PLUGINS (comma-separated importable modules, loaded
+at startup).
+
+Budgets are checked before a detector runs, against a cost estimate from the
+graph size and the detector's declared per-edge rates: a detector that would
+exceed them runs its declared approximation instead, or is skipped.
+"""
+
+import importlib
+import os
+
+from detectors import (
+    detect_circular_transactions,
+    detect_layering_pattern,
+    detect_structuring_pattern,
+    detect_rapid_inout_pattern,
+    detect_dormant_activation,
+    detect_mixer_interaction,
+    detect_mixer_taint,
+    detect_peel_chain,
+)
+from cycles import CYCLE_TIME_BUDGET_SECONDS
+
+# Inputs a detector may declare (all are shared with pool workers)
+DETECTOR_INPUTS = ('compact_graph', 'wallets_dict')
+# Output types: {wallet hash: detail} for the flagged wallets
+WALLET_FLAGS = 'wallet_flags'
+DETECTOR_OUTPUTS = (WALLET_FLAGS,)
+
+DEFAULT_TIME_BUDGET_SECONDS = float(os.getenv("DETECTOR_TIME_BUDGET_SECONDS", "120"))
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv("DETECTOR_MEMORY_BUDGET_MB", "4096"))
+DETECTOR_PLUGINS = os.getenv("DETECTOR_PLUGINS", "")
+
+
+class DetectorSpec:
+    """A registered detector: how to call it, what it is worth, what it may cost"""
+
+    def __init__(self, name: str, key: str, run, inputs: tuple = ('compact_graph',),
+                 output: str = WALLET_FLAGS, weight: int = 0, description: str = "",
+                 time_budget_seconds: float = DEFAULT_TIME_BUDGET_SECONDS,
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                 seconds_per_edge: float = 0.0, bytes_per_edge: float = 0.0, approximate=None,
+                 project_wide: bool = False):
+        self.name = name  # Pipeline stage name
+        self.key = key  # Job state key the output is stored under
+        self.run = run  # run(*inputs) -> output
+        self.inputs = tuple(inputs)
+        self.output = output
+        self.weight = weight  # Risk points per flagged wallet, unless risk_weights.json sets them
+        self.description = description
+        self.time_budget_seconds = time_budget_seconds
+        self.memory_budget_mb = memory_budget_mb
+        # Rough cost model on a single core, used to plan before running
+        self.seconds_per_edge = seconds_per_edge
+        self.bytes_per_edge = bytes_per_edge
+        # approximate(*inputs) -> output, cheaper stand-in for huge graphs
+        self.approximate = approximate
+        # A wallet's result can depend on wallets any number of hops away, so
+        # appends run it on the whole project graph, not the neighbourhood
+        self.project_wide = project_wide
+
+    def estimate(self, graph) -> tuple:
+        """(estimated seconds, estimated peak MB) on `graph`"""
+        edges = max(graph.num_edges, graph.num_nodes)
+        return edges * self.seconds_per_edge, edges * self.bytes_per_edge / 2 ** 20
+
+    def plan(self, graph) -> tuple:
+        """('run' | 'approximate' | 'skip', reason) for this detector on `graph`"""
+        seconds, megabytes = self.estimate(graph)
+        over = []
+        if seconds > self.time_budget_seconds:
+            over.append(f"~{seconds:.1f}s > {self.time_budget_seconds:g}s budget")
+        if megabytes > self.memory_budget_mb:
+            over.append(f"~{megabytes:.0f}MB > {self.memory_budget_mb:g}MB budget")
+        if not over:
+            return 'run', None
+        return ('approximate' if self.approximate else 'skip'), ", ".join(over)
+
+    def call(self, state, approximate: bool = False):
+        fn = self.approximate if approximate else self.run
+        return fn(*[state[name] for name in self.inputs])
+
+
+DETECTORS = []
+_by_name = {}
+
+
+def register(spec: DetectorSpec) -> DetectorSpec:
+    """Add a detector to the registry (stages run in registration order)"""
+    if spec.name in _by_name:
+        raise ValueError(f"Detector '{spec.name}' is already registered")
+    if any(name not in DETECTOR_INPUTS for name in spec.inputs):
+        raise ValueError(f"Detector '{spec.name}' declares unknown inputs; expected some of {DETECTOR_INPUTS}")
+    if spec.output not in DETECTOR_OUTPUTS:
+        raise ValueError(f"Detector '{spec.name}' declares unknown output type '{spec.output}'")
+    DETECTORS.append(spec)
+    _by_name[spec.name] = spec
+    return spec
+
+
+def get_detector(name: str) -> DetectorSpec:
+    return _by_name[name]
+
+
+def load_plugins(modules: str = DETECTOR_PLUGINS):
+    """Import plugin modules; each registers its detectors on import"""
+    for module in filter(None, (name.strip() for name in modules.split(","))):
+        importlib.import_module(module)
+        print(f"🔌 Loaded detector plugin {module}")
+
+
+# ============================================================================
+# BUILT-IN DETECTORS
+# ============================================================================
+
+register(DetectorSpec(
+    'detect_circular', 'circular_txs', detect_circular_transactions, weight=35,
+    description="Value moves in cycles back to origin",
+    # The cycle search enforces its own budget; past the estimate it runs
+    # with a shorter one and reports lower-bound counts
+    time_budget_seconds=CYCLE_TIME_BUDGET_SECONDS or DEFAULT_TIME_BUDGET_SECONDS,
+    seconds_per_edge=2e-6, bytes_per_edge=120,
+    approximate=lambda graph: detect_circular_transactions(graph, time_budget_seconds=max(1.0, CYCLE_TIME_BUDGET_SECONDS / 4)),
+))
+register(DetectorSpec(
+    'detect_layering', 'layering', detect_layering_pattern, weight=30,
+    description="Funds split through multiple intermediaries",
+    seconds_per_edge=4e-6, bytes_per_edge=150,
+))
+register(DetectorSpec(
+    'detect_structuring', 'structuring', detect_structuring_pattern, inputs=('compact_graph', 'wallets_dict'),
+    weight=32, description="Many small transfers to avoid thresholds",
+    seconds_per_edge=5e-7, bytes_per_edge=60,
+))
+register(DetectorSpec(
+    'detect_passthrough', 'passthrough', detect_rapid_inout_pattern, inputs=('compact_graph', 'wallets_dict'),
+    weight=28, description="≥90% of inflow passed on, short median holding time",
+    seconds_per_edge=2.5e-6, bytes_per_edge=250,
+))
+register(DetectorSpec(
+    'detect_dormant', 'dormant_activation', detect_dormant_activation, weight=25,
+    description="Sudden activity after dormancy",
+    seconds_per_edge=2e-6, bytes_per_edge=200,
+))
+register(DetectorSpec(
+    'detect_mixer', 'mixer_interaction', detect_mixer_interaction, weight=40,
+    description="Interaction with known mixing services",
+    seconds_per_edge=2e-7, bytes_per_edge=80,
+))
+register(DetectorSpec(
+    'detect_peel_chain', 'peel_chains', detect_peel_chain, weight=27,
+    description="Long linear chains with gradual peeling",
+    seconds_per_edge=5e-8, bytes_per_edge=40,
+))
+register(DetectorSpec(
+    'detect_taint', 'mixer_taint', detect_mixer_taint, weight=30,
+    description="≥10% of inflow traced to mixers in time order",
+    seconds_per_edge=1e-6, bytes_per_edge=200, project_wide=True,
+))
+
+load_plugins()
@@ -0,0 +1,314 @@
+"""
+AML pattern detectors.
+
+Graph detectors take the interned CompactGraph (see graph_core.py) and the
+stats detectors take per-wallet stats built at ingest; each returns a mapping
+of flagged wallet hash -> detector-specific value.
+"""
+
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from graph_core import CompactGraph, NAT, ns_to_iso
+from cycles import CycleSearch, CYCLE_TIME_BUDGET_SECONDS
+from timeline import WalletTimeline, fifo_holding_times
+from exposure import ExposureIndex, EXPOSURE_MAX_HOPS
+from taint import propagate_taint, TAINT_MODEL
+
+# Start wallets per sparse-product batch in layering detection
+LAYERING_BATCH_ROWS = int(os.getenv("LAYERING_BATCH_ROWS", "4096"))
+# Share of a wallet's flow traced to mixers that flags it beyond direct contact
+MIXER_MIN_EXPOSURE = float(os.getenv("MIXER_MIN_EXPOSURE", "0.1"))
+# Share of a wallet's inflow traced (in time order) to mixers that flags it
+MIXER_MIN_TAINT = float(os.getenv("MIXER_MIN_TAINT", "0.1"))
+# Transfers below this amount count towards structuring
+STRUCTURING_SMALL_TX = 10000
+
+KNOWN_MIXERS = [
+    # Common mixer patterns - in production, maintain active list
+    '0x0000000000000000000000000000000000000000',  # Zero address
+    '0xdeaddeaddeaddeaddeaddeaddeaddeaddead',  # Common test mixer
+]
+
+# ============================================================================
+# ADVANCED PATTERN DETECTION FUNCTIONS
+# ============================================================================
+
+def detect_circular_transactions(graph: CompactGraph, time_tolerance_hours: int = 24,
+                                 time_budget_seconds: float = CYCLE_TIME_BUDGET_SECONDS) -> dict:
+    """Detect circular transactions (funds returning to origin within time window)"""
+    circular_wallets = {}
+    search = CycleSearch(graph, time_budget_seconds=time_budget_seconds)
+    cyclic = search.cyclic()
+
+    if (graph.out_timestamp != NAT).any():
+        # Time-respecting cycles, counted at the wallet the funds left first
+        circular_wallets = search.count_temporal(time_tolerance_hours * 3600 * 10 ** 9)
+        kind = "origin wallets"
+    else:
+        # No timestamp data: count wallet-pair cycles through each cluster's
+        # first wallet; wallets on a counted cycle are not searched again
+        processed = ~cyclic
+        for wallet in np.flatnonzero(cyclic).tolist():
+            if processed[wallet]:
+                continue
+            count, members = search.count_through(wallet)
+            if count:
+                processed[list(members)] = True
+                circular_wallets[wallet] = count
+            if search.out_of_time():
+                break
+        kind = "wallet clusters"
+
+    print(f"    Found {len(circular_wallets)} {kind} with {sum(circular_wallets.values())} total cycles "
+          f"({int(cyclic.sum())} of {graph.num_nodes} wallets in cyclic SCCs)")
+    if search.truncated:
+        print(f"    ⚠️ Cycle search stopped after its {time_budget_seconds:g}s budget; counts are lower bounds")
+    return graph.to_hashes(circular_wallets)
+
+def detect_layering_pattern(graph: CompactGraph, batch_rows: int = LAYERING_BATCH_ROWS) -> dict:
+    """Detect layering (funds split through multiple intermediaries)"""
+    # Per start wallet, over everything within 2 hops (the wallets a depth-3
+    # BFS expands): the widest fan-out and the distinct receivers of all
+    # fan-outs (intermediaries). Computed for all wallets at once with
+    # boolean sparse products, `batch_rows` start wallets at a time.
+    num_nodes = graph.num_nodes
+    out_degree = graph.out_degree
+    branching = out_degree >= 2
+
+    adjacency = csr_matrix(
+        (np.ones(len(graph.succ), dtype=np.float32), graph.succ, graph.succ_ptr), shape=(num_nodes, num_nodes)
+    )
+    fan_outs = csr_matrix(adjacency.multiply(branching[:, None]))
+    branches = np.where(branching, out_degree, 0).astype(np.float32)
+
+    max_branches = np.ones(num_nodes, dtype=np.int64)
+    intermediaries = np.zeros(num_nodes, dtype=np.int64)
+    for start in range(0, num_nodes, batch_rows):
+        rows = np.arange(start, min(start + batch_rows, num_nodes))
+        frontier = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows - start, rows)),
+                              shape=(len(rows), num_nodes))
+        reach = frontier
+        for _ in range(2):
+            frontier = _as_boolean(frontier @ adjacency)
+            reach = _as_boolean(reach + frontier)
+        widest = reach.multiply(branches[None, :]).max(axis=1).toarray().ravel()
+        max_branches[rows] = np.maximum(widest, 1)
+        intermediaries[rows] = (reach @ fan_outs).getnnz(axis=1)
+
+    flagged = (intermediaries >= 5) & (max_branches >= 2)
+    return {graph.wallets[code]: int(max_branches[code]) for code in np.flatnonzero(flagged).tolist()}
+
+
+def _as_boolean(matrix) -> csr_matrix:
+    """0/1 pattern of a non-negative sparse product (path counts are not needed)"""
+    matrix = csr_matrix(matrix)
+    matrix.data[:] = 1
+    return matrix
+
+def detect_structuring_pattern(graph: CompactGraph, wallets_dict: dict, small_tx_threshold: float = STRUCTURING_SMALL_TX,
+                               time_window_hours: int = 1, min_transfers: int = 10) -> dict:
+    """Detect structuring/smurfing (bursts of small txs to avoid thresholds)"""
+    structuring_wallets = {}
+
+    # Small outgoing transfers, still sorted by (sender, time)
+    small = graph.out_amount < small_tx_threshold
+    senders = graph.out_src[small]
+    timestamps = graph.out_timestamp[small]
+    amounts = graph.out_amount[small]
+    timed = timestamps != NAT
+
+    if timed.any():
+        senders, timestamps, amounts = senders[timed], timestamps[timed], amounts[timed]
+        # Slide a window [t_i, t_i + window] from every transfer i. Timestamps are
+        # ranked globally so (sender, rank) packs into one sorted key and every
+        # window end is a single binary search.
+        sorted_times = np.sort(timestamps)
+        stride = len(sorted_times) + 1
+        keys = senders.astype(np.int64) * stride + np.searchsorted(sorted_times, timestamps, 'left')
+        window_ns = time_window_hours * 3600 * 10 ** 9
+        end_keys = senders.astype(np.int64) * stride + np.searchsorted(sorted_times, timestamps + window_ns, 'right')
+        starts = np.arange(len(keys))
+        ends = np.searchsorted(keys, end_keys, 'left')
+    else:
+        # No timestamp data: the whole upload is one window per sender
+        new_sender = np.r_[True, np.diff(senders) != 0] if len(senders) else np.zeros(0, dtype=bool)
+        group = np.cumsum(new_sender) - 1
+        bounds = np.r_[np.flatnonzero(new_sender), len(senders)]
+        starts, ends = bounds[:-1][group], bounds[1:][group]
+    counts = ends - starts
+
+    # Busiest window per sender
+    order = np.lexsort((-counts, senders))
+    first = order[np.r_[True, np.diff(senders[order]) != 0]] if len(order) else order
+    burst = first[counts[first] >= min_transfers]
+
+    volume = np.r_[0.0, np.cumsum(amounts)]
+    window_starts = ns_to_iso(timestamps[starts[burst]])
+    window_ends = ns_to_iso(timestamps[ends[burst] - 1])
+    for i, window_start, window_end in zip(burst.tolist(), window_starts, window_ends):
+        wallet = graph.wallets[senders[i]]
+        # Flag if ≥10 small transfers inside one window, with high total volume
+        if wallets_dict[wallet]['outflow'] > 100000:
+            structuring_wallets[wallet] = {
+                "transfers": int(counts[i]),
+                "amount": float(volume[ends[i]] - volume[starts[i]]),
+                "windowStart": window_start,
+                "windowEnd": window_end,
+            }
+
+    return structuring_wallets
+
+def detect_rapid_inout_pattern(graph: CompactGraph, wallets_dict: dict, holding_time_minutes: int = 10,
+                               min_pass_through: float = 0.9) -> dict:
+    """Detect rapid in-out (pass-through wallets: funds leave shortly after arriving)"""
+    passthrough_wallets = {}
+    timeline = WalletTimeline.for_graph(graph)
+
+    if not len(timeline):
+        # No timestamp data: fall back to the turnover ratio alone
+        for wallet, stats in wallets_dict.items():
+            if stats['inflow'] > 0 and stats['outflow'] >= stats['inflow'] * min_pass_through:
+                passthrough_wallets[wallet] = {"passThroughRatio": stats['outflow'] / stats['inflow']}
+        return passthrough_wallets
+
+    # FIFO-matched holding times; a wallet that mostly passes funds on (not one
+    # that only spends an older balance) with a short median hold is flagged
+    holding = fifo_holding_times(timeline)
+    inflow = timeline.inflow()
+    ratio = np.divide(holding.matched, inflow, out=np.zeros_like(inflow), where=inflow > 0)
+    threshold_ns = holding_time_minutes * 60 * 10 ** 9
+    with np.errstate(invalid='ignore'):
+        flagged = np.flatnonzero((holding.median_ns < threshold_ns) & (ratio >= min_pass_through))
+
+    for code, median_ns, pass_through in zip(flagged.tolist(), holding.median_ns[flagged].tolist(),
+                                             ratio[flagged].tolist()):
+        passthrough_wallets[graph.wallets[code]] = {
+            "medianHoldingMinutes": round(median_ns / 60e9, 2),
+            "passThroughRatio": round(pass_through, 4),
+        }
+
+    return passthrough_wallets
+
+def detect_dormant_activation(graph: CompactGraph, dormant_days: int = 90, burst_days: int = 7,
+                              min_burst_ratio: float = 1.0) -> dict:
+    """Detect dormant wallet activation (a volume burst after a long quiet gap)"""
+    activated_wallets = {}
+    timeline = WalletTimeline.for_graph(graph)
+    if not len(timeline):
+        return activated_wallets  # Dormancy needs timestamps
+
+    day_ns = 86400 * 10 ** 9
+    gaps = timeline.gaps()
+    reactivations = np.flatnonzero(gaps > dormant_days * day_ns)
+
+    # Volume moved within `burst_days` of waking up vs everything before the gap
+    volume = np.r_[0.0, np.cumsum(timeline.amount)]
+    ends = timeline.window_ends(burst_days * day_ns)[reactivations]
+    burst = volume[ends] - volume[reactivations]
+    before = volume[reactivations] - volume[timeline.ptr[timeline.wallet[reactivations]]]
+    bursting = burst >= min_burst_ratio * before
+    reactivations, ends, burst = reactivations[bursting], ends[bursting], burst[bursting]
+
+    # Longest dormancy per wallet
+    wallets = timeline.wallet[reactivations]
+    order = np.lexsort((-gaps[reactivations], wallets))
+    first = order[np.r_[True, np.diff(wallets[order]) != 0]] if len(order) else order
+
+    reactivated_at = ns_to_iso(timeline.time[reactivations[first]])
+    for i, when in zip(first.tolist(), reactivated_at):
+        event = reactivations[i]
+        activated_wallets[graph.wallets[timeline.wallet[event]]] = {
+            "dormantDays": round(gaps[event] / day_ns, 1),
+            "reactivatedAt": when,
+            "burstVolume": round(float(burst[i]), 8),
+            "burstTransfers": int(ends[i] - event),
+        }
+
+    return activated_wallets
+
+def detect_mixer_interaction(graph: CompactGraph, mixers: list = KNOWN_MIXERS,
+                             max_hops: int = EXPOSURE_MAX_HOPS, min_exposure: float = MIXER_MIN_EXPOSURE) -> dict:
+    """Detect mixer/tumbler interaction (direct, or value-weighted exposure within k hops)"""
+    exposure = ExposureIndex.for_graph(graph).score(graph.codes(mixers), max_hops)
+
+    # Direct counterparties of a mixer, plus wallets further out whose
+    # inflow came from (or outflow went to) mixers in a material share
+    hops = exposure.hops
+    share = np.maximum(exposure.inbound, exposure.outbound)
+    flagged = np.flatnonzero((hops == 1) | ((hops > 1) & (share >= min_exposure)))
+
+    return {
+        graph.wallets[code]: {"hops": hop, "inboundExposure": round(inbound, 4), "outboundExposure": round(outbound, 4)}
+        for code, hop, inbound, outbound in zip(flagged.tolist(), hops[flagged].tolist(),
+                                                exposure.inbound[flagged].tolist(), exposure.outbound[flagged].tolist())
+    }
+
+def detect_mixer_taint(graph: CompactGraph, mixers: list = KNOWN_MIXERS, model: str = TAINT_MODEL,
+                       min_share: float = MIXER_MIN_TAINT) -> dict:
+    """Detect mixer-tainted funds (taint propagated through transfers in time order)"""
+    result = propagate_taint(graph, graph.codes(mixers), model)
+    tainted = result.tainted()
+    tainted = tainted[result.tainted_share[tainted] >= min_share]
+
+    return {
+        graph.wallets[code]: {"taintedShare": round(share, 4), "taintedInflow": round(inflow, 8)}
+        for code, share, inflow in zip(tainted.tolist(), result.tainted_share[tainted].tolist(),
+                                       result.tainted_inflow[tainted].tolist())
+    }
+
+def detect_peel_chain(graph: CompactGraph, min_length: int = 5) -> dict:
+    """Detect peel chains (sequential value peeling along linear runs)"""
+    # Decompose the wallets with a single distinct receiver into maximal
+    # disjoint runs head -> ... -> terminal, each wallet walked once.
+    num_nodes = graph.num_nodes
+    single = graph.out_degree == 1
+    successor = np.full(num_nodes, -1, dtype=np.int64)
+    successor[single] = graph.succ[graph.succ_ptr[:-1][single]]
+    fed_by_single = np.bincount(successor[single], minlength=num_nodes) > 0
+    # Value each run wallet forwards: all of its transfers go to the next wallet
+    forwarded = np.bincount(graph.out_src, weights=graph.out_amount, minlength=num_nodes)
+
+    successor = successor.tolist()
+    forwarded = forwarded.tolist()
+    visited = np.zeros(num_nodes, dtype=bool)
+    chains = []
+    for head in np.flatnonzero(single & ~fed_by_single).tolist():
+        run = [head]
+        visited[head] = True
+        node = head
+        while single[node]:
+            node = successor[node]
+            run.append(node)
+            if visited[node]:
+                break  # joins a run walked earlier (or loops back)
+            visited[node] = True
+
+        # Peeling: every hop forwards no more than the hop before it. Split
+        # the run into its non-increasing stretches.
+        hops = [forwarded[wallet] for wallet in run[:-1]]
+        start = 0
+        for i in range(1, len(hops) + 1):
+            if i == len(hops) or hops[i] > hops[i - 1]:
+                members = run[start:i + 1]
+                peeled = hops[start] - hops[i - 1]
+                if len(members) >= min_length and peeled > 0:
+                    chains.append((members, peeled))
+                start = i
+
+    peel_chains = {}
+    wallets = graph.wallets
+    for members, peeled in chains:
+        chain = {
+            "length": len(members),
+            "peeledValue": float(peeled),
+            "members": [wallets[code] for code in members],
+        }
+        for wallet in chain["members"]:
+            if wallet not in peel_chains or peel_chains[wallet]["length"] < chain["length"]:
+                peel_chains[wallet] = chain
+
+    print(f"    Found {len(chains)} peel chains covering {len(peel_chains)} wallets")
+    return peel_chains
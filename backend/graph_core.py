@@ -0,0 +1,173 @@
+"""
+Compact transaction graph.
+
+Wallet hashes are interned to int32 codes once; edges live in numpy CSR
+(out-adjacency) and CSC (in-adjacency) arrays with amount and timestamp
+arrays aligned to each, sorted by time within every wallet's slice. Distinct
+successor/predecessor lists (the old per-wallet `set`s) are kept as a second
+CSR pair for the structural detectors.
+
+    out_nbr[out_ptr[v]:out_ptr[v + 1]]   receivers of v's transfers, by time
+    in_nbr[in_ptr[v]:in_ptr[v + 1]]      senders of v's incoming transfers, by time
+    succ[succ_ptr[v]:succ_ptr[v + 1]]    distinct wallets v sent to
+    pred[pred_ptr[v]:pred_ptr[v + 1]]    distinct wallets v received from
+
+Timestamps are int64 epoch nanoseconds, NAT where the upload had none.
+"""
+
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min
+
+
+def ns_to_iso(timestamps: np.ndarray) -> list:
+    """int64 epoch-ns timestamps (NAT for missing) -> ISO-8601 strings / None"""
+    values = pd.to_datetime(timestamps, unit='ns', utc=True)
+    iso = values.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+    return [None if ts == NAT else s for ts, s in zip(timestamps.tolist(), iso.tolist())]
+
+
+def _offsets(sorted_codes: np.ndarray, num_nodes: int) -> np.ndarray:
+    """CSR row pointer for edges grouped by `sorted_codes`"""
+    ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sorted_codes, minlength=num_nodes), out=ptr[1:])
+    return ptr
+
+
+def _distinct_adjacency(rows: np.ndarray, cols: np.ndarray, num_nodes: int) -> tuple:
+    keys = np.sort((rows.astype(np.int64) << 32) | cols.astype(np.int64))
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return _offsets(keys >> 32, num_nodes), (keys & 0xFFFFFFFF).astype(np.int32)
+
+
+# Every array a CompactGraph holds (see to_arrays / from_arrays)
+ARRAY_FIELDS = ('out_ptr', 'out_nbr', 'out_amount', 'out_timestamp', 'out_edge',
+                'in_ptr', 'in_nbr', 'in_amount', 'in_timestamp', 'in_edge',
+                'succ_ptr', 'succ', 'pred_ptr', 'pred')
+
+
+class CompactGraph:
+    """Interned CSR/CSC transaction graph"""
+
+    def __init__(self, wallets: pd.Index, src: np.ndarray, dst: np.ndarray,
+                 amount: np.ndarray, timestamp: np.ndarray):
+        self.wallets = wallets
+        self.num_nodes = len(wallets)
+        self.num_edges = len(src)
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        amount = np.asarray(amount, dtype=np.float64)
+        timestamp = np.asarray(timestamp, dtype=np.int64)
+
+        # lexsort is stable, so equal timestamps keep upload order
+        order = np.lexsort((timestamp, src))
+        self.out_ptr = _offsets(src[order], self.num_nodes)
+        self.out_nbr = dst[order]
+        self.out_amount = amount[order]
+        self.out_timestamp = timestamp[order]
+        self.out_edge = order.astype(np.int64)
+
+        order = np.lexsort((timestamp, dst))
+        self.in_ptr = _offsets(dst[order], self.num_nodes)
+        self.in_nbr = src[order]
+        self.in_amount = amount[order]
+        self.in_timestamp = timestamp[order]
+        self.in_edge = order.astype(np.int64)
+
+        self.succ_ptr, self.succ = _distinct_adjacency(src, dst, self.num_nodes)
+        self.pred_ptr, self.pred = _distinct_adjacency(dst, src, self.num_nodes)
+
+    # Indexes derived on demand (WalletTimeline.for_graph, ExposureIndex.for_graph)
+    DERIVED_INDEXES = ('_timeline', '_exposure_index')
+
+    def __getstate__(self) -> dict:
+        # Derived indexes are rebuilt on demand, so pickles (the analysis
+        # cache) hold only the graph itself
+        return {name: value for name, value in self.__dict__.items() if name not in self.DERIVED_INDEXES}
+
+    @classmethod
+    def from_project_graph(cls, project_graph) -> "CompactGraph":
+        return cls(project_graph.wallets, project_graph.src, project_graph.dst,
+                   project_graph.amount, project_graph.timestamp)
+
+    def to_arrays(self) -> dict:
+        """Adjacency and edge arrays, plus wallet hashes as a fixed-width string array"""
+        arrays = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        arrays['wallets'] = np.asarray(self.wallets, dtype=str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "CompactGraph":
+        """Rebuild a graph from `to_arrays` output without re-sorting (arrays may be memory-mapped)"""
+        graph = cls.__new__(cls)
+        graph.wallets = pd.Index(arrays['wallets'].astype(object), dtype=object)
+        graph.num_nodes = len(graph.wallets)
+        graph.num_edges = len(arrays['out_nbr'])
+        for name in ARRAY_FIELDS:
+            setattr(graph, name, arrays[name])
+        return graph
+
+    # ------------------------------------------------------------------
+    # Adjacency
+    # ------------------------------------------------------------------
+
+    @property
+    def out_degree(self) -> np.ndarray:
+        """Distinct receivers per wallet"""
+        return np.diff(self.succ_ptr)
+
+    @property
+    def in_degree(self) -> np.ndarray:
+        """Distinct senders per wallet"""
+        return np.diff(self.pred_ptr)
+
+    @property
+    def out_src(self) -> np.ndarray:
+        """Sender of every edge, in out-adjacency order"""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.out_ptr))
+
+    @property
+    def succ_src(self) -> np.ndarray:
+        """Sender of every distinct (sender, receiver) pair, in `succ` order"""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.out_degree)
+
+    def successors(self, code: int) -> np.ndarray:
+        return self.succ[self.succ_ptr[code]:self.succ_ptr[code + 1]]
+
+    def predecessors(self, code: int) -> np.ndarray:
+        return self.pred[self.pred_ptr[code]:self.pred_ptr[code + 1]]
+
+    def successor_lists(self) -> list:
+        """Distinct successors of every wallet as Python lists (for DFS-style walks)"""
+        return [nbrs.tolist() for nbrs in np.split(self.succ, self.succ_ptr[1:-1])] if self.num_nodes else []
+
+    def codes(self, wallet_hashes) -> np.ndarray:
+        """Codes of the given wallet hashes, -1 for unknown wallets"""
+        return self.wallets.get_indexer(pd.Index(wallet_hashes, dtype=object))
+
+    def to_hashes(self, values: dict) -> dict:
+        """Re-key a {code: value} mapping by wallet hash"""
+        wallets = self.wallets
+        return {wallets[code]: value for code, value in values.items()}
+
+    # ------------------------------------------------------------------
+    # Footprint
+    # ------------------------------------------------------------------
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the adjacency and edge attribute arrays"""
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def bytes_per_edge(self) -> float:
+        return self.memory_bytes() / self.num_edges if self.num_edges else 0.0
+
+    def memory_report(self) -> dict:
+        return {
+            "nodes": self.num_nodes,
+            "edges": self.num_edges,
+            "distinctPairs": len(self.succ),
+            "bytes": self.memory_bytes(),
+            "bytesPerEdge": round(self.bytes_per_edge(), 1),
+        }
@@ -0,0 +1,383 @@
+"""
+Per-project transaction graph store.
+
+The interned edge list, per-wallet stats and layout positions of every
+analysed project are kept on local disk as an .npz file. Appends merge new
+transfers into it and find the neighbourhood they affect without re-reading
+the project's transactions from Supabase.
+
+An append is stored as a segment file next to the project's .npz holding only
+its new wallets, edges and positions (wallet stats are re-derived from the
+edges on load), so its write cost follows the delta, not the project. Once a
+project has PROJECT_GRAPH_MAX_SEGMENTS segments they are compacted into the
+.npz on the next append.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from ingest import WalletAggregator, timestamps_to_ns
+from graph_core import CompactGraph
+
+PROJECT_GRAPH_DIR = os.getenv("PROJECT_GRAPH_DIR", os.path.join(tempfile.gettempdir(), "chainsleuth-graphs"))
+
+PROJECT_GRAPH_MAX_SEGMENTS = int(os.getenv("PROJECT_GRAPH_MAX_SEGMENTS", "32"))
+
+# Compact graphs kept in memory for interactive queries (projects, LRU)
+COMPACT_GRAPH_CACHE_SIZE = int(os.getenv("COMPACT_GRAPH_CACHE_SIZE", "4"))
+
+# One lock per project: appends to the same project are serialized
+_project_locks = defaultdict(threading.Lock)
+
+_compact_graphs = OrderedDict()
+_compact_graphs_lock = threading.Lock()
+
+
+def project_lock(project_id: str) -> threading.Lock:
+    return _project_locks[project_id]
+
+
+def _row_pointer(codes: np.ndarray, size: int) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=size))))
+
+
+def _ranges(ptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenated index ranges ptr[r]:ptr[r + 1] of the given rows"""
+    starts, lengths = ptr[rows], ptr[rows + 1] - ptr[rows]
+    return np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(lengths.sum())
+
+
+class ProjectGraph:
+    """Edge arrays (interned wallet codes) plus per-wallet running stats"""
+
+    def __init__(self, aggregator: WalletAggregator = None):
+        self.aggregator = aggregator or WalletAggregator()
+        self._src = np.zeros(0, dtype=np.int32)
+        self._dst = np.zeros(0, dtype=np.int32)
+        self._amount = np.zeros(0, dtype=np.float64)
+        self._timestamp = np.zeros(0, dtype=np.int64)
+        # Layout positions of the first len(positions) wallets (see layout.py)
+        self.positions = np.zeros((0, 2), dtype=np.float64)
+        # Chunks appended since the last flush (concatenated once, not per chunk)
+        self._pending = []
+        # Edge ids grouped by sender and by receiver, built on first use
+        self._adjacency = None
+
+    def _flush(self):
+        if self._pending:
+            parts = list(zip(*self._pending))
+            self._src = np.concatenate([self._src, *parts[0]])
+            self._dst = np.concatenate([self._dst, *parts[1]])
+            self._amount = np.concatenate([self._amount, *parts[2]])
+            self._timestamp = np.concatenate([self._timestamp, *parts[3]])
+            self._pending = []
+
+    @property
+    def src(self) -> np.ndarray:
+        self._flush()
+        return self._src
+
+    @property
+    def dst(self) -> np.ndarray:
+        self._flush()
+        return self._dst
+
+    @property
+    def amount(self) -> np.ndarray:
+        self._flush()
+        return self._amount
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        self._flush()
+        return self._timestamp
+
+    @property
+    def wallets(self) -> pd.Index:
+        return self.aggregator.wallets
+
+    @property
+    def num_wallets(self) -> int:
+        return len(self.aggregator)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    def add_chunk(self, chunk: pd.DataFrame) -> tuple:
+        """Intern and append a normalized ingest chunk, returning its codes"""
+        from_codes, to_codes = self.aggregator.add_chunk(chunk)
+        self._pending.append((
+            from_codes,
+            to_codes,
+            chunk['amount'].to_numpy(dtype=np.float64),
+            timestamps_to_ns(chunk['timestamp']),
+        ))
+        self._adjacency = None
+        return from_codes, to_codes
+
+    def adjacency(self) -> tuple:
+        """(out_ptr, out_edges, in_ptr, in_edges): edge ids grouped by sender and
+        by receiver, built once and reused until edges are added, so walks only
+        touch the edges of the wallets they reach"""
+        if self._adjacency is None:
+            size = self.num_wallets
+            self._adjacency = (_row_pointer(self.src, size), np.argsort(self.src, kind='stable'),
+                               _row_pointer(self.dst, size), np.argsort(self.dst, kind='stable'))
+        return self._adjacency
+
+    def out_edges(self, codes: np.ndarray) -> np.ndarray:
+        out_ptr, out_edges, _, _ = self.adjacency()
+        return out_edges[_ranges(out_ptr, codes)]
+
+    def in_edges(self, codes: np.ndarray) -> np.ndarray:
+        _, _, in_ptr, in_edges = self.adjacency()
+        return in_edges[_ranges(in_ptr, codes)]
+
+    def neighbourhood(self, seeds: np.ndarray, hops: int) -> np.ndarray:
+        """Mask of wallets within `hops` undirected hops of the seed codes"""
+        mask = np.zeros(self.num_wallets, dtype=bool)
+        frontier = np.unique(seeds)
+        mask[frontier] = True
+        for _ in range(hops):
+            reached = np.concatenate([self.dst[self.out_edges(frontier)], self.src[self.in_edges(frontier)]])
+            frontier = np.unique(reached[~mask[reached]])
+            if not len(frontier):
+                break
+            mask[frontier] = True
+        return mask
+
+    def single_receivers(self, codes: np.ndarray) -> np.ndarray:
+        """The one distinct receiver of each wallet in `codes`, or -1 for
+        wallets with none or several"""
+        codes = np.asarray(codes, dtype=np.int64)
+        out_ptr, _, _, _ = self.adjacency()
+        senders = np.repeat(np.arange(len(codes)), out_ptr[codes + 1] - out_ptr[codes])
+        receivers = self.dst[self.out_edges(codes)].astype(np.int64)
+        pairs = np.unique((senders << 32) | receivers)
+        degree = np.bincount(pairs >> 32, minlength=len(codes))
+        result = np.full(len(codes), -1, dtype=np.int64)
+        single = degree[pairs >> 32] == 1
+        result[pairs[single] >> 32] = pairs[single] & 0xFFFFFFFF
+        return result
+
+    def extend_along_runs(self, mask: np.ndarray) -> np.ndarray:
+        """`mask` grown to the whole single-receiver runs through its wallets
+        (the runs peel chains are cut from, see detectors.detect_peel_chain),
+        so a subgraph around it holds every such run end to end.
+
+        A wallet is pulled in upstream only when the run continues through the
+        wallet it sends to, or when it has a single-receiver sender itself:
+        the many one-receiver senders of a masked hub stay out.
+        """
+        mask = mask.copy()
+        frontier = np.flatnonzero(mask)
+        while len(frontier):
+            receiver = self.single_receivers(frontier)
+            in_ptr = self.adjacency()[2]
+            edges = self.in_edges(frontier)
+            senders = self.src[edges]
+            continues = np.repeat(receiver >= 0, in_ptr[frontier + 1] - in_ptr[frontier])
+            runs_in = self.single_receivers(senders) >= 0
+            senders, continues = senders[runs_in], continues[runs_in]
+            if not continues.all():
+                fed = self.in_edges(senders[~continues])
+                fed_by_single = np.zeros(self.num_wallets, dtype=bool)
+                fed_by_single[self.dst[fed][self.single_receivers(self.src[fed]) >= 0]] = True
+                continues |= fed_by_single[senders]
+            reached = np.concatenate([receiver[receiver >= 0], senders[continues]])
+            frontier = np.unique(reached[~mask[reached]])
+            mask[frontier] = True
+        return mask
+
+    def subgraph(self, node_mask: np.ndarray) -> dict:
+        """Detector inputs restricted to the induced subgraph on `node_mask`.
+
+        Returns compact_graph and wallets_dict in the shapes the
+        detectors consume; wallet stats are the project-wide totals.
+        """
+        codes = np.flatnonzero(node_mask)
+        edges = self.out_edges(codes)
+        edges = np.sort(edges[node_mask[self.dst[edges]]])
+        remap = np.full(self.num_wallets, -1, dtype=np.int32)
+        remap[codes] = np.arange(len(codes), dtype=np.int32)
+        wallets = self.wallets[codes]
+        src = remap[self.src[edges]]
+        dst = remap[self.dst[edges]]
+        amount = self.amount[edges]
+        timestamp = self.timestamp[edges]
+
+        compact_graph = CompactGraph(wallets, src, dst, amount, timestamp)
+
+        agg = self.aggregator
+        wallets_dict = {
+            wallet: {'inflow': inflow, 'outflow': outflow, 'tx_count': tx_count}
+            for wallet, inflow, outflow, tx_count in zip(
+                wallets, agg.inflow[codes].tolist(), agg.outflow[codes].tolist(), agg.tx_count[codes].tolist())
+        }
+        return {'compact_graph': compact_graph, 'wallets_dict': wallets_dict}
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def to_arrays(self) -> dict:
+        agg = self.aggregator
+        return {
+            'wallets': np.asarray(agg.wallets, dtype=str),
+            'inflow': agg.inflow, 'outflow': agg.outflow, 'tx_count': agg.tx_count,
+            'src': self.src, 'dst': self.dst, 'amount': self.amount, 'timestamp': self.timestamp,
+            'positions': self.positions,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "ProjectGraph":
+        aggregator = WalletAggregator()
+        aggregator.wallets = pd.Index(arrays['wallets'].astype(object), dtype=object)
+        aggregator.inflow = np.asarray(arrays['inflow'], dtype=np.float64)
+        aggregator.outflow = np.asarray(arrays['outflow'], dtype=np.float64)
+        aggregator.tx_count = np.asarray(arrays['tx_count'], dtype=np.int64)
+        graph = cls(aggregator)
+        graph._src = np.asarray(arrays['src'], dtype=np.int32)
+        graph._dst = np.asarray(arrays['dst'], dtype=np.int32)
+        graph._amount = np.asarray(arrays['amount'], dtype=np.float64)
+        graph._timestamp = np.asarray(arrays['timestamp'], dtype=np.int64)
+        if 'positions' in arrays:
+            graph.positions = np.asarray(arrays['positions'], dtype=np.float64).reshape(-1, 2)
+        return graph
+
+    def segment_arrays(self, first_wallet: int, first_edge: int) -> dict:
+        """The wallets, edges and positions added from the given codes/edge on"""
+        return {
+            'first_wallet': np.int64(first_wallet), 'first_edge': np.int64(first_edge),
+            'wallets': np.asarray(self.wallets[first_wallet:], dtype=str),
+            'src': self.src[first_edge:], 'dst': self.dst[first_edge:],
+            'amount': self.amount[first_edge:], 'timestamp': self.timestamp[first_edge:],
+            'positions': self.positions[first_wallet:],
+        }
+
+    def apply_segment(self, arrays: dict) -> bool:
+        """Append a stored segment; False (and nothing applied) unless it
+        starts exactly where this graph ends"""
+        if int(arrays['first_wallet']) != self.num_wallets or int(arrays['first_edge']) != self.num_edges:
+            return False
+        agg = self.aggregator
+        agg.add_wallets(arrays['wallets'].astype(object))
+        src = np.asarray(arrays['src'], dtype=np.int32)
+        dst = np.asarray(arrays['dst'], dtype=np.int32)
+        amount = np.asarray(arrays['amount'], dtype=np.float64)
+        agg.add_transfers(src, dst, amount)
+        self._pending.append((src, dst, amount, np.asarray(arrays['timestamp'], dtype=np.int64)))
+        self._adjacency = None
+        # Positions stay a prefix of the wallets
+        if len(self.positions) == int(arrays['first_wallet']):
+            self.positions = np.concatenate([self.positions, np.asarray(arrays['positions']).reshape(-1, 2)])
+        return True
+
+
+def _graph_path(project_id: str) -> str:
+    return os.path.join(PROJECT_GRAPH_DIR, f"{project_id}.npz")
+
+
+def _segment_dir(project_id: str) -> str:
+    return os.path.join(PROJECT_GRAPH_DIR, f"{project_id}.segments")
+
+
+def _segment_names(project_id: str) -> list:
+    """Segment files of a project in edge order (named by their first edge)"""
+    try:
+        return sorted(name for name in os.listdir(_segment_dir(project_id)) if name.endswith(".npz"))
+    except FileNotFoundError:
+        return []
+
+
+def _write_npz(path: str, arrays: dict):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def save_project_graph(project_id: str, graph: ProjectGraph):
+    """Store the whole graph, replacing any segments"""
+    os.makedirs(PROJECT_GRAPH_DIR, exist_ok=True)
+    _write_npz(_graph_path(project_id), graph.to_arrays())
+    shutil.rmtree(_segment_dir(project_id), ignore_errors=True)
+
+
+def append_project_graph(project_id: str, graph: ProjectGraph, first_wallet: int, first_edge: int):
+    """Store what was merged into a stored graph since `first_wallet`/`first_edge`
+    as a segment (idempotent: a retried append rewrites the same file)"""
+    segments = _segment_names(project_id)
+    if not os.path.exists(_graph_path(project_id)) or len(segments) >= PROJECT_GRAPH_MAX_SEGMENTS:
+        save_project_graph(project_id, graph)
+        return
+    os.makedirs(_segment_dir(project_id), exist_ok=True)
+    _write_npz(os.path.join(_segment_dir(project_id), f"{first_edge:012d}.npz"),
+               graph.segment_arrays(first_wallet, first_edge))
+
+
+def load_project_graph(project_id: str):
+    """Stored graph of a project (with its segments), or None if it was never stored here"""
+    try:
+        with np.load(_graph_path(project_id), allow_pickle=False) as arrays:
+            graph = ProjectGraph.from_arrays({key: arrays[key] for key in arrays.files})
+    except FileNotFoundError:
+        return None
+    for name in _segment_names(project_id):
+        with np.load(os.path.join(_segment_dir(project_id), name), allow_pickle=False) as arrays:
+            # Leftovers of an interrupted compaction are already in the .npz
+            graph.apply_segment({key: arrays[key] for key in arrays.files})
+    return graph
+
+
+def _stored_version(project_id: str):
+    """Changes whenever the project's stored graph does; None if there is none"""
+    try:
+        return os.stat(_graph_path(project_id)).st_mtime_ns, tuple(_segment_names(project_id))
+    except FileNotFoundError:
+        return None
+
+
+def delete_project_graph(project_id: str):
+    with _compact_graphs_lock:
+        _compact_graphs.pop(project_id, None)
+    shutil.rmtree(_segment_dir(project_id), ignore_errors=True)
+    try:
+        os.remove(_graph_path(project_id))
+    except FileNotFoundError:
+        pass
+
+
+def load_compact_graph(project_id: str):
+    """Compact graph of a project's stored graph, or None if it was never stored here.
+
+    Recently used graphs stay in memory, keyed by the stored file's mtime and
+    segments so an append or re-analysis is picked up on the next call. Derived indexes
+    the detectors cache on the graph (timeline, exposure) are kept with it.
+    """
+    version = _stored_version(project_id)
+    if version is None:
+        return None
+    with _compact_graphs_lock:
+        cached = _compact_graphs.get(project_id)
+        if cached is not None and cached[0] == version:
+            _compact_graphs.move_to_end(project_id)
+            return cached[1]
+
+    project_graph = load_project_graph(project_id)
+    if project_graph is None:
+        return None
+    graph = CompactGraph.from_project_graph(project_graph)
+    with _compact_graphs_lock:
+        _compact_graphs[project_id] = (version, graph)
+        _compact_graphs.move_to_end(project_id)
+        while len(_compact_graphs) > COMPACT_GRAPH_CACHE_SIZE:
+            _compact_graphs.popitem(last=False)
+    return graph
+
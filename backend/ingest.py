@@ -0,0 +1,348 @@
+"""
+Streaming ingestion of uploaded transaction datasets.
+
+Uploads are read straight from the stored upload file in fixed-size chunks,
+so memory stays bounded by the chunk size instead of the file size. CSV,
+Parquet and Arrow IPC (file or stream) uploads are supported; columnar
+formats only read the mapped columns and are memory-mapped when read from
+disk.
+"""
+
+import os
+from itertools import repeat
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet / Arrow uploads are optional
+    pa = None
+    pq = None
+
+# Rows per chunk when streaming an upload
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+# Canonical field -> keywords accepted in the dataset's column names.
+# Rules are checked in order and each field is mapped at most once, so
+# e.g. "token_type" cannot steal the "to_wallet" slot ('to' in 'token').
+COLUMN_RULES = [
+    ('from_wallet', ('from', 'source')),
+    ('to_wallet', ('to', 'dest', 'target')),
+    ('amount', ('amount', 'value')),
+    ('timestamp', ('time', 'date')),
+    ('token_type', ('token', 'currency', 'type')),
+]
+
+REQUIRED_FIELDS = ('from_wallet', 'to_wallet', 'amount')
+
+
+def map_columns(columns) -> dict:
+    """Map canonical field names to dataset columns (flexible naming)"""
+    column_mapping = {}
+    remaining = []
+
+    # Exact canonical names win over keyword matches
+    for col in columns:
+        col_lower = str(col).lower().strip()
+        if col_lower in dict(COLUMN_RULES) and col_lower not in column_mapping:
+            column_mapping[col_lower] = col
+        else:
+            remaining.append(col)
+
+    for col in remaining:
+        col_lower = str(col).lower().strip()
+        for field, keywords in COLUMN_RULES:
+            if field not in column_mapping and any(k in col_lower for k in keywords):
+                column_mapping[field] = col
+                break
+
+    return column_mapping
+
+
+def missing_required_fields(column_mapping: dict) -> list:
+    """Required canonical fields that the dataset does not provide"""
+    return [field for field in REQUIRED_FIELDS if field not in column_mapping]
+
+
+# Leading bytes that identify columnar uploads
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_CONTINUATION = b"\xff\xff\xff\xff"
+
+UPLOAD_FORMATS = ('csv', 'parquet', 'arrow_file', 'arrow_stream')
+
+
+def detect_format(source, filename: Optional[str] = None) -> str:
+    """Detect the upload format from its magic bytes (falling back to the extension)"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            head = f.read(8)
+    else:
+        position = source.tell()
+        head = source.read(8)
+        source.seek(position)
+
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if head.startswith(ARROW_FILE_MAGIC):
+        return 'arrow_file'
+    if head.startswith(ARROW_STREAM_CONTINUATION):
+        return 'arrow_stream'
+
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.arrow', '.feather', '.ipc'):
+        return 'arrow_file'
+    return 'csv'
+
+
+def _require_pyarrow(fmt: str):
+    if pa is None:
+        raise ValueError(f"{fmt} uploads require the 'pyarrow' package")
+
+
+def _open_columnar(source):
+    """Memory-map uploads on disk (zero-copy); use file objects as-is"""
+    if isinstance(source, str):
+        return pa.memory_map(source, 'r')
+    source.seek(0)
+    return source
+
+
+def _open_arrow(source, fmt: str):
+    handle = _open_columnar(source)
+    if fmt == 'arrow_file':
+        return pa.ipc.open_file(handle)
+    return pa.ipc.open_stream(handle)
+
+
+def read_header(source, fmt: str = 'csv') -> list:
+    """Column names of an upload, without reading its rows"""
+    if fmt == 'csv':
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return read_csv_header(f)
+        return read_csv_header(source)
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        schema = pq.ParquetFile(_open_columnar(source)).schema_arrow
+    else:
+        schema = _open_arrow(source, fmt).schema
+    if not isinstance(source, str):
+        source.seek(0)
+    return list(schema.names)
+
+
+def read_csv_header(source) -> list:
+    """Read only the header row of a CSV file object and rewind it"""
+    columns = list(pd.read_csv(source, nrows=0).columns)
+    source.seek(0)
+    return columns
+
+
+def _normalize_chunk(chunk: pd.DataFrame, column_mapping: dict) -> pd.DataFrame:
+    """Rename a raw chunk to canonical columns with proper dtypes"""
+    out = pd.DataFrame({
+        'from_wallet': chunk[column_mapping['from_wallet']].astype(str),
+        'to_wallet': chunk[column_mapping['to_wallet']].astype(str),
+        'amount': pd.to_numeric(chunk[column_mapping['amount']], errors='coerce').fillna(0.0).astype('float64'),
+    })
+
+    if 'timestamp' in column_mapping:
+        timestamps = chunk[column_mapping['timestamp']]
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            # Native timestamp columns (Parquet/Arrow) -> ISO-8601 strings
+            timestamps = timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S.%f%z')
+        out['timestamp'] = timestamps.astype(object).where(timestamps.notna(), None)
+    else:
+        out['timestamp'] = None
+
+    if 'token_type' in column_mapping:
+        out['token_type'] = chunk[column_mapping['token_type']].fillna('ETH').astype(str)
+    else:
+        out['token_type'] = 'ETH'
+
+    return out
+
+
+def iter_csv_chunks(source, column_mapping: dict, chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Stream a CSV file object as normalized DataFrame chunks.
+
+    Only the mapped columns are parsed (C parser, `usecols`), and every chunk
+    has the canonical columns from_wallet, to_wallet, amount, timestamp and
+    token_type.
+    """
+    chunk_rows = chunk_rows or INGEST_CHUNK_ROWS
+    text_columns = [column_mapping[f] for f in ('from_wallet', 'to_wallet', 'timestamp', 'token_type') if f in column_mapping]
+
+    reader = pd.read_csv(
+        source,
+        usecols=list(dict.fromkeys(column_mapping.values())),
+        dtype={col: str for col in text_columns},
+        chunksize=chunk_rows,
+    )
+    for chunk in reader:
+        yield _normalize_chunk(chunk, column_mapping)
+
+
+def _iter_record_batches(batches, column_mapping: dict, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Slice Arrow record batches (zero-copy) into normalized chunks"""
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_rows):
+            yield _normalize_chunk(batch.slice(start, chunk_rows).to_pandas(), column_mapping)
+
+
+def iter_parquet_chunks(source, column_mapping: dict, chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Stream a Parquet upload, reading only the mapped columns"""
+    _require_pyarrow('parquet')
+    chunk_rows = chunk_rows or INGEST_CHUNK_ROWS
+    parquet_file = pq.ParquetFile(_open_columnar(source))
+    columns = list(dict.fromkeys(column_mapping.values()))
+    yield from _iter_record_batches(parquet_file.iter_batches(batch_size=chunk_rows, columns=columns), column_mapping, chunk_rows)
+
+
+def iter_arrow_chunks(source, column_mapping: dict, fmt: str = 'arrow_file', chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Stream an Arrow IPC file/stream upload, reading only the mapped columns"""
+    _require_pyarrow('Arrow IPC')
+    chunk_rows = chunk_rows or INGEST_CHUNK_ROWS
+    reader = _open_arrow(source, fmt)
+    columns = list(dict.fromkeys(column_mapping.values()))
+
+    if fmt == 'arrow_file':
+        batches = (reader.get_batch(i).select(columns) for i in range(reader.num_record_batches))
+    else:
+        batches = (batch.select(columns) for batch in reader)
+    yield from _iter_record_batches(batches, column_mapping, chunk_rows)
+
+
+def iter_transaction_chunks(source, column_mapping: dict, fmt: str = 'csv', chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Stream any supported upload (path or file object) as normalized chunks"""
+    if fmt == 'parquet':
+        yield from iter_parquet_chunks(source, column_mapping, chunk_rows)
+    elif fmt in ('arrow_file', 'arrow_stream'):
+        yield from iter_arrow_chunks(source, column_mapping, fmt, chunk_rows)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from iter_csv_chunks(f, column_mapping, chunk_rows)
+    else:
+        yield from iter_csv_chunks(source, column_mapping, chunk_rows)
+
+
+def timestamps_to_ns(timestamps) -> np.ndarray:
+    """Parse ISO-8601 timestamps to int64 epoch nanoseconds (UTC); missing -> NaT"""
+    parsed = pd.to_datetime(pd.Series(timestamps, dtype=object), errors='coerce', utc=True, format='ISO8601')
+    return parsed.dt.tz_localize(None).astype('datetime64[ns]').to_numpy().view(np.int64)
+
+
+def chunk_to_records(chunk: pd.DataFrame, project_id: str) -> list:
+    """Convert a normalized chunk into transaction rows for insertion"""
+    records = chunk.to_dict('records')
+    for record in records:
+        record['project_id'] = project_id
+    return records
+
+
+class WalletAggregator:
+    """Columnar per-wallet inflow/outflow/tx_count, accumulated chunk by chunk.
+
+    Wallet hashes are interned to integer codes (in first-appearance order)
+    through a growing dict, so a chunk costs its own rows, not the wallets
+    seen so far; every chunk is folded in with `np.bincount` over the codes.
+    """
+
+    def __init__(self):
+        self._wallets = []  # Hashes in code order
+        self._codes = {}  # Hash -> code, rebuilt on first use after `wallets` is assigned
+        self._index = None  # pd.Index of _wallets, built when asked for
+        self.inflow = np.zeros(0, dtype=np.float64)
+        self.outflow = np.zeros(0, dtype=np.float64)
+        self.tx_count = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._wallets)
+
+    @property
+    def wallets(self) -> pd.Index:
+        """Wallet hashes in code order"""
+        if self._index is None or len(self._index) != len(self._wallets):
+            self._index = pd.Index(self._wallets, dtype=object)
+        return self._index
+
+    @wallets.setter
+    def wallets(self, wallets: pd.Index):
+        self._wallets = list(wallets)
+        self._codes = None
+        self._index = wallets
+
+    def _code_map(self) -> dict:
+        if self._codes is None:
+            self._codes = {wallet: code for code, wallet in enumerate(self._wallets)}
+        return self._codes
+
+    def add_wallets(self, wallets) -> None:
+        """Intern wallets known to be unseen, in order"""
+        codes = self._code_map()
+        for wallet in wallets:
+            codes[wallet] = len(self._wallets)
+            self._wallets.append(wallet)
+
+    def encode(self, from_wallets, to_wallets) -> tuple:
+        """Intern wallet hashes, returning (from_codes, to_codes) as int32 arrays"""
+        from_values = np.asarray(from_wallets, dtype=object)
+        to_values = np.asarray(to_wallets, dtype=object)
+
+        # Interleave so new wallets get codes in row order (from, to, from, ...)
+        interleaved = np.column_stack((from_values, to_values)).ravel()
+        codes = self._code_map()
+        encoded = np.fromiter(map(codes.get, interleaved, repeat(-1)), dtype=np.int64, count=len(interleaved))
+        unseen = encoded < 0
+        if unseen.any():
+            self.add_wallets(pd.unique(interleaved[unseen]))
+            encoded[unseen] = [codes[wallet] for wallet in interleaved[unseen]]
+
+        encoded = encoded.astype(np.int32).reshape(-1, 2)
+        return encoded[:, 0], encoded[:, 1]
+
+    def add_chunk(self, chunk: pd.DataFrame) -> tuple:
+        """Fold a normalized chunk into the running totals, returning its codes"""
+        from_codes, to_codes = self.encode(chunk['from_wallet'], chunk['to_wallet'])
+        self.add_transfers(from_codes, to_codes, chunk['amount'].to_numpy(dtype=np.float64))
+        return from_codes, to_codes
+
+    def add_transfers(self, from_codes: np.ndarray, to_codes: np.ndarray, amounts: np.ndarray):
+        """Fold transfers between already interned wallets into the running totals"""
+        size = len(self._wallets)
+
+        self.inflow = _grow(self.inflow, size) + np.bincount(to_codes, weights=amounts, minlength=size)
+        self.outflow = _grow(self.outflow, size) + np.bincount(from_codes, weights=amounts, minlength=size)
+        self.tx_count = (_grow(self.tx_count, size)
+                         + np.bincount(from_codes, minlength=size)
+                         + np.bincount(to_codes, minlength=size))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Per-wallet stats as a DataFrame indexed by wallet hash"""
+        return pd.DataFrame(
+            {'inflow': self.inflow, 'outflow': self.outflow, 'tx_count': self.tx_count},
+            index=self.wallets,
+        )
+
+    def to_dict(self) -> dict:
+        """Per-wallet stats in the `wallets_dict` shape the detectors consume"""
+        return {
+            wallet: {'inflow': inflow, 'outflow': outflow, 'tx_count': tx_count}
+            for wallet, inflow, outflow, tx_count in zip(
+                self.wallets, self.inflow.tolist(), self.outflow.tolist(), self.tx_count.tolist()
+            )
+        }
+
+
+def _grow(values: np.ndarray, size: int) -> np.ndarray:
+    """Zero-extend a per-wallet array to `size` entries"""
+    if len(values) >= size:
+        return values
+    return np.concatenate([values, np.zeros(size - len(values), dtype=values.dtype)])
@@ -0,0 +1,222 @@
+"""
+Background analysis jobs.
+
+Project creation stores the upload on disk, enqueues its analysis on a
+bounded worker pool and returns a job id right away. Clients poll
+GET /api/jobs/{id} for per-stage progress; a failed job keeps its upload and
+completed stage outputs so it can be resumed for JOB_RESUME_TTL_SECONDS.
+Finished jobs are forgotten after a retention period, or sooner once more
+than JOB_MAX_FINISHED have piled up; a failed job's upload and state are
+deleted with it.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "chainsleuth-jobs"))
+# How long finished jobs stay pollable, and failed ones resumable
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_RESUME_TTL_SECONDS = float(os.getenv("JOB_RESUME_TTL_SECONDS", str(24 * 3600)))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class AnalysisJob:
+    """One project analysis run, tracked stage by stage"""
+
+    def __init__(self, project_id: str, user_id: str, filename: Optional[str], stages: list):
+        self.id = str(uuid.uuid4())
+        self.project_id = project_id
+        self.user_id = user_id
+        self.filename = filename
+        self.upload_path = None
+        self.content_hash = None
+        self.client = None
+        self.runner = None
+        self.status = "queued"
+        self.error = None
+        self.failed_stage = None
+        self.result = None
+        self.attempts = 0
+        self.created_at = _now()
+        self.updated_at = self.created_at
+        self.finished_at = None  # time.monotonic() of the last run's end
+        self.stages = {name: {"name": name, "status": "pending"} for name in stages}
+        # Stage outputs, kept until the job completes so a resume can skip work
+        self.state = {}
+        self._lock = threading.Lock()
+
+    def run_stage(self, name: str, fn: Callable[[], Optional[dict]]):
+        """Run a pipeline stage unless a previous attempt already completed it"""
+        if self.stages[name]["status"] == "completed":
+            return
+        with self._lock:
+            self.stages[name].update(status="running", startedAt=_now())
+            self.updated_at = _now()
+        try:
+            detail = fn()
+        except Exception:
+            with self._lock:
+                self.stages[name].update(status="failed", finishedAt=_now())
+                self.failed_stage = name
+            raise
+        with self._lock:
+            self.stages[name].update(status="completed", finishedAt=_now(), detail=detail)
+            self.updated_at = _now()
+
+    def skip_stage(self, name: str, detail: Optional[dict] = None):
+        """Mark a stage completed without running it (e.g. served from cache)"""
+        with self._lock:
+            self.stages[name].update(status="completed", startedAt=_now(), finishedAt=_now(), detail=detail)
+            self.updated_at = _now()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [dict(stage) for stage in self.stages.values()]
+            done = sum(1 for stage in stages if stage["status"] == "completed")
+            current = next((stage["name"] for stage in stages if stage["status"] == "running"), None)
+            return {
+                "id": self.id,
+                "projectId": self.project_id,
+                "filename": self.filename,
+                "status": self.status,
+                "stage": current,
+                "progress": round(done / len(stages), 3) if stages else 1.0,
+                "stages": stages,
+                "error": self.error,
+                "failedStage": self.failed_stage,
+                "resumable": self.status == "failed",
+                "attempts": self.attempts,
+                "result": self.result,
+                "createdAt": self.created_at,
+                "updatedAt": self.updated_at,
+            }
+
+
+class JobManager:
+    """Runs analysis jobs on a bounded thread pool, off the event loop"""
+
+    def __init__(self, runner: Callable[[AnalysisJob], dict], max_workers: int = ANALYSIS_WORKERS,
+                 on_finish: Optional[Callable[[AnalysisJob], None]] = None,
+                 retention_seconds: float = JOB_RETENTION_SECONDS,
+                 resume_ttl_seconds: float = JOB_RESUME_TTL_SECONDS,
+                 max_finished: int = JOB_MAX_FINISHED):
+        self._runner = runner
+        self.retention_seconds = retention_seconds
+        self.resume_ttl_seconds = resume_ttl_seconds
+        self.max_finished = max_finished
+        # Called after every run, completed or failed (both may have written project data)
+        self._on_finish = on_finish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save_upload(self, job: AnalysisJob, fileobj) -> str:
+        """Copy an upload to the job's directory so it outlives the request,
+        hashing its content on the way for the analysis cache"""
+        job_dir = os.path.join(JOB_UPLOAD_DIR, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, "upload")
+        digest = hashlib.sha256()
+        fileobj.seek(0)
+        with open(path, "wb") as out:
+            for block in iter(lambda: fileobj.read(1024 * 1024), b""):
+                digest.update(block)
+                out.write(block)
+        job.upload_path = path
+        job.content_hash = digest.hexdigest()
+        return path
+
+    def submit(self, job: AnalysisJob, client, runner: Optional[Callable[[AnalysisJob], dict]] = None) -> AnalysisJob:
+        """Queue a job; `runner` overrides the manager's default (e.g. appends)"""
+        self.evict_finished()
+        with self._lock:
+            self._jobs[job.id] = job
+        job.client = client
+        job.runner = runner or self._runner
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        self.evict_finished()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def resume(self, job: AnalysisJob, client) -> AnalysisJob:
+        """Re-queue a failed job; completed stages are skipped"""
+        with self._lock:
+            if job.status != "failed":
+                raise ValueError(f"Job is {job.status}, only failed jobs can be resumed")
+            if self._jobs.get(job.id) is not job:
+                raise ValueError("Job has expired and can no longer be resumed")
+            job.status = "queued"
+        job.error = None
+        job.failed_stage = None
+        job.client = client
+        self._executor.submit(self._run, job)
+        return job
+
+    def evict_finished(self):
+        """Forget finished jobs past their retention (failed ones past the
+        resume TTL), oldest first beyond max_finished, and delete the upload
+        and state failed jobs kept for resuming"""
+        now = time.monotonic()
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.status in ("completed", "failed")),
+                              key=lambda job: job.finished_at)
+            excess = len(finished) - self.max_finished
+            expired = []
+            for rank, job in enumerate(finished):
+                ttl = self.resume_ttl_seconds if job.status == "failed" else self.retention_seconds
+                if rank < excess or now - job.finished_at > ttl:
+                    expired.append(self._jobs.pop(job.id))
+        for job in expired:
+            job.state = {}
+            job.client = None
+            if job.upload_path:
+                shutil.rmtree(os.path.dirname(job.upload_path), ignore_errors=True)
+        if expired:
+            print(f"  Evicted {len(expired)} finished jobs")
+
+    def _run(self, job: AnalysisJob):
+        try:
+            self._execute(job)
+        finally:
+            if self._on_finish is not None:
+                self._on_finish(job)
+
+    def _execute(self, job: AnalysisJob):
+        job.status = "running"
+        job.attempts += 1
+        print(f"⚙️ Job {job.id} started (attempt {job.attempts}) for project {job.project_id}")
+        try:
+            job.result = job.runner(job)
+        except Exception as e:
+            job.finished_at = time.monotonic()
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = _now()
+            print(f"❌ Job {job.id} failed in stage '{job.failed_stage}': {e}")
+            traceback.print_exc()
+            return
+
+        job.finished_at = time.monotonic()
+        job.status = "completed"
+        job.updated_at = _now()
+        job.state = {}
+        job.client = None
+        shutil.rmtree(os.path.dirname(job.upload_path), ignore_errors=True)
+        print(f"✓ Job {job.id} completed: {job.result}")
@@ -0,0 +1,275 @@
+"""
+Force-directed wallet layout, computed once per analysis.
+
+A vectorized Fruchterman-Reingold layout over the distinct (undirected)
+wallet pairs of a CompactGraph. Attraction runs over the edge arrays;
+repulsion, the O(n^2) part, is split the way Barnes-Hut splits it:
+
+    near field  exact, between wallets in the same or adjacent cells of a
+                grid sized for about one wallet per cell
+    far field   every cell's wallet count convolved (by FFT) with the
+                repulsion kernel, i.e. each wallet feels the other cells as
+                point masses at their centres
+
+so an iteration costs O(n + edges + cells log cells). The layout is
+multilevel: the graph is coarsened by edge matching, the coarsest level is
+laid out first and each finer level refines its parent's positions. A
+gravity term keeps disconnected components in view. Positions are in
+pixels, scaled so that linked wallets sit about LAYOUT_EDGE_LENGTH apart,
+and centred on 0.
+"""
+
+import os
+import time
+
+import numpy as np
+from scipy.signal import fftconvolve
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from graph_core import CompactGraph
+
+LAYOUT_ITERATIONS = int(os.getenv("LAYOUT_ITERATIONS", "80"))
+LAYOUT_TIME_BUDGET_SECONDS = float(os.getenv("LAYOUT_TIME_BUDGET_SECONDS", "60"))
+LAYOUT_EDGE_LENGTH = float(os.getenv("LAYOUT_EDGE_LENGTH", "40"))
+LAYOUT_GRAVITY = float(os.getenv("LAYOUT_GRAVITY", "0.1"))
+
+# Target wallets per grid cell, and the grid resolution cap (the far field is
+# an FFT over a grid of about twice this size per side)
+CELL_OCCUPANCY = 1
+MAX_GRID = 1024
+
+# Coarsening stops at this many wallets, or when a level shrinks by less than
+# the ratio; finer levels start their refinement at REFINE_TEMPERATURE
+MIN_COARSE_NODES = 100
+COARSENING_RATIO = 0.8
+REFINE_TEMPERATURE = 2.0
+
+_EPSILON = 1e-9
+
+
+def undirected_pairs(graph: CompactGraph) -> tuple:
+    """Distinct unordered (u, v) wallet pairs with u < v, self-transfers dropped"""
+    src = graph.succ_src.astype(np.int64)
+    dst = graph.succ.astype(np.int64)
+    low, high = np.minimum(src, dst), np.maximum(src, dst)
+    keys = np.unique((low * graph.num_nodes + high)[low != high])
+    return keys // graph.num_nodes, keys % graph.num_nodes
+
+
+def _scatter(disp: np.ndarray, nodes: np.ndarray, force: np.ndarray):
+    size = len(disp)
+    disp[:, 0] += np.bincount(nodes, weights=force[:, 0], minlength=size)
+    disp[:, 1] += np.bincount(nodes, weights=force[:, 1], minlength=size)
+
+
+def _attraction(pos: np.ndarray, u: np.ndarray, v: np.ndarray, disp: np.ndarray):
+    # |f| = d^2 / k with k = 1, along the edge
+    delta = pos[u] - pos[v]
+    force = delta * np.sqrt((delta ** 2).sum(axis=1))[:, None]
+    _scatter(disp, u, -force)
+    _scatter(disp, v, force)
+
+
+# Half of the 3x3 neighbourhood, so every pair of adjacent cells is visited once
+_NEAR_OFFSETS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def _repulsion(pos: np.ndarray, disp: np.ndarray):
+    n = len(pos)
+    grid = int(min(max(1, np.sqrt(n / CELL_OCCUPANCY)), MAX_GRID))
+    # Grid over the bulk of the layout; outliers share the border cells
+    low = np.percentile(pos, 0.5, axis=0)
+    high = np.percentile(pos, 99.5, axis=0)
+    cell_size = max(float((high - low).max()) / grid, _EPSILON)
+    raw_cells = ((pos - low) // cell_size).astype(np.int64)
+    outside = ((raw_cells < 0) | (raw_cells >= grid)).any(axis=1)
+    cells = np.clip(raw_cells, 0, grid - 1)
+    cell_ids = cells[:, 1] * grid + cells[:, 0]
+    counts = np.bincount(cell_ids, minlength=grid * grid)
+    starts = np.cumsum(counts) - counts
+    by_cell = np.argsort(cell_ids, kind='stable')
+
+    # Near field: exact |f| = k^2 / d between wallets in adjacent cells
+    for dx, dy in _NEAR_OFFSETS:
+        x, y = cells[:, 0] + dx, cells[:, 1] + dy
+        valid = (x >= 0) & (x < grid) & (y >= 0) & (y < grid)
+        sources = np.flatnonzero(valid)
+        partner_cells = y[valid] * grid + x[valid]
+        lengths = counts[partner_cells]
+        src = np.repeat(sources, lengths)
+        within = np.arange(len(src)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        dst = by_cell[np.repeat(starts[partner_cells], lengths) + within]
+        if dx == 0 and dy == 0:
+            keep = dst > src
+            src, dst = src[keep], dst[keep]
+        delta = pos[src] - pos[dst]
+        force = delta / ((delta ** 2).sum(axis=1) + _EPSILON)[:, None]
+        _scatter(disp, src, force)
+        _scatter(disp, dst, -force)
+
+    # Far field: cell counts convolved with the kernel, outside the 3x3 block
+    if grid > 2:
+        offsets = np.arange(-(grid - 1), grid)
+        offset_x, offset_y = np.meshgrid(offsets, offsets)
+        distance2 = (offset_x ** 2 + offset_y ** 2) * cell_size ** 2
+        far = (np.abs(offset_x) > 1) | (np.abs(offset_y) > 1)
+        kernel_x = np.where(far, offset_x * cell_size / np.maximum(distance2, _EPSILON), 0.0)
+        kernel_y = np.where(far, offset_y * cell_size / np.maximum(distance2, _EPSILON), 0.0)
+        density = counts.reshape(grid, grid).astype(np.float64)
+        field_x = fftconvolve(density, kernel_x, mode='same')
+        field_y = fftconvolve(density, kernel_y, mode='same')
+        field = np.column_stack([field_x[cells[:, 1], cells[:, 0]], field_y[cells[:, 1], cells[:, 0]]])
+        # A border cell's field is wrong for the outliers clipped into it;
+        # seen from outside the grid, everything else is one point mass
+        if outside.any():
+            delta = pos[outside] - pos.mean(axis=0)
+            field[outside] = n * delta / ((delta ** 2).sum(axis=1) + _EPSILON)[:, None]
+        disp += field
+
+
+def _coarsen(n: int, u: np.ndarray, v: np.ndarray, rng) -> np.ndarray:
+    """Coarse code of every wallet: a randomized edge matching (pairs whose
+    random edge weight is the best at both ends), then unmatched leaves fold
+    into their neighbour"""
+    partner = np.arange(n)
+    matched = np.zeros(n, dtype=bool)
+    for _ in range(3):
+        live = ~matched[u] & ~matched[v]
+        if not live.any():
+            break
+        eu, ev = u[live], v[live]
+        weight = rng.random(len(eu))
+        best = np.zeros(n)
+        np.maximum.at(best, eu, weight)
+        np.maximum.at(best, ev, weight)
+        mutual = (best[eu] == weight) & (best[ev] == weight)
+        partner[eu[mutual]], partner[ev[mutual]] = ev[mutual], eu[mutual]
+        matched[eu[mutual]] = matched[ev[mutual]] = True
+    representative = np.minimum(np.arange(n), partner)
+
+    degree = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+    leaf_u = (degree[u] == 1) & ~matched[u]
+    leaf_v = (degree[v] == 1) & ~matched[v]
+    representative[u[leaf_u]] = representative[v[leaf_u]]
+    representative[v[leaf_v]] = representative[u[leaf_v]]
+    return np.unique(representative, return_inverse=True)[1]
+
+
+def _levels(n: int, u: np.ndarray, v: np.ndarray, rng) -> list:
+    """Coarsening hierarchy, finest first: (n, u, v, mapping to the next level)"""
+    levels = []
+    while n > MIN_COARSE_NODES:
+        mapping = _coarsen(n, u, v, rng)
+        coarse_n = int(mapping.max()) + 1
+        if coarse_n > COARSENING_RATIO * n:
+            break
+        levels.append((n, u, v, mapping))
+        cu, cv = mapping[u], mapping[v]
+        low, high = np.minimum(cu, cv), np.maximum(cu, cv)
+        keys = np.unique((low * coarse_n + high)[low != high])
+        n, u, v = coarse_n, keys // coarse_n, keys % coarse_n
+    levels.append((n, u, v, None))
+    return levels
+
+
+def _refine(pos: np.ndarray, u: np.ndarray, v: np.ndarray, iterations: int,
+            start_temperature: float, deadline: float) -> bool:
+    """Fruchterman-Reingold iterations in place; False if the deadline passed"""
+    for iteration in range(iterations):
+        disp = np.zeros_like(pos)
+        _attraction(pos, u, v, disp)
+        _repulsion(pos, disp)
+        disp -= LAYOUT_GRAVITY * pos
+
+        # Moves are capped by a temperature that cools linearly to ~0
+        temperature = start_temperature * (1 - iteration / iterations) + 0.01
+        length = np.sqrt((disp ** 2).sum(axis=1))
+        pos += disp * (np.minimum(length, temperature) / np.maximum(length, _EPSILON))[:, None]
+        if time.perf_counter() > deadline:
+            return False
+    return True
+
+
+def force_layout(graph: CompactGraph, iterations: int = LAYOUT_ITERATIONS,
+                 time_budget: float = LAYOUT_TIME_BUDGET_SECONDS, seed: int = 0) -> np.ndarray:
+    """(num_nodes, 2) pixel positions of every wallet, deterministic for a given graph
+
+    Multilevel: the coarsest graph is laid out from random positions, then
+    each finer level starts from its coarse wallet's position and is refined
+    with a cooler, shorter schedule, so large structures are placed before
+    the detail and do not fold over themselves.
+    """
+    if graph.num_nodes == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    u, v = undirected_pairs(graph)
+    levels = _levels(graph.num_nodes, u, v, rng)
+    deadline = time.perf_counter() + time_budget
+
+    n, u, v, _ = levels[-1]
+    side = np.sqrt(n)
+    pos = rng.uniform(-side / 2, side / 2, size=(n, 2))
+    finished = _refine(pos, u, v, iterations, side / 10, deadline)
+    for n, u, v, mapping in reversed(levels[:-1]):
+        # Area grows with the wallet count
+        pos = pos[mapping] * np.sqrt(n / len(pos)) + rng.normal(0, 0.1, size=(n, 2))
+        if finished:
+            finished = _refine(pos, u, v, max(iterations // 4, 1), REFINE_TEMPERATURE, deadline)
+    if not finished:
+        print(f"  ⚠️ Layout cut short by its {time_budget:.0f}s time budget")
+
+    pos -= pos.mean(axis=0)
+    return pos * LAYOUT_EDGE_LENGTH
+
+
+def _place_at_mean(result: np.ndarray, placed: np.ndarray, targets: np.ndarray, sources: np.ndarray, rng):
+    """Put each target at the mean of its source positions, plus jitter"""
+    count = np.bincount(targets, minlength=len(result))
+    frontier = np.flatnonzero(count)
+    for axis in (0, 1):
+        total = np.bincount(targets, weights=sources[:, axis], minlength=len(result))
+        result[frontier, axis] = total[frontier] / count[frontier]
+    result[frontier] += rng.normal(0, LAYOUT_EDGE_LENGTH / 2, size=(len(frontier), 2))
+    placed[frontier] = True
+
+
+def place_new_nodes(positions: np.ndarray, num_nodes: int, src: np.ndarray, dst: np.ndarray,
+                    seed: int = 0) -> np.ndarray:
+    """Positions of all `num_nodes` wallets, given the layout of the first
+    len(positions): each new wallet goes to the mean position of its placed
+    neighbours, spreading outwards from the existing layout, plus a little
+    jitter. `src`/`dst` only need the transfers that touch a new wallet."""
+    known = len(positions)
+    rng = np.random.default_rng(seed)
+    result = np.zeros((num_nodes - known, 2))
+    placed = np.zeros(num_nodes - known, dtype=bool)
+
+    # (neighbour, new wallet) pairs in both directions, new wallets numbered from 0
+    neighbour = np.concatenate([src, dst]).astype(np.int64)
+    wallet = np.concatenate([dst, src]).astype(np.int64)
+    keep = (wallet >= known) & (neighbour != wallet)
+    neighbour, wallet = neighbour[keep], wallet[keep] - known
+    laid_out = neighbour < known
+    _place_at_mean(result, placed, wallet[laid_out], positions[neighbour[laid_out]], rng)
+    neighbour, wallet = neighbour[~laid_out] - known, wallet[~laid_out]
+
+    components = None
+    while not placed.all():
+        edges = placed[neighbour] & ~placed[wallet]
+        if edges.any():
+            _place_at_mean(result, placed, wallet[edges], result[neighbour[edges]], rng)
+            continue
+        # One wallet of each component with nothing placed goes on the
+        # layout's rim, and the rest of the component spreads from it
+        if components is None:
+            adjacency = coo_matrix((np.ones(len(wallet)), (neighbour, wallet)), shape=(len(placed),) * 2)
+            components = connected_components(adjacency, directed=False)[1]
+        rest = np.flatnonzero(~placed)
+        seeds = rest[np.unique(components[rest], return_index=True)[1]]
+        radius = max(np.sqrt((positions ** 2).sum(axis=1)).max(initial=0.0),
+                     np.sqrt((result[placed] ** 2).sum(axis=1)).max(initial=0.0))
+        angle = rng.uniform(0, 2 * np.pi, len(seeds))
+        result[seeds] = (radius + LAYOUT_EDGE_LENGTH) * np.column_stack([np.cos(angle), np.sin(angle)])
+        placed[seeds] = True
+    return np.concatenate([positions, result])
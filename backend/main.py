@@ -1,17 +1,29 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Header, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Header, Form, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from typing import Optional, List, Dict, Any
 import os
-import random
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import pandas as pd
-import io
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from collections import defaultdict, deque
 import ollama
 import json
+from fastapi.concurrency import run_in_threadpool
+from ingest import detect_format, read_header, iter_transaction_chunks
+from jobs import AnalysisJob, JobManager
+from pipeline import PIPELINE_STAGES, APPEND_STAGES, run_project_analysis, run_append_analysis
+from graph_store import delete_project_graph, load_compact_graph
+from exposure import EXPOSURE_MAX_HOPS, exposure_report
+from taint import TAINT_MODELS, taint_report
+from scoring import ScoringConfig
+from detector_registry import DETECTORS
+from patterns import decode_patterns, load_pattern_results, patterns_response
+from paging import ANALYSIS_MAX_PAGE_SIZE, ANALYSIS_PAGE_SIZE, AnalysisTotals, fetch_page, iter_pages, ndjson_error, stream_analysis
+from wire import COLUMNAR_MEDIA_TYPE, error_frame, stream_columnar
+from response_cache import CACHE_CONTROL, ResponseCache, etag_matches
 
 # Load environment variables
 load_dotenv()
@@ -34,6 +46,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Pattern and analysis payloads are large and repetitive
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 print(f"CORS configured for: http://localhost:5173")
 
@@ -54,6 +68,12 @@ except Exception as e:
 
 print("=" * 50)
 
+# Serialized analysis/pattern responses and project versions for conditional GETs
+response_cache = ResponseCache()
+
+# Background analysis jobs (bounded worker pool); finished jobs change project data
+job_manager = JobManager(run_project_analysis, on_finish=lambda job: response_cache.invalidate(job.project_id))
+
 # Pydantic models
 class ProjectCreate(BaseModel):
     name: str
@@ -74,6 +94,7 @@ class WalletResponse(BaseModel):
     x: float
     y: float
     riskScore: int
+    riskFactors: Optional[dict] = None
     inflow: float
     outflow: float
     transactionCount: int
@@ -105,6 +126,16 @@ class NoteResponse(BaseModel):
     created_by: str
     created_at: str
 
+class ExposureRequest(BaseModel):
+    seeds: List[str]  # Wallet hashes to measure exposure to (mixers, flagged wallets)
+    maxHops: int = EXPOSURE_MAX_HOPS
+    minExposure: float = 0.0
+
+class TaintRequest(BaseModel):
+    sources: List[str]  # Wallet hashes the tainted funds originate from
+    model: str = "haircut"  # "poison", "haircut" or "fifo"
+    minShare: float = 0.0
+
 class AssistantContext(BaseModel):
     project: Optional[Dict[str, Any]] = None
     wallet: Optional[Dict[str, Any]] = None
@@ -142,194 +173,6 @@ async def get_current_user(authorization: str = Header(...)):
         print(f"❌ Auth failed: {str(e)}")
         raise HTTPException(status_code=401, detail=str(e))
 
-# ============================================================================
-# ADVANCED PATTERN DETECTION FUNCTIONS
-# ============================================================================
-
-def detect_circular_transactions(tx_graph: dict, transactions: list, time_tolerance_hours: int = 24) -> dict:
-    """Detect circular transactions (funds returning to origin within time window)"""
-    from datetime import datetime, timedelta
-    
-    circular_wallets = defaultdict(int)
-    
-    # Build transaction timestamp map
-    tx_time_map = {}
-    for tx in transactions:
-        key = f"{tx['from_wallet']}->{tx['to_wallet']}"
-        if tx.get('timestamp'):
-            try:
-                tx_time_map[key] = datetime.fromisoformat(tx['timestamp'].replace('Z', '+00:00'))
-            except:
-                pass
-    
-    def find_cycles(start: str, current: str, path: list, visited: set, depth: int = 0, start_time=None) -> list:
-        if depth > 6:  # Max cycle length
-            return []
-        
-        cycles = []
-        neighbors = tx_graph.get(current, {}).get('out', set())
-        
-        for neighbor in neighbors:
-            if neighbor == start and len(path) >= 3:  # Cycle found
-                # Check time constraint if timestamps available
-                if start_time:
-                    end_key = f"{current}->{neighbor}"
-                    if end_key in tx_time_map:
-                        end_time = tx_time_map[end_key]
-                        time_diff = (end_time - start_time).total_seconds() / 3600  # hours
-                        if time_diff <= time_tolerance_hours:
-                            cycles.append(path + [neighbor])
-                else:
-                    # No timestamp data, include cycle
-                    cycles.append(path + [neighbor])
-            elif neighbor not in visited and depth < 6:
-                # Get start time for first hop
-                first_hop_time = start_time
-                if not first_hop_time:
-                    first_key = f"{start}->{path[1] if len(path) > 1 else neighbor}"
-                    first_hop_time = tx_time_map.get(first_key)
-                
-                cycles.extend(find_cycles(start, neighbor, path + [neighbor], visited | {neighbor}, depth + 1, first_hop_time))
-        
-        return cycles
-    
-    # Find cycles from each wallet
-    processed = set()
-    for wallet in tx_graph.keys():
-        if wallet not in processed:
-            cycles = find_cycles(wallet, wallet, [wallet], set())
-            if cycles:
-                # Mark all wallets in cycles as processed
-                for cycle in cycles:
-                    for w in cycle:
-                        processed.add(w)
-                circular_wallets[wallet] = len(cycles)
-    
-    print(f"    Found {len(circular_wallets)} wallet clusters with {sum(circular_wallets.values())} total cycles")
-    return dict(circular_wallets)
-
-def detect_layering_pattern(tx_graph: dict, transactions: list) -> dict:
-    """Detect layering (funds split through multiple intermediaries)"""
-    layering_wallets = {}
-    
-    def bfs_branching(start: str) -> int:
-        """Count branching paths up to depth 3"""
-        visited = {start}
-        queue = deque([(start, 0, 1)])  # (node, depth, branch_count)
-        max_branches = 1
-        intermediaries = set()
-        
-        while queue:
-            node, depth, branches = queue.popleft()
-            if depth >= 3:
-                continue
-            
-            neighbors = tx_graph.get(node, {}).get('out', set())
-            if len(neighbors) >= 2:
-                max_branches = max(max_branches, len(neighbors))
-                intermediaries.update(neighbors)
-            
-            for neighbor in neighbors:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, depth + 1, len(neighbors)))
-        
-        return max_branches if len(intermediaries) >= 5 else 0
-    
-    for wallet in tx_graph.keys():
-        branches = bfs_branching(wallet)
-        if branches >= 2:
-            layering_wallets[wallet] = branches
-    
-    return layering_wallets
-
-def detect_structuring_pattern(wallets_dict: dict, transactions: list, small_tx_threshold: float = 10000, time_window_hours: int = 1) -> dict:
-    """Detect structuring/smurfing (many small txs to avoid thresholds)"""
-    structuring_wallets = {}
-    
-    for wallet, stats in wallets_dict.items():
-        # Count outgoing small transactions
-        small_tx_count = 0
-        for tx in transactions:
-            if tx['from_wallet'] == wallet and tx['amount'] < small_tx_threshold:
-                small_tx_count += 1
-        
-        # Flag if ≥10 small transfers with high total volume
-        if small_tx_count >= 10 and stats['outflow'] > 100000:
-            structuring_wallets[wallet] = small_tx_count
-    
-    return structuring_wallets
-
-def detect_rapid_inout_pattern(wallets_dict: dict, transactions: list, holding_time_minutes: int = 10) -> dict:
-    """Detect rapid in-out (pass-through wallets)"""
-    passthrough_wallets = {}
-    
-    for wallet, stats in wallets_dict.items():
-        if stats['inflow'] > 0 and stats['outflow'] >= stats['inflow'] * 0.9:  # ≥90% of inflow
-            passthrough_wallets[wallet] = (stats['outflow'] / stats['inflow']) if stats['inflow'] > 0 else 0
-    
-    return passthrough_wallets
-
-def detect_dormant_activation(wallets_dict: dict, transactions: list, dormant_days: int = 90) -> dict:
-    """Detect dormant wallet activation"""
-    activated_wallets = {}
-    
-    for wallet, stats in wallets_dict.items():
-        # In this context, assume all wallets in dataset are "recently activated"
-        # In production, track historical inactivity from timestamps
-        high_activity = stats['tx_count'] >= 20 and (stats['inflow'] > 100000 or stats['outflow'] > 100000)
-        if high_activity:
-            activated_wallets[wallet] = stats['tx_count']
-    
-    return activated_wallets
-
-def detect_mixer_interaction(tx_graph: dict, wallets_dict: dict) -> dict:
-    """Detect mixer/tumbler interaction"""
-    known_mixers = {
-        # Common mixer patterns - in production, maintain active list
-        '0x0000000000000000000000000000000000000000',  # Zero address
-        '0xdeaddeaddeaddeaddeaddeaddeaddeaddead',  # Common test mixer
-    }
-    
-    mixer_wallets = {}
-    for wallet in tx_graph.keys():
-        neighbors_in = tx_graph.get(wallet, {}).get('in', set())
-        neighbors_out = tx_graph.get(wallet, {}).get('out', set())
-        
-        if any(n in known_mixers for n in neighbors_in) or any(n in known_mixers for n in neighbors_out):
-            mixer_wallets[wallet] = 1
-    
-    return mixer_wallets
-
-def detect_peel_chain(tx_graph: dict, transactions: list) -> dict:
-    """Detect peel chain (sequential value peeling)"""
-    peel_chains = {}
-    
-    def find_linear_chains(start: str, chain: Optional[list] = None) -> list:
-        if chain is None:
-            chain = [start]
-        
-        if len(chain) >= 5:  # Chain length ≥5
-            return [chain]
-        
-        neighbors = tx_graph.get(chain[-1], {}).get('out', set())
-        chains = []
-        
-        if len(neighbors) == 1:  # Linear continuation
-            next_node = list(neighbors)[0]
-            chains.extend(find_linear_chains(next_node, chain + [next_node]))
-        elif len(chain) >= 5:
-            chains.append(chain)
-        
-        return chains
-    
-    for wallet in tx_graph.keys():
-        chains = find_linear_chains(wallet)
-        if chains:
-            peel_chains[wallet] = len(chains[0]) if chains else 0
-    
-    return peel_chains
-
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -363,17 +206,17 @@ async def upload_dataset(
     user = Depends(get_current_user)
 ):
     """
-    Upload CSV dataset for analysis
+    Upload a dataset (CSV, Parquet or Arrow IPC) for analysis
     Expected columns: source_wallet, destination_wallet, timestamp, amount, token_type
     """
     try:
-        # Read CSV file
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        upload = file.file
+        upload_format = detect_format(upload, file.filename)
+        columns = read_header(upload, upload_format)
         
         # Validate required columns
         required_columns = ['source_wallet', 'destination_wallet', 'timestamp', 'amount', 'token_type']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in required_columns if col not in columns]
         
         if missing_columns:
             raise HTTPException(
@@ -381,26 +224,51 @@ async def upload_dataset(
                 detail=f"Missing required columns: {', '.join(missing_columns)}"
             )
         
-        # Basic statistics
-        stats = {
-            "total_transactions": len(df),
-            "unique_wallets": len(set(df['source_wallet'].tolist() + df['destination_wallet'].tolist())),
-            "date_range": {
-                "start": df['timestamp'].min(),
-                "end": df['timestamp'].max()
-            },
-            "total_amount": float(df['amount'].sum()),
-            "token_types": df['token_type'].unique().tolist()
-        }
+        column_mapping = dict(zip(['from_wallet', 'to_wallet', 'timestamp', 'amount', 'token_type'], required_columns))
+        
+        def summarize() -> dict:
+            """Basic statistics, streamed chunk by chunk (only the required columns are read)"""
+            total_transactions = 0
+            wallets = set()
+            token_types = set()
+            total_amount = 0.0
+            start, end = None, None
+            for chunk in iter_transaction_chunks(upload, column_mapping, upload_format):
+                total_transactions += len(chunk)
+                wallets.update(chunk['from_wallet'].unique())
+                wallets.update(chunk['to_wallet'].unique())
+                token_types.update(chunk['token_type'].unique())
+                total_amount += float(chunk['amount'].sum())
+                timestamps = chunk['timestamp'].dropna()
+                if len(timestamps):
+                    start = min(start, timestamps.min()) if start is not None else timestamps.min()
+                    end = max(end, timestamps.max()) if end is not None else timestamps.max()
+            return {
+                "total_transactions": total_transactions,
+                "unique_wallets": len(wallets),
+                "date_range": {
+                    "start": start,
+                    "end": end
+                },
+                "total_amount": total_amount,
+                "token_types": sorted(token_types)
+            }
+        
+        stats = await run_in_threadpool(summarize)
         
         return {
             "message": "Dataset uploaded successfully",
             "filename": file.filename,
+            "format": upload_format,
             "statistics": stats
         }
         
+    except HTTPException:
+        raise
     except pd.errors.ParserError:
         raise HTTPException(status_code=400, detail="Invalid CSV format")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -470,225 +338,13 @@ async def create_project(
         project_id = created_project['id']
         print(f"✓ Project created with ID: {project_id}")
         
-        # Process CSV if uploaded
-        wallet_count = 0
+        # Queue the CSV analysis as a background job
+        job = None
         if file:
-            try:
-                print(f"📊 Processing CSV file...")
-                contents = await file.read()
-                df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-                
-                # Accept flexible column names
-                column_mapping = {}
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if 'from' in col_lower or 'source' in col_lower:
-                        column_mapping['from_wallet'] = col
-                    elif 'to' in col_lower or 'dest' in col_lower or 'target' in col_lower:
-                        column_mapping['to_wallet'] = col
-                    elif 'amount' in col_lower or 'value' in col_lower:
-                        column_mapping['amount'] = col
-                    elif 'time' in col_lower or 'date' in col_lower:
-                        column_mapping['timestamp'] = col
-                    elif 'token' in col_lower or 'currency' in col_lower or 'type' in col_lower:
-                        column_mapping['token_type'] = col
-                
-                # Check if we have required columns
-                if 'from_wallet' not in column_mapping or 'to_wallet' not in column_mapping or 'amount' not in column_mapping:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="CSV must contain columns for: from/source address, to/destination address, and amount"
-                    )
-                
-                # Process transactions
-                transactions_to_insert = []
-                wallets_dict = {}
-                
-                for _, row in df.iterrows():
-                    from_wallet = str(row[column_mapping['from_wallet']])
-                    to_wallet = str(row[column_mapping['to_wallet']])
-                    amount = float(row[column_mapping['amount']])
-                    
-                    # Get timestamp if available
-                    timestamp = None
-                    if 'timestamp' in column_mapping:
-                        timestamp = str(row[column_mapping['timestamp']])
-                    
-                    # Get token type if available
-                    token_type = 'ETH'
-                    if 'token_type' in column_mapping:
-                        token_type = str(row[column_mapping['token_type']])
-                    
-                    # Track wallets
-                    if from_wallet not in wallets_dict:
-                        wallets_dict[from_wallet] = {'inflow': 0, 'outflow': 0, 'tx_count': 0}
-                    if to_wallet not in wallets_dict:
-                        wallets_dict[to_wallet] = {'inflow': 0, 'outflow': 0, 'tx_count': 0}
-                    
-                    wallets_dict[from_wallet]['outflow'] += amount
-                    wallets_dict[from_wallet]['tx_count'] += 1
-                    wallets_dict[to_wallet]['inflow'] += amount
-                    wallets_dict[to_wallet]['tx_count'] += 1
-                    
-                    transactions_to_insert.append({
-                        "project_id": project_id,
-                        "from_wallet": from_wallet,
-                        "to_wallet": to_wallet,
-                        "amount": amount,
-                        "timestamp": timestamp,
-                        "token_type": token_type
-                    })
-                
-                # Insert transactions in batches
-                if transactions_to_insert:
-                    batch_size = 100
-                    for i in range(0, len(transactions_to_insert), batch_size):
-                        batch = transactions_to_insert[i:i + batch_size]
-                        user_supabase.table('transactions').insert(batch).execute()
-                
-                # Build adjacency list for chain detection
-                tx_graph = {}
-                for transaction in transactions_to_insert:
-                    src = transaction['from_wallet']
-                    dst = transaction['to_wallet']
-                    if src not in tx_graph:
-                        tx_graph[src] = {'out': set(), 'in': set()}
-                    if dst not in tx_graph:
-                        tx_graph[dst] = {'out': set(), 'in': set()}
-                    tx_graph[src]['out'].add(dst)
-                    tx_graph[dst]['in'].add(src)
-                
-                print(f"  Graph built: {len(tx_graph)} nodes in adjacency list")
-                
-                # Run advanced pattern detection
-                print("  Detecting advanced AML patterns...")
-                circular_txs = detect_circular_transactions(tx_graph, transactions_to_insert)
-                layering = detect_layering_pattern(tx_graph, transactions_to_insert)
-                structuring = detect_structuring_pattern(wallets_dict, transactions_to_insert)
-                passthrough = detect_rapid_inout_pattern(wallets_dict, transactions_to_insert)
-                dormant_activation = detect_dormant_activation(wallets_dict, transactions_to_insert)
-                mixer_interaction = detect_mixer_interaction(tx_graph, wallets_dict)
-                peel_chains = detect_peel_chain(tx_graph, transactions_to_insert)
-                
-                print(f"    Circular transactions: {len(circular_txs)}")
-                print(f"    Layering patterns: {len(layering)}")
-                print(f"    Structuring/Smurfing: {len(structuring)}")
-                print(f"    Pass-through wallets: {len(passthrough)}")
-                print(f"    Dormant activations: {len(dormant_activation)}")
-                print(f"    Mixer interactions: {len(mixer_interaction)}")
-                print(f"    Peel chains: {len(peel_chains)}")
-                
-                # Insert wallets with enhanced risk scoring
-                wallets_to_insert = []
-                risk_scores_list = []
-                intermediary_count = 0
-                max_in_degree = 0
-                max_out_degree = 0
-                for wallet_hash, stats in wallets_dict.items():
-                    risk_score = 0
-                    
-                    # Pattern 1: Chain/Mixing detection - detect intermediary behavior
-                    # Intermediaries have multiple in AND multiple out connections
-                    in_degree = len(tx_graph.get(wallet_hash, {}).get('in', set()))
-                    out_degree = len(tx_graph.get(wallet_hash, {}).get('out', set()))
-                    
-                    max_in_degree = max(max_in_degree, in_degree)
-                    max_out_degree = max(max_out_degree, out_degree)
-                    
-                    # Intermediary wallet (suspicious mixing/layering activity)
-                    if in_degree >= 3 and out_degree >= 3:
-                        risk_score += 60  # High risk - clear intermediary/mixing pattern
-                        intermediary_count += 1
-                    elif in_degree >= 2 and out_degree >= 2:
-                        risk_score += 40  # Medium risk - potential mixing
-                    
-                    # Pattern 2: High fan-in (concentration point - many senders)
-                    if in_degree >= 50:
-                        risk_score += 55  # Major aggregation point
-                    elif in_degree >= 20:
-                        risk_score += 45  # Significant aggregation
-                    elif in_degree >= 10:
-                        risk_score += 35  # Moderate aggregation
-                    elif in_degree > 0 and out_degree == 0 and stats['inflow'] > 100:
-                        risk_score += 25  # Simple sink
-                    
-                    # Pattern 3: Source wallet (distribution point)
-                    if out_degree > 0 and in_degree == 0 and stats['outflow'] > 100:
-                        risk_score += 35  # Source of funds
-                    
-                    # Pattern 4: Imbalanced inflow/outflow (loss of value = fee evasion)
-                    if stats['inflow'] > 0 and stats['outflow'] > 0:
-                        ratio = max(stats['outflow'] / stats['inflow'], stats['inflow'] / stats['outflow']) if min(stats['inflow'], stats['outflow']) > 0 else 1
-                        if ratio > 3:
-                            risk_score += 25  # Large value loss
-                        elif ratio > 2:
-                            risk_score += 15  # Moderate value loss
-                        elif ratio > 1.3:
-                            risk_score += 8   # Small value loss
-                    
-                    # Pattern 5: High transaction volume (even at lower thresholds for this dataset)
-                    if stats['tx_count'] > 40:
-                        risk_score += 15
-                    elif stats['tx_count'] > 30:
-                        risk_score += 8
-                    
-                    # NEW ADVANCED PATTERNS
-                    # Pattern 6: Circular Transactions (Looping)
-                    if wallet_hash in circular_txs:
-                        risk_score += 35  # Value moves in cycles back to origin
-                    
-                    # Pattern 7: Layering Pattern (Multi-hop Distribution)
-                    if wallet_hash in layering:
-                        risk_score += 30  # Funds split through multiple intermediaries
-                    
-                    # Pattern 8: Structuring/Smurfing (Many small transactions)
-                    if wallet_hash in structuring:
-                        risk_score += 32  # Many small transfers to avoid thresholds
-                    
-                    # Pattern 9: Rapid In-Out (Pass-Through Wallets)
-                    if wallet_hash in passthrough:
-                        risk_score += 28  # Quick in and out (≥90% of inflow)
-                    
-                    # Pattern 10: Dormant Wallet Activation
-                    if wallet_hash in dormant_activation:
-                        risk_score += 25  # Sudden activity after dormancy
-                    
-                    # Pattern 11: Mixer Interaction
-                    if wallet_hash in mixer_interaction:
-                        risk_score += 40  # Interaction with known mixing services
-                    
-                    # Pattern 12: Peel Chain (Sequential Value Peeling)
-                    if wallet_hash in peel_chains:
-                        risk_score += 27  # Long linear chains with gradual peeling
-                    
-                    wallets_to_insert.append({
-                        "project_id": project_id,
-                        "wallet_hash": wallet_hash,
-                        "risk_score": min(risk_score, 100),
-                        "inflow": stats['inflow'],
-                        "outflow": stats['outflow'],
-                        "transaction_count": stats['tx_count'],
-                        "position_x": random.uniform(-300, 300),
-                        "position_y": random.uniform(-250, 250)
-                    })
-                    risk_scores_list.append(min(risk_score, 100))
-                
-                # Insert wallets
-                if wallets_to_insert:
-                    user_supabase.table('wallets').insert(wallets_to_insert).execute()
-                    wallet_count = len(wallets_to_insert)
-                    avg_risk = sum(risk_scores_list) / len(risk_scores_list) if risk_scores_list else 0
-                    high_risk_count = len([r for r in risk_scores_list if r >= 70])
-                    print(f"✓ CSV processed: {len(transactions_to_insert)} transactions, {wallet_count} wallets")
-                    print(f"  Risk scores: avg={avg_risk:.1f}, high-risk (≥70)={high_risk_count}")
-                    print(f"  Intermediaries detected: {intermediary_count}")
-                    print(f"  Max in_degree: {max_in_degree}, Max out_degree: {max_out_degree}")
-                    print(f"  Risk distribution: min={min(risk_scores_list) if risk_scores_list else 0}, max={max(risk_scores_list) if risk_scores_list else 0}")
-                    
-            except pd.errors.ParserError:
-                print(f"⚠️ CSV parsing failed, project created without data")
-            except Exception as csv_err:
-                print(f"⚠️ CSV processing error: {csv_err}")
+            job = AnalysisJob(project_id, user_id, file.filename, PIPELINE_STAGES)
+            await run_in_threadpool(job_manager.save_upload, job, file.file)
+            job_manager.submit(job, user_supabase)
+            print(f"📥 Analysis job {job.id} queued for project {project_id}")
         
         print(f"✓ Project creation complete")
         return {
@@ -697,7 +353,9 @@ async def create_project(
             "description": created_project.get('description'),
             "dataset": created_project.get('dataset_name'),
             "createdAt": created_project['created_at'],
-            "walletCount": wallet_count
+            "walletCount": 0,
+            "jobId": job.id if job else None,
+            "jobStatus": job.status if job else None
         }
         
     except HTTPException:
@@ -709,6 +367,62 @@ async def create_project(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/projects/{project_id}/transactions")
+async def append_transactions(
+    project_id: str,
+    file: UploadFile = File(...),
+    auth_context = Depends(get_current_user)
+):
+    """Append transactions to a project and re-score the wallets they affect"""
+    try:
+        user_supabase = auth_context["supabase"]
+        user_id = auth_context["user"].user.id
+        print(f"➕ Appending {file.filename} to project {project_id} for user: {user_id}")
+
+        # Verify ownership
+        project = user_supabase.table('projects').select("id").eq('id', project_id).eq('user_id', user_id).execute()
+        if not project.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        job = AnalysisJob(project_id, user_id, file.filename, APPEND_STAGES)
+        await run_in_threadpool(job_manager.save_upload, job, file.file)
+        job_manager.submit(job, user_supabase, runner=run_append_analysis)
+        print(f"📥 Append job {job.id} queued for project {project_id}")
+
+        return {"projectId": project_id, "jobId": job.id, "jobStatus": job.status}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error appending transactions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, auth_context = Depends(get_current_user)):
+    """Get progress of a background analysis job"""
+    user_id = auth_context["user"].user.id
+    job = job_manager.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str, auth_context = Depends(get_current_user)):
+    """Resume a failed analysis job from the stage that failed"""
+    user_id = auth_context["user"].user.id
+    job = job_manager.get(job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        job_manager.resume(job, auth_context["supabase"])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    print(f"🔁 Job {job_id} resumed")
+    return job.to_dict()
+
+
 @app.delete("/api/projects/{project_id}")
 async def delete_project(project_id: str, auth_context = Depends(get_current_user)):
     """Delete a project"""
@@ -730,6 +444,8 @@ async def delete_project(project_id: str, auth_context = Depends(get_current_use
         user_supabase.table('transactions').delete().eq('project_id', project_id).execute()
         user_supabase.table('analyses').delete().eq('project_id', project_id).execute()
         user_supabase.table('projects').delete().eq('id', project_id).execute()
+        delete_project_graph(project_id)
+        response_cache.invalidate(project_id)
         
         print(f"✓ Project deleted successfully")
         return {"message": "Project deleted"}
@@ -737,9 +453,36 @@ async def delete_project(project_id: str, auth_context = Depends(get_current_use
     except Exception as e:
         print(f"❌ Error deleting project: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+def _owned_project(user_supabase, project_id: str, user_id: str) -> dict:
+    """The project (id, name, version) if the user owns it, read from the
+    database so its version is current whichever worker wrote it last"""
+    rows = (user_supabase.table('projects').select("id, name, user_id, created_at, updated_at")
+            .eq('id', project_id).eq('user_id', user_id).execute())
+    if not rows.data:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return response_cache.remember(rows.data[0])
+
+
+def _json_body(content) -> bytes:
+    # Same encoding as FastAPI's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
 @app.get("/api/projects/{project_id}/analysis")
-async def get_project_analysis(project_id: str, auth_context = Depends(get_current_user)):
-    """Get analysis data (wallets and transactions) for a project"""
+async def get_project_analysis(
+    project_id: str,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    auth_context = Depends(get_current_user)
+):
+    """Get analysis data (wallets and transactions) for a project
+
+    With `Accept: application/x-ndjson` the analysis is streamed page by
+    page (see paging.stream_analysis) instead of returned as one document;
+    with `Accept: application/x-chainsleuth-columnar` the pages are streamed
+    as binary typed columns (see wire.py). Responses carry an ETag of the
+    project's version and are answered with 304 when it still matches.
+    """
     try:
         user = auth_context["user"]
         user_supabase = auth_context["supabase"]
@@ -747,60 +490,207 @@ async def get_project_analysis(project_id: str, auth_context = Depends(get_curre
         print(f"📈 Fetching analysis for project {project_id}")
         
         # Verify ownership
-        project = user_supabase.table('projects').select("*").eq('id', project_id).eq('user_id', user_id).execute()
-        if not project.data:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        project_data = project.data[0]
-        
-        # Get wallets
-        wallets_response = user_supabase.table('wallets').select("*").eq('project_id', project_id).execute()
-        wallets = []
-        for w in wallets_response.data:
-            wallets.append({
-                "id": w['id'],
-                "hash": w['wallet_hash'],
-                "x": float(w.get('position_x', 0)),
-                "y": float(w.get('position_y', 0)),
-                "riskScore": int(w.get('risk_score', 0)),
-                "inflow": float(w.get('inflow', 0.0)),
-                "outflow": float(w.get('outflow', 0.0)),
-                "transactionCount": int(w.get('transaction_count', 0))
-            })
-        
-        # Get transactions
-        tx_response = user_supabase.table('transactions').select("*").eq('project_id', project_id).execute()
-        transactions = []
-        for tx in tx_response.data:
-            transactions.append({
-                "id": tx['id'],
-                "from_wallet": tx['from_wallet'],
-                "to_wallet": tx['to_wallet'],
-                "amount": float(tx['amount']),
-                "timestamp": tx.get('timestamp'),
-                "token_type": tx.get('token_type', 'ETH')
+        project = await run_in_threadpool(_owned_project, user_supabase, project_id, user_id)
+
+        if accept and COLUMNAR_MEDIA_TYPE in accept:
+            variant, media_type = 'columnar', COLUMNAR_MEDIA_TYPE
+        elif accept and "application/x-ndjson" in accept:
+            variant, media_type = 'ndjson', "application/x-ndjson"
+        else:
+            variant, media_type = 'json', "application/json"
+        etag = response_cache.etag(project, variant)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"}
+
+        if etag_matches(if_none_match, etag):
+            print(f"✓ Analysis not modified ({variant})")
+            return Response(status_code=304, headers=headers)
+        cached = response_cache.get(project, variant)
+        if cached is not None:
+            print(f"✓ Analysis served from cache ({variant}, {len(cached[1]) / 1024:.0f} KiB)")
+            return Response(cached[1], media_type=cached[0], headers=headers)
+
+        if variant == 'columnar':
+            print(f"🌊 Streaming columnar analysis for project {project_id}")
+            chunks = response_cache.tee(project, variant, media_type, stream_columnar(user_supabase, project),
+                                        error_frame)
+            return StreamingResponse(chunks, media_type=media_type, headers=headers)
+        if variant == 'ndjson':
+            print(f"🌊 Streaming analysis for project {project_id}")
+            chunks = response_cache.tee(project, variant, media_type, stream_analysis(user_supabase, project),
+                                        ndjson_error)
+            return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+        def collect() -> bytes:
+            totals = AnalysisTotals()
+            wallets, transactions = [], []
+            for page in iter_pages(user_supabase, 'wallets', project_id):
+                totals.add_wallets(page)
+                wallets.extend(page)
+            for page in iter_pages(user_supabase, 'transactions', project_id):
+                totals.add_transactions(page)
+                transactions.extend(page)
+            print(f"✓ Analysis data ready: {len(wallets)} wallets, {len(transactions)} transactions")
+            return _json_body({
+                "name": project['name'],
+                "wallets": wallets,
+                "transactions": transactions,
+                "statistics": totals.statistics()
             })
-        
-        # Calculate statistics
-        stats = {
-            "totalTransactions": len(transactions),
-            "uniqueWallets": len(wallets),
-            "suspiciousWallets": len([w for w in wallets if w['riskScore'] > 50]),
-            "totalVolume": sum(t['amount'] for t in transactions)
-        }
-        
-        print(f"✓ Analysis data ready: {len(wallets)} wallets, {len(transactions)} transactions")
-        return {
-            "name": project_data['name'],
-            "wallets": wallets,
-            "transactions": transactions,
-            "statistics": stats
-        }
+
+        body = await run_in_threadpool(collect)
+        response_cache.put(project, variant, media_type, body)
+        return Response(body, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _paged_rows(table: str, project_id: str, after: Optional[str], limit: int, auth_context) -> dict:
+    user_supabase = auth_context["supabase"]
+    user_id = auth_context["user"].user.id
+
+    # Verify ownership
+    project = user_supabase.table('projects').select("id").eq('id', project_id).eq('user_id', user_id).execute()
+    if not project.data:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    items, next_cursor = fetch_page(user_supabase, table, project_id, after, limit)
+    return {"items": items, "nextCursor": next_cursor}
+
+
+@app.get("/api/projects/{project_id}/wallets")
+async def get_project_wallets(
+    project_id: str,
+    after: Optional[str] = None,
+    limit: int = Query(ANALYSIS_PAGE_SIZE, ge=1, le=ANALYSIS_MAX_PAGE_SIZE),
+    auth_context = Depends(get_current_user)
+):
+    """One page of a project's wallets by hash; pass `nextCursor` back as `after` for the next"""
+    try:
+        return await run_in_threadpool(_paged_rows, 'wallets', project_id, after, limit, auth_context)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching wallets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/projects/{project_id}/transactions")
+async def get_project_transactions(
+    project_id: str,
+    after: Optional[str] = None,
+    limit: int = Query(ANALYSIS_PAGE_SIZE, ge=1, le=ANALYSIS_MAX_PAGE_SIZE),
+    auth_context = Depends(get_current_user)
+):
+    """One page of a project's transactions by id; pass `nextCursor` back as `after` for the next"""
+    try:
+        return await run_in_threadpool(_paged_rows, 'transactions', project_id, after, limit, auth_context)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching transactions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/projects/{project_id}/patterns")
+async def get_project_patterns(
+    project_id: str,
+    if_none_match: Optional[str] = Header(None),
+    auth_context = Depends(get_current_user)
+):
+    """Pattern instances (type, member wallets, evidence transfers) stored by the last analysis"""
+    try:
+        user_supabase = auth_context["supabase"]
+        user_id = auth_context["user"].user.id
+
+        # Verify ownership
+        project = await run_in_threadpool(_owned_project, user_supabase, project_id, user_id)
+        etag = response_cache.etag(project, 'patterns')
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        cached = response_cache.get(project, 'patterns')
+        if cached is not None:
+            return Response(cached[1], media_type=cached[0], headers=headers)
+
+        def serialize() -> bytes:
+            results = load_pattern_results(user_supabase, project_id)
+            patterns = decode_patterns(results)
+            print(f"🧩 Serving {len(patterns)} stored patterns for project {project_id}")
+            return _json_body(dict(patterns_response(patterns), counts=(results or {}).get("counts", {})))
+
+        body = await run_in_threadpool(serialize)
+        response_cache.put(project, 'patterns', "application/json", body)
+        return Response(body, media_type="application/json", headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching patterns: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/projects/{project_id}/exposure")
+async def get_exposure(project_id: str, request: ExposureRequest, auth_context = Depends(get_current_user)):
+    """Hop distance and value-weighted exposure of wallets to a seed set"""
+    try:
+        user_supabase = auth_context["supabase"]
+        user_id = auth_context["user"].user.id
+
+        # Verify ownership
+        project = user_supabase.table('projects').select("id").eq('id', project_id).eq('user_id', user_id).execute()
+        if not project.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if not 1 <= request.maxHops <= 10:
+            raise HTTPException(status_code=400, detail="maxHops must be between 1 and 10")
+
+        graph = await run_in_threadpool(load_compact_graph, project_id)
+        if graph is None:
+            raise HTTPException(status_code=409, detail="Project graph not available; re-run the analysis")
+
+        report = await run_in_threadpool(exposure_report, graph, request.seeds, request.maxHops, request.minExposure)
+        print(f"🧭 Exposure to {report['seeds']} seed(s) in project {project_id}: {len(report['wallets'])} wallets")
+        return report
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error computing exposure: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/projects/{project_id}/taint")
+async def get_taint(project_id: str, request: TaintRequest, auth_context = Depends(get_current_user)):
+    """Propagate taint from source wallets through the project's transfers in time order"""
+    try:
+        user_supabase = auth_context["supabase"]
+        user_id = auth_context["user"].user.id
+
+        # Verify ownership
+        project = user_supabase.table('projects').select("id").eq('id', project_id).eq('user_id', user_id).execute()
+        if not project.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if request.model not in TAINT_MODELS:
+            raise HTTPException(status_code=400, detail=f"model must be one of: {', '.join(TAINT_MODELS)}")
+
+        graph = await run_in_threadpool(load_compact_graph, project_id)
+        if graph is None:
+            raise HTTPException(status_code=409, detail="Project graph not available; re-run the analysis")
+
+        report = await run_in_threadpool(taint_report, graph, request.sources, request.model, request.minShare)
+        print(f"🧪 {request.model} taint from {report['sources']} source(s) in project {project_id}: "
+              f"{len(report['wallets'])} wallets")
+        return report
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error propagating taint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/notes")
 async def create_note(
     project_id: str = Form(...),
@@ -952,19 +842,15 @@ AML PATTERNS YOU EXPLAIN:
 Circular Transactions: Funds moving in loops back to origin (high money laundering indicator)
 Layering: Funds split through multiple intermediaries to obscure source (obfuscation technique)
 Structuring/Smurfing: Many small transactions to avoid detection thresholds
-Pass-Through Wallets: Quick in-out movements (90%+ of inflow exits) - classic mixing pattern
+Pass-Through Wallets: 90%+ of inflow passed on with a short FIFO median holding time - classic mixing pattern
 Peel Chains: Sequential linear transactions with gradual value reduction
-Mixer Interactions: Direct contact with known mixing/tumbling services
+Mixer Interactions: Direct contact with known mixing/tumbling services, or material value exposure within a few hops
+Mixer Taint: A significant share of inflow traced back to mixers through time-ordered transfers
 Fan-In/Fan-Out: Concentration/distribution patterns (aggregation/dispersal of funds)
 Dormant Activation: Sudden high activity after long inactivity
 
 RISK SCORING FACTORS:
-- Intermediary behavior (3+ in AND 3+ out connections) = 60 points
-- High fan-in (50+ senders) = 55 points
-- Mixer interaction = 40 points
-- Circular transactions = 35 points
-- Layering patterns = 30 points
-- High value loss (imbalanced in/out) = 15-25 points
+""" + ScoringConfig.load().describe(DETECTORS) + """
 - Each point represents a specific behavioral indicator
 
 HOW TO RESPOND:
@@ -1000,6 +886,9 @@ CONSTRAINTS:
                     f"   Inflow: ${wallet.get('inflow', 0):,.2f} | Outflow: ${wallet.get('outflow', 0):,.2f}\n"
                     f"   Transactions: {wallet.get('transactionCount', 0)}"
                 )
+                if wallet.get('riskFactors'):
+                    factors = ", ".join(f"{f.get('pattern')} +{f.get('score')}" for f in wallet['riskFactors'])
+                    context_parts.append(f"   Score breakdown: {factors}")
                 context_summary = f"wallet {wallet.get('hash', '')[:8]}... (risk {wallet.get('riskScore', 'N/A')}/100)"
             
             if request.context.pattern:
@@ -0,0 +1,129 @@
+"""
+Keyset pagination over a project's wallets and transactions.
+
+Pages are ordered by a unique key (wallet_hash for wallets, id for
+transactions) and continue strictly after the last key of the previous
+page, so every page is one indexed range scan no matter how deep, and no
+query can run into the PostgREST row limit. The same pages back the
+paginated endpoints and the NDJSON analysis stream, which holds only one
+page in memory at a time.
+"""
+
+import json
+import os
+
+ANALYSIS_PAGE_SIZE = int(os.getenv("ANALYSIS_PAGE_SIZE", "1000"))
+# Largest page a client may ask for; keep it within PostgREST's max-rows,
+# since a page shorter than requested is taken as the last one
+ANALYSIS_MAX_PAGE_SIZE = int(os.getenv("ANALYSIS_MAX_PAGE_SIZE", "1000"))
+
+SUSPICIOUS_RISK_SCORE = 50
+
+# Table -> (keyset column, selected columns)
+PAGED_TABLES = {
+    'wallets': ('wallet_hash', "id, wallet_hash, position_x, position_y, risk_score, risk_factors, inflow, outflow, transaction_count"),
+    'transactions': ('id', "id, from_wallet, to_wallet, amount, timestamp, token_type"),
+}
+
+
+def wallet_json(w: dict) -> dict:
+    return {
+        "id": w['id'],
+        "hash": w['wallet_hash'],
+        "x": float(w.get('position_x') or 0),
+        "y": float(w.get('position_y') or 0),
+        "riskScore": int(w.get('risk_score') or 0),
+        "riskFactors": w.get('risk_factors'),
+        "inflow": float(w.get('inflow') or 0.0),
+        "outflow": float(w.get('outflow') or 0.0),
+        "transactionCount": int(w.get('transaction_count') or 0)
+    }
+
+
+def transaction_json(tx: dict) -> dict:
+    return {
+        "id": tx['id'],
+        "from_wallet": tx['from_wallet'],
+        "to_wallet": tx['to_wallet'],
+        "amount": float(tx['amount']),
+        "timestamp": tx.get('timestamp'),
+        "token_type": tx.get('token_type') or 'ETH'
+    }
+
+
+_FORMATTERS = {'wallets': wallet_json, 'transactions': transaction_json}
+
+
+def fetch_page(client, table: str, project_id: str, after: str = None, limit: int = ANALYSIS_PAGE_SIZE) -> tuple:
+    """One page of `table` rows after key `after`, as API dicts, and the cursor of the next page (None at the end)"""
+    key, columns = PAGED_TABLES[table]
+    limit = max(1, min(limit, ANALYSIS_MAX_PAGE_SIZE))
+    query = client.table(table).select(columns).eq('project_id', project_id)
+    if after is not None:
+        query = query.gt(key, after)
+    rows = query.order(key).limit(limit).execute().data or []
+    next_cursor = rows[-1][key] if len(rows) == limit else None
+    return [_FORMATTERS[table](row) for row in rows], next_cursor
+
+
+def iter_pages(client, table: str, project_id: str, page_size: int = ANALYSIS_PAGE_SIZE):
+    """Every row of `table` for a project, one page (list of API dicts) at a time"""
+    cursor = None
+    while True:
+        items, cursor = fetch_page(client, table, project_id, cursor, page_size)
+        if items:
+            yield items
+        if cursor is None:
+            return
+
+
+class AnalysisTotals:
+    """Running dashboard statistics, accumulated page by page"""
+
+    def __init__(self):
+        self.wallets = 0
+        self.suspicious = 0
+        self.transactions = 0
+        self.volume = 0.0
+
+    def add_wallets(self, wallets: list):
+        self.wallets += len(wallets)
+        self.suspicious += sum(1 for w in wallets if w['riskScore'] > SUSPICIOUS_RISK_SCORE)
+
+    def add_transactions(self, transactions: list):
+        self.transactions += len(transactions)
+        self.volume += sum(t['amount'] for t in transactions)
+
+    def statistics(self) -> dict:
+        return {
+            "totalTransactions": self.transactions,
+            "uniqueWallets": self.wallets,
+            "suspiciousWallets": self.suspicious,
+            "totalVolume": self.volume
+        }
+
+
+def ndjson_line(message: dict) -> bytes:
+    return (json.dumps(message, separators=(',', ':')) + "\n").encode()
+
+
+def stream_analysis(client, project: dict, page_size: int = ANALYSIS_PAGE_SIZE):
+    """NDJSON lines of a project's analysis: its name, then wallet and transaction pages, then statistics
+
+    Each line is one JSON object with a "type" of project, wallets,
+    transactions or statistics; a failure after the response started is
+    reported as a final "error" line (see ndjson_error).
+    """
+    totals = AnalysisTotals()
+    yield ndjson_line({"type": "project", "id": project['id'], "name": project['name']})
+    for wallets in iter_pages(client, 'wallets', project['id'], page_size):
+        totals.add_wallets(wallets)
+        yield ndjson_line({"type": "wallets", "items": wallets})
+    for transactions in iter_pages(client, 'transactions', project['id'], page_size):
+        totals.add_transactions(transactions)
+        yield ndjson_line({"type": "transactions", "items": transactions})
+    yield ndjson_line({"type": "statistics", "statistics": totals.statistics()})
+
+
+def ndjson_error(e: Exception) -> bytes:
+    return ndjson_line({"type": "error", "detail": str(e)})
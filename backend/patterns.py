@@ -0,0 +1,341 @@
+"""
+Pattern instances for the dashboard.
+
+After scoring, every detector hit (plus the structural fan-in, fan-out and
+high-volume signals) becomes a pattern instance: its type, the wallet it is
+about, member wallets and a bounded sample of evidence transfers taken from
+the compact graph. Instances are stored once per project in
+analyses.results_json, with wallets interned and the whole list zlib-compressed,
+and served by GET /api/projects/{id}/patterns, so the browser never runs
+graph algorithms.
+"""
+
+import base64
+import json
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from graph_core import CompactGraph, NAT
+from cycles import strongly_connected_components
+from detectors import KNOWN_MIXERS, STRUCTURING_SMALL_TX
+
+# Bounds on what one project stores
+PATTERN_MAX_INSTANCES = int(os.getenv("PATTERN_MAX_INSTANCES", "2000"))  # per type, highest counts kept
+PATTERN_MAX_MEMBERS = int(os.getenv("PATTERN_MAX_MEMBERS", "25"))
+PATTERN_MAX_EDGES = int(os.getenv("PATTERN_MAX_EDGES", "20"))
+
+# Structural patterns scored client-side before; thresholds kept as they were
+FAN_MIN_COUNTERPARTIES = 4
+FAN_CRITICAL_COUNTERPARTIES = 8
+HIGH_VOLUME_MIN_TRANSACTIONS = 15
+HIGH_VOLUME_CRITICAL_TRANSACTIONS = 30
+
+RESULTS_VERSION = 1
+
+# Detector state key -> (pattern type, severity)
+DETECTOR_PATTERNS = {
+    'circular_txs': ('circular', 'critical'),
+    'layering': ('layering', 'high'),
+    'structuring': ('structuring', 'high'),
+    'passthrough': ('pass-through', 'high'),
+    'dormant_activation': ('dormant', 'high'),
+    'mixer_interaction': ('mixer', 'critical'),
+    'peel_chains': ('peel-chain', 'medium'),
+    'mixer_taint': ('taint', 'critical'),
+}
+SEVERITIES = ('critical', 'high', 'medium')
+
+
+def _iso_to_ns(value) -> int:
+    return pd.Timestamp(value).value if value else NAT
+
+
+def _ns_to_ms(timestamps: np.ndarray) -> list:
+    return [None if ts == NAT else ts // 10 ** 6 for ts in timestamps.tolist()]
+
+
+class _Evidence:
+    """Evidence transfers of one wallet, picked from the compact graph"""
+
+    def __init__(self, graph: CompactGraph):
+        self.graph = graph
+
+    def transfers(self, code: int, outbound: bool = True, inbound: bool = True, counterparties=None,
+                  since: int = NAT, until: int = None, below: float = None) -> list:
+        """[sender, receiver, amount, epoch ms] of the wallet's largest matching transfers, in time order"""
+        graph = self.graph
+        parts = []
+        if outbound:
+            lo, hi = graph.out_ptr[code], graph.out_ptr[code + 1]
+            parts.append((np.full(hi - lo, code), graph.out_nbr[lo:hi], graph.out_amount[lo:hi], graph.out_timestamp[lo:hi]))
+        if inbound:
+            lo, hi = graph.in_ptr[code], graph.in_ptr[code + 1]
+            parts.append((graph.in_nbr[lo:hi], np.full(hi - lo, code), graph.in_amount[lo:hi], graph.in_timestamp[lo:hi]))
+        if not parts:
+            return []
+        senders, receivers, amounts, times = (np.concatenate(column) for column in zip(*parts))
+
+        keep = times >= since
+        if until is not None:
+            keep &= times <= until
+        if below is not None:
+            keep &= amounts < below
+        if counterparties is not None:
+            other = np.where(senders == code, receivers, senders)
+            keep &= np.isin(other, counterparties)
+        senders, receivers, amounts, times = senders[keep], receivers[keep], amounts[keep], times[keep]
+
+        if len(amounts) > PATTERN_MAX_EDGES:
+            largest = np.argsort(-amounts, kind='stable')[:PATTERN_MAX_EDGES]
+            senders, receivers, amounts, times = senders[largest], receivers[largest], amounts[largest], times[largest]
+        order = np.argsort(times, kind='stable')
+        return [list(row) for row in zip(senders[order].tolist(), receivers[order].tolist(),
+                                          amounts[order].tolist(), _ns_to_ms(times[order]))]
+
+
+def _instance(pattern_type: str, code: int, severity: str, count, details: str, members, edges: list,
+              risk_score=None) -> dict:
+    members = [code] + [int(m) for m in members if m != code][:PATTERN_MAX_MEMBERS - 1]
+    return {"type": pattern_type, "wallet": code, "severity": severity, "count": count, "details": details,
+            "riskScore": risk_score, "members": members, "edges": edges}
+
+
+# Instance count of a detector hit. Instances of a type are ranked by count,
+# highest first (fewest hops first for mixers), ties in wallet code order,
+# and the first PATTERN_MAX_INSTANCES are kept
+_COUNTS = {
+    'circular_txs': lambda wallet, detail, stats: detail,
+    'layering': lambda wallet, detail, stats: detail,
+    'structuring': lambda wallet, detail, stats: detail["transfers"],
+    'passthrough': lambda wallet, detail, stats: stats['tx_count'],
+    'dormant_activation': lambda wallet, detail, stats: detail["burstTransfers"],
+    'mixer_interaction': lambda wallet, detail, stats: detail["hops"],
+    'peel_chains': lambda wallet, detail, stats: detail["length"],
+    'mixer_taint': lambda wallet, detail, stats: round(detail["taintedShare"] * 100),
+}
+ASCENDING_TYPES = ('mixer',)
+
+
+def _rank(pattern_type: str, count, code: int) -> tuple:
+    return (count if pattern_type in ASCENDING_TYPES else -count), code
+
+
+def build_patterns(graph: CompactGraph, wallets_dict: dict, state: dict, detectors: list, weights: dict,
+                   wallets: set = None) -> list:
+    """Pattern instances of every detector hit and structural signal, using graph codes.
+
+    `weights` maps detector state keys to their risk points; `wallets`, when
+    given, limits instances to those wallets (re-scored wallets of an append).
+    """
+    evidence = _Evidence(graph)
+    codes = {wallet: code for wallet, code in zip(wallets_dict, graph.codes(list(wallets_dict)).tolist())}
+    in_scope = (lambda wallet: wallet in codes) if wallets is None else (lambda wallet: wallet in codes and wallet in wallets)
+    patterns = []
+
+    labels = None
+    mixer_codes = graph.codes(KNOWN_MIXERS)
+    mixer_codes = mixer_codes[mixer_codes >= 0]
+    for spec in detectors:
+        pattern_type, severity = DETECTOR_PATTERNS.get(spec.key, (spec.key, 'high'))
+        risk_score = weights.get(spec.key)
+        count = _COUNTS.get(spec.key, lambda wallet, detail, stats: 1)
+        hits = [(wallet, detail) for wallet, detail in state[spec.key].items() if in_scope(wallet)]
+        if spec.key == 'peel_chains':
+            hits = [(wallet, detail) for wallet, detail in hits if detail["members"][0] == wallet]  # One per chain
+        # Evidence only for the instances that are kept
+        hits.sort(key=lambda hit: _rank(pattern_type, count(hit[0], hit[1], wallets_dict[hit[0]]), codes[hit[0]]))
+        for wallet, detail in hits[:PATTERN_MAX_INSTANCES]:
+            code = codes[wallet]
+
+            if spec.key == 'circular_txs':
+                if labels is None:
+                    labels = strongly_connected_components(graph)[1]
+                neighbours = np.union1d(graph.successors(code), graph.predecessors(code))
+                members = neighbours[labels[neighbours] == labels[code]]
+                patterns.append(_instance(pattern_type, code, severity, detail,
+                                          f"{detail} cycle(s) return funds to this wallet", members,
+                                          evidence.transfers(code, counterparties=members), risk_score))
+            elif spec.key == 'layering':
+                members = graph.successors(code)
+                patterns.append(_instance(pattern_type, code, severity, detail,
+                                          f"Funds split up to {detail} ways within 2 hops", members,
+                                          evidence.transfers(code, inbound=False), risk_score))
+            elif spec.key == 'structuring':
+                edges = evidence.transfers(code, inbound=False, since=_iso_to_ns(detail.get("windowStart")),
+                                           until=_iso_to_ns(detail["windowEnd"]) if detail.get("windowEnd") else None,
+                                           below=STRUCTURING_SMALL_TX)
+                patterns.append(_instance(pattern_type, code, severity, detail["transfers"],
+                                          f"{detail['transfers']} small transfers in one window "
+                                          f"({detail['amount']:,.2f} total)", [], edges, risk_score))
+            elif spec.key == 'passthrough':
+                held = detail.get("medianHoldingMinutes")
+                details = f"{detail['passThroughRatio']:.0%} of inflow passed on"
+                if held is not None:
+                    details += f", median hold {held:g} min"
+                patterns.append(_instance(pattern_type, code, severity, wallets_dict[wallet]['tx_count'], details, [],
+                                          evidence.transfers(code), risk_score))
+            elif spec.key == 'dormant_activation':
+                patterns.append(_instance(pattern_type, code, severity, detail["burstTransfers"],
+                                          f"Active again after {detail['dormantDays']:g} dormant days "
+                                          f"({detail['burstTransfers']} transfers)", [],
+                                          evidence.transfers(code, since=_iso_to_ns(detail["reactivatedAt"])),
+                                          risk_score))
+            elif spec.key == 'mixer_interaction':
+                if detail["hops"] == 1:
+                    members = np.intersect1d(np.union1d(graph.successors(code), graph.predecessors(code)), mixer_codes)
+                    details, edges = "Transacts directly with a known mixer", evidence.transfers(code, counterparties=members)
+                else:
+                    share = max(detail["inboundExposure"], detail["outboundExposure"])
+                    members, edges = [], evidence.transfers(code)
+                    details = f"{share:.0%} value exposure to mixers {detail['hops']} hops away"
+                patterns.append(_instance(pattern_type, code, severity, detail["hops"], details, members, edges,
+                                          risk_score))
+            elif spec.key == 'peel_chains':
+                members = graph.codes(detail["members"])
+                edges = []
+                for sender, receiver in zip(members[:-1].tolist(), members[1:].tolist()):
+                    edges.extend(evidence.transfers(sender, inbound=False, counterparties=[receiver])[:1])
+                patterns.append(_instance(pattern_type, code, severity, detail["length"],
+                                          f"Linear chain of {detail['length']} wallets peeling "
+                                          f"{detail['peeledValue']:,.2f}", members, edges[:PATTERN_MAX_EDGES],
+                                          risk_score))
+            elif spec.key == 'mixer_taint':
+                patterns.append(_instance(pattern_type, code, severity, round(detail["taintedShare"] * 100),
+                                          f"{detail['taintedShare']:.0%} of inflow traced back to mixers", [],
+                                          evidence.transfers(code, outbound=False), risk_score))
+            else:
+                patterns.append(_instance(pattern_type, code, severity, 1, f"Flagged by {spec.name}", [],
+                                          evidence.transfers(code), risk_score))
+
+    # Structural signals, strongest first
+    scope = [wallet for wallet in wallets_dict if in_scope(wallet)]
+    scope_codes = np.array([codes[wallet] for wallet in scope], dtype=np.int64)
+    tx_counts = np.fromiter((wallets_dict[wallet]['tx_count'] for wallet in scope), dtype=np.int64, count=len(scope))
+    signals = (
+        ('fan-out', graph.out_degree[scope_codes], FAN_MIN_COUNTERPARTIES, FAN_CRITICAL_COUNTERPARTIES),
+        ('fan-in', graph.in_degree[scope_codes], FAN_MIN_COUNTERPARTIES, FAN_CRITICAL_COUNTERPARTIES),
+        ('high-volume', tx_counts, HIGH_VOLUME_MIN_TRANSACTIONS, HIGH_VOLUME_CRITICAL_TRANSACTIONS),
+    )
+    for pattern_type, counts, minimum, critical in signals:
+        selected = np.flatnonzero(counts >= minimum)
+        selected = selected[np.lexsort((scope_codes[selected], -counts[selected]))][:PATTERN_MAX_INSTANCES]
+        for code, count in zip(scope_codes[selected].tolist(), counts[selected].tolist()):
+            severity = 'critical' if count >= critical else 'high'
+            if pattern_type == 'fan-out':
+                patterns.append(_instance(pattern_type, code, severity, count, f"Sends to {count} wallets",
+                                          graph.successors(code), evidence.transfers(code, inbound=False)))
+            elif pattern_type == 'fan-in':
+                patterns.append(_instance(pattern_type, code, severity, count, f"Receives from {count} wallets",
+                                          graph.predecessors(code), evidence.transfers(code, outbound=False)))
+            else:
+                patterns.append(_instance(pattern_type, code, severity, count, f"{count} transactions", [],
+                                          evidence.transfers(code)))
+
+    # Codes -> hashes
+    hashes = graph.wallets
+    for pattern in patterns:
+        pattern["wallet"] = hashes[pattern["wallet"]]
+        pattern["members"] = hashes[pattern["members"]].tolist()
+        for edge in pattern["edges"]:
+            edge[0], edge[1] = hashes[edge[0]], hashes[edge[1]]
+    return patterns
+
+
+# ----------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------
+
+def _interned(patterns: list) -> dict:
+    """Instances with wallet hashes replaced by indexes into one wallet list"""
+    wallet_ids = {}
+
+    def intern(wallet: str) -> int:
+        return wallet_ids.setdefault(wallet, len(wallet_ids))
+
+    types = sorted({p["type"] for p in patterns})
+    type_ids = {name: i for i, name in enumerate(types)}
+    rows = [
+        [type_ids[p["type"]], intern(p["wallet"]), SEVERITIES.index(p["severity"]), p["count"], p["details"],
+         p["riskScore"], [intern(m) for m in p["members"]],
+         [[intern(sender), intern(receiver), amount, ms] for sender, receiver, amount, ms in p["edges"]]]
+        for p in patterns
+    ]
+    return {"types": types, "wallets": list(wallet_ids), "patterns": rows}
+
+
+def encode_patterns(patterns: list) -> dict:
+    """results_json payload: per-type counts plus the interned, compressed instances"""
+    body = json.dumps(_interned(patterns), separators=(",", ":"))
+    counts = {}
+    for p in patterns:
+        counts[p["type"]] = counts.get(p["type"], 0) + 1
+    return {
+        "version": RESULTS_VERSION,
+        "encoding": "zlib+base64",
+        "counts": counts,
+        "data": base64.b64encode(zlib.compress(body.encode(), 6)).decode(),
+    }
+
+
+def decode_patterns(results: dict) -> list:
+    """Pattern instances stored by encode_patterns ([] for missing or older results)"""
+    if not results or results.get("version") != RESULTS_VERSION:
+        return []
+    body = json.loads(zlib.decompress(base64.b64decode(results["data"])))
+    types, wallets = body["types"], body["wallets"]
+    return [
+        {"type": types[type_id], "wallet": wallets[wallet], "severity": SEVERITIES[severity], "count": count,
+         "details": details, "riskScore": risk_score, "members": [wallets[m] for m in members],
+         "edges": [[wallets[sender], wallets[receiver], amount, ms] for sender, receiver, amount, ms in edges]}
+        for type_id, wallet, severity, count, details, risk_score, members, edges in body["patterns"]
+    ]
+
+
+def merge_patterns(existing: list, updated: list, wallets: set, wallet_index: pd.Index) -> list:
+    """Replace the instances of re-scored `wallets` in `existing` with `updated`,
+    then rank and cap every type as build_patterns does (`wallet_index` gives
+    the graph code of each wallet hash)"""
+    merged = [p for p in existing if p["wallet"] not in wallets] + updated
+    codes = wallet_index.get_indexer([p["wallet"] for p in merged]).tolist()
+    by_type = {}
+    for pattern, code in zip(merged, codes):
+        by_type.setdefault(pattern["type"], []).append((_rank(pattern["type"], pattern["count"], code), pattern))
+    patterns = []
+    for ranked in by_type.values():
+        ranked.sort(key=lambda item: item[0])
+        patterns.extend(pattern for _, pattern in ranked[:PATTERN_MAX_INSTANCES])
+    return patterns
+
+
+def patterns_response(patterns: list) -> dict:
+    """API shape: interned like storage, with named fields (the dashboard expands wallet indexes)"""
+    interned = _interned(patterns)
+    types = interned["types"]
+    return {
+        "wallets": interned["wallets"],
+        "patterns": [
+            {"type": types[type_id], "wallet": wallet, "severity": SEVERITIES[severity], "count": count,
+             "details": details, "riskScore": risk_score, "members": members, "edges": edges}
+            for type_id, wallet, severity, count, details, risk_score, members, edges in interned["patterns"]
+        ],
+    }
+
+
+def load_pattern_results(client, project_id: str) -> dict:
+    """The project's stored results_json (None if it has none)"""
+    response = client.table('analyses').select("results_json").eq('project_id', project_id) \
+        .order('created_at', desc=True).limit(1).execute()
+    return response.data[0]['results_json'] if response.data else None
+
+
+def save_pattern_results(client, project_id: str, results: dict, dataset_name: str = None):
+    """Store the project's results (one analyses row per project, updated in place)"""
+    values = {"results_json": results}
+    if dataset_name is not None:
+        values["dataset_name"] = dataset_name
+    updated = client.table('analyses').update(values).eq('project_id', project_id).execute()
+    if not updated.data:
+        client.table('analyses').insert(dict(values, project_id=project_id)).execute()
@@ -0,0 +1,152 @@
+"""
+High-throughput bulk persistence.
+
+Rows are written in large batches sent concurrently with bounded parallelism.
+Every row carries a deterministic key and batches are upserted with
+ON CONFLICT DO NOTHING, so retrying a partially failed write never
+duplicates rows.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Iterable
+
+from postgrest.types import ReturnMethod
+
+PERSIST_BATCH_ROWS = int(os.getenv("PERSIST_BATCH_ROWS", "5000"))
+PERSIST_CONCURRENCY = int(os.getenv("PERSIST_CONCURRENCY", "4"))
+PERSIST_MAX_RETRIES = int(os.getenv("PERSIST_MAX_RETRIES", "3"))
+
+# Namespace for deterministic transaction row ids
+TRANSACTION_ID_NAMESPACE = uuid.UUID("5f0c9c1e-3b0e-4f57-9a43-0c6f2d1a7e21")
+
+
+def transaction_row_id(project_id: str, source_id: str, ordinal: int) -> str:
+    """Stable primary key for the `ordinal`-th row of an upload"""
+    return str(uuid.uuid5(TRANSACTION_ID_NAMESPACE, f"{project_id}:{source_id}:{ordinal}"))
+
+
+class BulkWriteStats:
+    """Rows written, batches sent and throughput of one bulk write"""
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "rowsPerSec": round(self.rows_per_sec, 1),
+        }
+
+
+class BulkWriter:
+    """Idempotent, concurrent batch upserts into one table.
+
+    By default conflicting rows are skipped (ON CONFLICT DO NOTHING); with
+    `ignore_duplicates=False` they are updated with the sent columns instead.
+
+    `write` consumes an iterable of row lists (e.g. one list per ingest chunk),
+    re-slices them into `batch_rows` batches and keeps at most `concurrency`
+    batches in flight, so memory stays bounded by the batch size.
+
+    `on_progress(rows)` is called with the number of leading rows that are
+    known to be written (a contiguous watermark), which callers can checkpoint
+    to skip work on a retry.
+    """
+
+    def __init__(self, client, table: str, on_conflict: str,
+                 batch_rows: int = PERSIST_BATCH_ROWS,
+                 concurrency: int = PERSIST_CONCURRENCY,
+                 max_retries: int = PERSIST_MAX_RETRIES,
+                 ignore_duplicates: bool = True):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.batch_rows = batch_rows
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.stats = BulkWriteStats()
+        self._lock = threading.Lock()
+
+    def _send(self, batch: list):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.table(self.table).upsert(
+                    batch,
+                    on_conflict=self.on_conflict,
+                    ignore_duplicates=self.ignore_duplicates,
+                    returning=ReturnMethod.minimal,
+                ).execute()
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.stats.retries += 1
+                time.sleep(0.5 * 2 ** attempt)
+
+    def _batches(self, chunks: Iterable[list]):
+        pending = []
+        for rows in chunks:
+            pending.extend(rows)
+            if len(pending) < self.batch_rows:
+                continue
+            full = len(pending) - len(pending) % self.batch_rows
+            for start in range(0, full, self.batch_rows):
+                yield pending[start:start + self.batch_rows]
+            pending = pending[full:]
+        if pending:
+            yield pending
+
+    def write(self, chunks: Iterable[list], on_progress=None, start_offset: int = 0) -> BulkWriteStats:
+        started = time.perf_counter()
+        in_flight = {}
+        done_sizes = {}
+        next_watermark = 0
+        watermark = start_offset
+
+        def collect(futures):
+            nonlocal next_watermark, watermark
+            for future in futures:
+                index, size = in_flight.pop(future)
+                future.result()
+                done_sizes[index] = size
+                self.stats.rows += size
+                self.stats.batches += 1
+            # Advance the contiguous watermark over finished batches
+            while next_watermark in done_sizes:
+                watermark += done_sizes.pop(next_watermark)
+                next_watermark += 1
+            if on_progress:
+                on_progress(watermark)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"persist-{self.table}") as executor:
+            try:
+                for index, batch in enumerate(self._batches(chunks)):
+                    if len(in_flight) >= self.concurrency:
+                        finished, _ = wait(in_flight, return_when=FIRST_EXCEPTION)
+                        collect(finished)
+                    in_flight[executor.submit(self._send, batch)] = (index, len(batch))
+                finished, _ = wait(in_flight)
+                collect(finished)
+            finally:
+                self.stats.seconds = time.perf_counter() - started
+
+        print(f"  Persisted {self.stats.rows} {self.table} rows in {self.stats.batches} batches "
+              f"({self.stats.rows_per_sec:,.0f} rows/sec)")
+        return self.stats
+
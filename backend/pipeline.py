@@ -0,0 +1,465 @@
+"""
+Project analysis pipeline.
+
+parse -> graph build -> each detector -> scoring -> patterns -> layout -> persist
+
+Stages run on a background job (see jobs.py). Every stage keeps its output in
+`job.state`, so a failed job resumes from the stage that failed instead of
+starting over.
+"""
+
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ingest import detect_format, read_header, map_columns, missing_required_fields, iter_transaction_chunks, chunk_to_records
+from persistence import BulkWriter, PERSIST_BATCH_ROWS, transaction_row_id
+from dataset_cache import AnalysisCache
+from graph_store import ProjectGraph, project_lock, load_project_graph, save_project_graph, append_project_graph
+from graph_core import CompactGraph
+from detector_registry import DETECTORS
+from detector_pool import run_detector_stages
+from scoring import ScoringConfig, wallet_features, detector_hits, score_features
+from patterns import build_patterns, encode_patterns, decode_patterns, merge_patterns, load_pattern_results, save_pattern_results
+from layout import force_layout, place_new_nodes
+
+PIPELINE_STAGES = ['parse', 'graph_build'] + [spec.name for spec in DETECTORS] + ['scoring', 'patterns', 'layout', 'persist']
+
+# Everything before persistence can be served from the content-addressed cache
+CACHEABLE_STAGES = PIPELINE_STAGES[:-1]
+CACHED_STATE_KEYS = ['upload_format', 'column_mapping', 'transaction_count', 'compact_graph', 'project_graph',
+                     'wallets_to_insert', 'patterns'] + [spec.key for spec in DETECTORS]
+
+# Appending transactions re-scores wallets within AFFECTED_HOPS of the new
+# transfers; detectors see CONTEXT_HOPS more so their walks from every
+# re-scored wallet stay inside the extracted subgraph. Project-wide
+# detectors (taint) see the whole merged graph instead.
+APPEND_AFFECTED_HOPS = int(os.getenv("APPEND_AFFECTED_HOPS", "3"))
+APPEND_CONTEXT_HOPS = int(os.getenv("APPEND_CONTEXT_HOPS", "3"))
+
+APPEND_STAGES = ['parse', 'merge', 'neighbourhood'] + [spec.name for spec in DETECTORS] + ['scoring', 'patterns', 'layout', 'persist']
+
+analysis_cache = None
+if os.getenv("ANALYSIS_CACHE_ENABLED", "1") == "1":
+    try:
+        analysis_cache = AnalysisCache()
+    except PermissionError as e:
+        print(f"⚠️ Analysis cache disabled: {e}")
+
+
+def run_project_analysis(job):
+    """Run (or resume) every pipeline stage of an analysis job"""
+    state = job.state
+
+    if load_cached_analysis(job, state):
+        job.run_stage('persist', lambda: persist_results(job, state))
+        return {
+            "walletCount": state['wallet_count'],
+            "transactionCount": state['transaction_count'],
+            "cached": True,
+        }
+
+    job.run_stage('parse', lambda: parse_upload(job, state))
+    job.run_stage('graph_build', lambda: build_graph(state))
+    run_detectors(job, state)
+    job.run_stage('scoring', lambda: score_wallets(job.project_id, state))
+    job.run_stage('patterns', lambda: collect_patterns(state))
+    job.run_stage('layout', lambda: layout_wallets(state))
+    store_cached_analysis(job, state)
+    job.run_stage('persist', lambda: persist_results(job, state))
+
+    return {
+        "walletCount": state['wallet_count'],
+        "transactionCount": state['transaction_count'],
+    }
+
+
+def run_detectors(job, state: dict):
+    """Run every detector stage over the graph inputs in `state`"""
+    print("  Detecting advanced AML patterns...")
+    run_detector_stages(job, state)
+    print_detector_timings(job)
+
+
+def print_detector_timings(job):
+    timings = ", ".join(f"{spec.name[len('detect_'):]} {(job.stages[spec.name].get('detail') or {}).get('seconds', 0):.2f}s"
+                        for spec in DETECTORS)
+    print(f"  Detector wall-clock: {timings}")
+
+
+def load_cached_analysis(job, state: dict) -> bool:
+    """Fill the job state from the analysis cache when this exact upload was seen before"""
+    if analysis_cache is None or not job.content_hash or 'wallets_to_insert' in state:
+        return False
+    cached = analysis_cache.get(job.content_hash)
+    if cached is None:
+        return False
+
+    state.update(cached)
+    state['wallets_to_insert'] = [dict(row, project_id=job.project_id) for row in cached['wallets_to_insert']]
+    for stage in CACHEABLE_STAGES:
+        job.skip_stage(stage, {"cached": True})
+    print(f"  ♻️ Reusing cached analysis for upload {job.content_hash[:12]}")
+    return True
+
+
+def store_cached_analysis(job, state: dict):
+    """Cache graph, detector outputs and scores under the upload's content hash"""
+    if analysis_cache is None or not job.content_hash:
+        return
+    try:
+        cached = {key: state[key] for key in CACHED_STATE_KEYS}
+        cached['wallets_to_insert'] = [
+            {k: v for k, v in row.items() if k != 'project_id'} for row in state['wallets_to_insert']
+        ]
+        analysis_cache.put(job.content_hash, cached)
+    except Exception as e:
+        print(f"⚠️ Could not cache analysis: {e}")
+
+
+def parse_upload(job, state: dict) -> dict:
+    """Stream the stored upload into wallet stats, interned edges and detector rows"""
+    upload_format = detect_format(job.upload_path, job.filename)
+    column_mapping = map_columns(read_header(job.upload_path, upload_format))
+    if missing_required_fields(column_mapping):
+        raise ValueError("Dataset must contain columns for: from/source address, to/destination address, and amount")
+
+    graph = ProjectGraph()
+    try:
+        for chunk in iter_transaction_chunks(job.upload_path, column_mapping, upload_format):
+            graph.add_chunk(chunk)
+    except pd.errors.ParserError:
+        raise ValueError("Invalid CSV format")
+
+    state['upload_format'] = upload_format
+    state['column_mapping'] = column_mapping
+    state['transaction_count'] = graph.num_edges
+    state['project_graph'] = graph
+    state['wallets_dict'] = graph.aggregator.to_dict()
+    print(f"  Parsed {graph.num_edges} transactions, {graph.num_wallets} wallets ({upload_format})")
+    return {"transactions": graph.num_edges, "wallets": graph.num_wallets}
+
+
+def build_graph(state: dict) -> dict:
+    """Build the interned CSR/CSC graph the graph detectors walk"""
+    graph = CompactGraph.from_project_graph(state['project_graph'])
+    state['compact_graph'] = graph
+    report = graph.memory_report()
+    print(f"  Graph built: {graph.num_nodes} nodes, {graph.num_edges} edges, "
+          f"{report['bytesPerEdge']} bytes/edge ({report['bytes'] / 1024 ** 2:.1f} MiB)")
+    return report
+
+
+def score_wallets(project_id: str, state: dict) -> dict:
+    """Per-wallet risk scoring over graph shape and detected patterns (see scoring.py)"""
+    wallets_dict = state['wallets_dict']
+    graph = state['compact_graph']
+    codes = graph.codes(list(wallets_dict))
+    config = ScoringConfig.load()
+    features = wallet_features(graph, codes, wallets_dict)
+    risk = score_features(features, detector_hits(graph, codes, state, DETECTORS), config, DETECTORS)
+
+    scores = risk.scores.tolist()
+    wallets_to_insert = [
+        {
+            "project_id": project_id,
+            "wallet_hash": wallet_hash,
+            "risk_score": score,
+            "risk_factors": factors,
+            "inflow": stats['inflow'],
+            "outflow": stats['outflow'],
+            "transaction_count": stats['tx_count'],
+        }
+        for (wallet_hash, stats), score, factors in zip(wallets_dict.items(), scores, risk.factor_rows())
+    ]
+    state['wallets_to_insert'] = wallets_to_insert
+
+    count = len(scores)
+    avg_risk = float(risk.scores.mean()) if count else 0
+    high_risk_count = int((risk.scores >= 70).sum())
+    intermediary_count = int((risk.tiers['intermediary'] == 0).sum()) if 'intermediary' in risk.tiers else 0
+    print(f"  Risk scores (weights v{risk.version}): avg={avg_risk:.1f}, high-risk (≥70)={high_risk_count}")
+    print(f"  Intermediaries detected: {intermediary_count}")
+    print(f"  Max in_degree: {features['in_degree'].max() if count else 0}, Max out_degree: {features['out_degree'].max() if count else 0}")
+    print(f"  Risk distribution: min={risk.scores.min() if count else 0}, max={risk.scores.max() if count else 0}")
+    return {"averageRisk": round(avg_risk, 1), "highRisk": high_risk_count, "intermediaries": intermediary_count,
+            "weightsVersion": risk.version}
+
+
+def collect_patterns(state: dict, wallets: set = None) -> dict:
+    """Pattern instances (with evidence) of the detector outputs, compressed for storage"""
+    config = ScoringConfig.load()
+    weights = {spec.key: config.pattern_weight(spec) for spec in DETECTORS}
+    patterns = build_patterns(state['compact_graph'], state['wallets_dict'], state, DETECTORS, weights, wallets)
+    state['patterns'] = encode_patterns(patterns)
+    print(f"  Pattern instances: {len(patterns)} ({len(state['patterns']['data']) / 1024:.1f} KiB compressed)")
+    return {"patterns": len(patterns), "compressedBytes": len(state['patterns']['data'])}
+
+
+def set_positions(rows: list, project_graph: ProjectGraph):
+    """Copy the project graph's layout positions into wallet rows"""
+    codes = project_graph.wallets.get_indexer([row['wallet_hash'] for row in rows])
+    x = project_graph.positions[codes, 0].tolist()
+    y = project_graph.positions[codes, 1].tolist()
+    for row, position_x, position_y in zip(rows, x, y):
+        row['position_x'] = position_x
+        row['position_y'] = position_y
+
+
+def layout_wallets(state: dict) -> dict:
+    """Force-directed layout of the whole graph, stored as wallet positions (see layout.py)"""
+    started = time.perf_counter()
+    project_graph = state['project_graph']
+    project_graph.positions = force_layout(state['compact_graph'])
+    set_positions(state['wallets_to_insert'], project_graph)
+    seconds = time.perf_counter() - started
+    print(f"  Layout: {project_graph.num_wallets} wallets in {seconds:.2f}s")
+    return {"seconds": round(seconds, 3)}
+
+
+def upload_transaction_chunks(job, state: dict, skip_rows: int = 0):
+    """Re-stream the stored upload as transaction rows with deterministic ids"""
+    offset = 0
+    for chunk in iter_transaction_chunks(job.upload_path, state['column_mapping'], state['upload_format']):
+        start = offset
+        offset += len(chunk)
+        if offset <= skip_rows:
+            continue
+        skip = max(skip_rows - start, 0)
+        records = chunk_to_records(chunk.iloc[skip:], job.project_id)
+        for ordinal, record in enumerate(records, start + skip):
+            record['id'] = transaction_row_id(job.project_id, job.id, ordinal)
+        yield records
+
+
+def persist_transactions(job, state: dict):
+    """Bulk-write the upload's transactions, checkpointing a row watermark.
+
+    Every row has a deterministic id, so a resumed job re-sends whatever lies
+    past the last checkpoint without creating duplicates.
+    """
+    persisted = state.get('persisted_transactions', 0)
+
+    def checkpoint(rows: int):
+        state['persisted_transactions'] = rows
+
+    return BulkWriter(job.client, 'transactions', on_conflict='id').write(
+        upload_transaction_chunks(job, state, persisted), on_progress=checkpoint, start_offset=persisted
+    )
+
+
+def touch_project(client, project_id: str):
+    """Bump the project's updated_at, the version its API responses are cached under.
+
+    Persist stages bump it before their first write as well as after their
+    last, so a persist that fails halfway still changes the version and
+    clients revalidate instead of keeping their old copy.
+    """
+    client.table('projects').update({"updated_at": datetime.utcnow().isoformat()}).eq('id', project_id).execute()
+
+
+def persist_results(job, state: dict) -> dict:
+    """Bulk-write transactions and scored wallets, then store the project graph"""
+    touch_project(job.client, job.project_id)
+    tx_stats = persist_transactions(job, state)
+    wallet_stats = BulkWriter(job.client, 'wallets', on_conflict='project_id,wallet_hash').write(
+        [state['wallets_to_insert']]
+    )
+    save_pattern_results(job.client, job.project_id, state['patterns'], job.filename)
+    save_project_graph(job.project_id, state['project_graph'])
+    touch_project(job.client, job.project_id)
+
+    state['wallet_count'] = len(state['wallets_to_insert'])
+    print(f"✓ CSV processed: {state['persisted_transactions']} transactions, {state['wallet_count']} wallets")
+    return {"transactions": tx_stats.to_dict(), "wallets": wallet_stats.to_dict()}
+
+
+# ============================================================================
+# INCREMENTAL APPEND
+# ============================================================================
+
+def run_append_analysis(job):
+    """Merge an uploaded delta into a project and re-score only the affected wallets"""
+    state = job.state
+    with project_lock(job.project_id):
+        job.run_stage('parse', lambda: parse_append_header(job, state))
+        job.run_stage('merge', lambda: merge_into_project_graph(job, state))
+        job.run_stage('neighbourhood', lambda: extract_neighbourhood(state))
+        run_append_detectors(job, state)
+        job.run_stage('scoring', lambda: score_wallets(job.project_id, state))
+        job.run_stage('patterns', lambda: collect_patterns(state, state['affected']))
+        job.run_stage('layout', lambda: layout_new_wallets(state))
+        job.run_stage('persist', lambda: persist_append(job, state))
+
+    return {
+        "transactionCount": state['transaction_count'],
+        "affectedWallets": len(state['affected']),
+        "newWallets": state['new_wallet_count'],
+    }
+
+
+def parse_append_header(job, state: dict) -> dict:
+    """Detect the delta's format and map its columns"""
+    upload_format = detect_format(job.upload_path, job.filename)
+    column_mapping = map_columns(read_header(job.upload_path, upload_format))
+    if missing_required_fields(column_mapping):
+        raise ValueError("Dataset must contain columns for: from/source address, to/destination address, and amount")
+    state['upload_format'] = upload_format
+    state['column_mapping'] = column_mapping
+    return {"format": upload_format}
+
+
+def rebuild_project_graph(client, project_id: str, page_size: int = 1000) -> ProjectGraph:
+    """Rebuild a project's graph from its stored transactions (one-off, when
+    the project predates the graph store)"""
+    print(f"  No stored graph for project {project_id}, rebuilding from the database...")
+    graph = ProjectGraph()
+    offset = 0
+    while True:
+        rows = (client.table('transactions')
+                .select('from_wallet,to_wallet,amount,timestamp')
+                .eq('project_id', project_id)
+                .order('id')
+                .range(offset, offset + page_size - 1)
+                .execute().data)
+        if not rows:
+            break
+        chunk = pd.DataFrame(rows)
+        chunk['amount'] = chunk['amount'].astype('float64')
+        graph.add_chunk(chunk)
+        offset += len(rows)
+        if len(rows) < page_size:
+            break
+    return graph
+
+
+def merge_into_project_graph(job, state: dict) -> dict:
+    """Load the project's graph and append the delta's transfers to it"""
+    graph = load_project_graph(job.project_id) or rebuild_project_graph(job.client, job.project_id)
+    known_wallets = graph.num_wallets
+    first_new_edge = graph.num_edges
+
+    touched = []
+    try:
+        for chunk in iter_transaction_chunks(job.upload_path, state['column_mapping'], state['upload_format']):
+            from_codes, to_codes = graph.add_chunk(chunk)
+            touched.extend([from_codes, to_codes])
+    except pd.errors.ParserError:
+        raise ValueError("Invalid CSV format")
+
+    state['project_graph'] = graph
+    state['known_wallets'] = known_wallets
+    state['transaction_count'] = graph.num_edges - first_new_edge
+    state['touched'] = np.unique(np.concatenate(touched)) if touched else np.zeros(0, dtype=np.int32)
+    print(f"  Merged {state['transaction_count']} transactions into a {first_new_edge}-edge project graph")
+    return {"transactions": state['transaction_count'], "newWallets": graph.num_wallets - known_wallets}
+
+
+def extract_neighbourhood(state: dict) -> dict:
+    """Detector inputs for the subgraph around the new transfers"""
+    graph = state['project_graph']
+    # Peel chains are maximal runs of any length, so runs through the
+    # neighbourhood are re-scored whole
+    affected = graph.extend_along_runs(graph.neighbourhood(state['touched'], APPEND_AFFECTED_HOPS))
+    context = graph.neighbourhood(np.flatnonzero(affected), APPEND_CONTEXT_HOPS)
+
+    state.update(graph.subgraph(context))
+    state['affected'] = set(graph.wallets[np.flatnonzero(affected)])
+    print(f"  Affected neighbourhood: {len(state['affected'])} wallets "
+          f"({int(context.sum())} with context) of {graph.num_wallets}")
+    return {"affected": len(state['affected']), "context": int(context.sum()), "projectWallets": graph.num_wallets}
+
+
+def layout_new_wallets(state: dict) -> dict:
+    """Place the delta's new wallets next to their neighbours; existing wallets
+    keep their positions. A project stored without a layout is laid out in full."""
+    graph = state['project_graph']
+    known = state['known_wallets']
+    relayout = len(graph.positions) < known
+    state['relayout'] = relayout
+    if relayout:
+        graph.positions = force_layout(CompactGraph.from_project_graph(graph))
+    else:
+        new_wallets = np.arange(known, graph.num_wallets)
+        edges = np.union1d(graph.out_edges(new_wallets), graph.in_edges(new_wallets))
+        graph.positions = place_new_nodes(graph.positions[:known], graph.num_wallets,
+                                          graph.src[edges], graph.dst[edges])
+    set_positions(state['wallets_to_insert'], graph)
+    return {"placed": graph.num_wallets - known, "relayout": relayout}
+
+
+def run_append_detectors(job, state: dict):
+    """Run the detectors over the neighbourhood subgraph, except project-wide
+    ones, which run over the merged project graph; their results are kept for
+    the neighbourhood's wallets"""
+    print("  Detecting advanced AML patterns...")
+    run_detector_stages(job, state, [spec for spec in DETECTORS if not spec.project_wide])
+    project_wide = [spec for spec in DETECTORS
+                    if spec.project_wide and job.stages[spec.name]["status"] != "completed"]
+    if project_wide:
+        graph = state['project_graph']
+        project_state = {'compact_graph': CompactGraph.from_project_graph(graph)}
+        if any('wallets_dict' in spec.inputs for spec in project_wide):
+            project_state['wallets_dict'] = graph.aggregator.to_dict()
+        run_detector_stages(job, project_state, project_wide)
+        for spec in project_wide:
+            state[spec.key] = {wallet: detail for wallet, detail in project_state[spec.key].items()
+                               if wallet in state['wallets_dict']}
+    print_detector_timings(job)
+
+
+def moved_wallet_rows(project_id: str, graph: ProjectGraph, known_wallets: int, skip: set):
+    """Position-only rows for the known wallets not in `skip`, in BulkWriter chunks"""
+    codes = np.flatnonzero(~graph.wallets[:known_wallets].isin(list(skip)))
+    for start in range(0, len(codes), PERSIST_BATCH_ROWS):
+        chunk = codes[start:start + PERSIST_BATCH_ROWS]
+        yield [
+            {"project_id": project_id, "wallet_hash": wallet, "position_x": x, "position_y": y}
+            for wallet, x, y in zip(graph.wallets[chunk], graph.positions[chunk, 0].tolist(),
+                                    graph.positions[chunk, 1].tolist())
+        ]
+
+
+def persist_append(job, state: dict) -> dict:
+    """Write the delta's transactions and upsert the re-scored wallets"""
+    touch_project(job.client, job.project_id)
+    tx_stats = persist_transactions(job, state)
+
+    graph = state['project_graph']
+    known = set(graph.wallets[:state['known_wallets']])
+    new_rows, updated_rows = [], []
+    for row in state['wallets_to_insert']:
+        if row['wallet_hash'] not in state['affected']:
+            continue
+        if row['wallet_hash'] in known:
+            # Existing wallets keep their layout position, unless the whole project was laid out again
+            updated_rows.append(row if state['relayout'] else
+                                {k: v for k, v in row.items() if k not in ('position_x', 'position_y')})
+        else:
+            new_rows.append(row)
+
+    new_stats = BulkWriter(job.client, 'wallets', on_conflict='project_id,wallet_hash').write([new_rows])
+    updated_stats = BulkWriter(job.client, 'wallets', on_conflict='project_id,wallet_hash',
+                               ignore_duplicates=False).write([updated_rows])
+    if state['relayout']:
+        BulkWriter(job.client, 'wallets', on_conflict='project_id,wallet_hash', ignore_duplicates=False).write(
+            moved_wallet_rows(job.project_id, graph, state['known_wallets'], state['affected'])
+        )
+
+    patterns = merge_patterns(decode_patterns(load_pattern_results(job.client, job.project_id)),
+                              decode_patterns(state['patterns']), state['affected'], graph.wallets)
+    save_pattern_results(job.client, job.project_id, encode_patterns(patterns))
+
+    touch_project(job.client, job.project_id)
+    if state['relayout']:
+        save_project_graph(job.project_id, graph)
+    else:
+        append_project_graph(job.project_id, graph, state['known_wallets'],
+                             graph.num_edges - state['transaction_count'])
+
+    state['new_wallet_count'] = len(new_rows)
+    print(f"✓ Appended {tx_stats.rows} transactions: {len(new_rows)} new and {len(updated_rows)} re-scored wallets")
+    return {"transactions": tx_stats.to_dict(), "newWallets": new_stats.to_dict(), "updatedWallets": updated_stats.to_dict()}
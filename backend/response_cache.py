@@ -0,0 +1,164 @@
+"""
+Conditional GET and an in-process cache of serialized project responses.
+
+A project's data only changes when an analysis or append job writes it
+(both bump projects.updated_at) or when it is deleted, so updated_at is the
+project's version. Each response carries a weak ETag derived from the
+project, that version and the representation (JSON, NDJSON, columnar,
+patterns). The version is read from the projects row on every request (the
+same primary-key lookup checks ownership), so a write handled by another
+worker process changes the ETag everywhere; a matching If-None-Match is
+answered with 304 without reading the project's data.
+
+Serialized bodies are kept in an LRU bounded by total bytes and are only
+served for the version they were built from; streamed responses are captured
+on the way out when they fit. The latest version seen of each project is
+kept in a bounded, expiring map, so a body built while the project changed
+is not cached. Finishing a job or deleting the project drops both.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Larger bodies are served but never cached
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(64 * 1024 * 1024)))
+# Latest versions remembered for the body cache's race check
+RESPONSE_CACHE_MAX_PROJECTS = int(os.getenv("RESPONSE_CACHE_MAX_PROJECTS", "10000"))
+RESPONSE_CACHE_PROJECT_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_PROJECT_TTL_SECONDS", "600"))
+# Bump when a representation's encoding changes, so old ETags stop matching
+RESPONSE_FORMAT_VERSION = "1"
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists `etag` (weak comparison) or is *"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(tag == "*" or tag.removeprefix("W/") == opaque
+               for tag in (part.strip() for part in if_none_match.split(",")))
+
+
+class ResponseCache:
+    """Project versions and serialized response bodies, shared by all requests"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES,
+                 max_projects: int = RESPONSE_CACHE_MAX_PROJECTS,
+                 project_ttl_seconds: float = RESPONSE_CACHE_PROJECT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_projects = max_projects
+        self.project_ttl_seconds = project_ttl_seconds
+        # project_id -> (version, expires at), least recently seen first
+        self._versions = OrderedDict()
+        # (project_id, variant) -> (version, media_type, body), least recently used first
+        self._bodies = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Versions
+    # ------------------------------------------------------------------
+
+    def remember(self, project: dict) -> dict:
+        """The project ({id, name, version}) of a row just read (ownership-checked)
+        from the database; its version is the latest one seen"""
+        entry = {
+            "id": project['id'],
+            "name": project['name'],
+            "version": str(project.get('updated_at') or project.get('created_at')),
+        }
+        now = time.monotonic()
+        with self._lock:
+            self._versions.pop(entry['id'], None)
+            self._versions[entry['id']] = (entry['version'], now + self.project_ttl_seconds)
+            while self._versions and (len(self._versions) > self.max_projects
+                                      or next(iter(self._versions.values()))[1] <= now):
+                self._versions.popitem(last=False)
+        return entry
+
+    def _current_version(self, project_id: str) -> Optional[str]:
+        remembered = self._versions.get(project_id)
+        if remembered is None or remembered[1] <= time.monotonic():
+            return None
+        return remembered[0]
+
+    def etag(self, project: dict, variant: str) -> str:
+        digest = hashlib.sha1(
+            f"{project['id']}:{project['version']}:{variant}:{RESPONSE_FORMAT_VERSION}".encode()
+        ).hexdigest()[:24]
+        return f'W/"{digest}"'
+
+    def invalidate(self, project_id: str):
+        """Forget a project's version and drop its cached bodies"""
+        with self._lock:
+            self._versions.pop(project_id, None)
+            for key in [key for key in self._bodies if key[0] == project_id]:
+                self._size -= len(self._bodies.pop(key)[2])
+
+    # ------------------------------------------------------------------
+    # Bodies
+    # ------------------------------------------------------------------
+
+    def get(self, project: dict, variant: str) -> Optional[tuple]:
+        """(media_type, body) cached for this version of the project, if any"""
+        key = (project['id'], variant)
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is None or cached[0] != project['version']:
+                return None
+            self._bodies.move_to_end(key)
+            return cached[1], cached[2]
+
+    def put(self, project: dict, variant: str, media_type: str, body: bytes) -> bool:
+        """Cache a body, unless it is too large or the project changed while it was built"""
+        if len(body) > self.max_entry_bytes:
+            return False
+        key = (project['id'], variant)
+        with self._lock:
+            if self._current_version(project['id']) != project['version']:
+                return False
+            previous = self._bodies.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[2])
+            self._bodies[key] = (project['version'], media_type, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._size -= len(evicted[2])
+        return True
+
+    def tee(self, project: dict, variant: str, media_type: str, chunks, error_chunk):
+        """Pass a streamed body through, caching it once complete if it fits.
+
+        The response has already started when `chunks` fails, so the failure
+        is sent as a final `error_chunk(e)` and nothing is cached.
+        """
+        captured = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if captured is not None:
+                    size += len(chunk)
+                    if size > self.max_entry_bytes:
+                        captured = None
+                    else:
+                        captured.append(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"❌ Error streaming {variant} response for project {project['id']}: {str(e)}")
+            yield error_chunk(e)
+            return
+        if captured is not None:
+            self.put(project, variant, media_type, b"".join(captured))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"projects": len(self._versions), "bodies": len(self._bodies), "bytes": self._size}
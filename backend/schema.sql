@@ -15,6 +15,7 @@ CREATE TABLE IF NOT EXISTS wallets (
     project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
     wallet_hash TEXT NOT NULL,
     risk_score INT DEFAULT 0,
+    risk_factors JSONB,
     inflow DECIMAL(20, 8) DEFAULT 0,
     outflow DECIMAL(20, 8) DEFAULT 0,
     transaction_count INT DEFAULT 0,
@@ -24,6 +25,9 @@ CREATE TABLE IF NOT EXISTS wallets (
     UNIQUE(project_id, wallet_hash)
 );
 
+-- Per-factor risk points (added after the initial schema)
+ALTER TABLE wallets ADD COLUMN IF NOT EXISTS risk_factors JSONB;
+
 -- Transactions table (edges in the transaction graph)
 CREATE TABLE IF NOT EXISTS transactions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -61,6 +65,8 @@ CREATE TABLE IF NOT EXISTS notes (
 CREATE INDEX IF NOT EXISTS idx_projects_user_id ON projects(user_id);
 CREATE INDEX IF NOT EXISTS idx_wallets_project_id ON wallets(project_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_project_id ON transactions(project_id);
+-- Keyset pagination of a project's transactions (wallets use UNIQUE(project_id, wallet_hash))
+CREATE INDEX IF NOT EXISTS idx_transactions_project_page ON transactions(project_id, id);
 CREATE INDEX IF NOT EXISTS idx_analyses_project_id ON analyses(project_id);
 CREATE INDEX IF NOT EXISTS idx_notes_project_id ON notes(project_id);
 CREATE INDEX IF NOT EXISTS idx_notes_entity ON notes(project_id, entity_type, entity_id);
@@ -96,6 +102,11 @@ CREATE POLICY wallets_insert ON wallets FOR INSERT
         SELECT id FROM projects WHERE user_id = auth.uid()
     ));
 
+CREATE POLICY wallets_update ON wallets FOR UPDATE
+    USING (project_id IN (
+        SELECT id FROM projects WHERE user_id = auth.uid()
+    ));
+
 -- RLS Policies for transactions (access through project)
 CREATE POLICY transactions_select ON transactions FOR SELECT
     USING (project_id IN (
@@ -118,6 +129,16 @@ CREATE POLICY analyses_insert ON analyses FOR INSERT
         SELECT id FROM projects WHERE user_id = auth.uid()
     ));
 
+CREATE POLICY analyses_update ON analyses FOR UPDATE
+    USING (project_id IN (
+        SELECT id FROM projects WHERE user_id = auth.uid()
+    ));
+
+CREATE POLICY analyses_delete ON analyses FOR DELETE
+    USING (project_id IN (
+        SELECT id FROM projects WHERE user_id = auth.uid()
+    ));
+
 -- RLS Policies for notes (access through project)
 DROP POLICY IF EXISTS notes_select ON notes;
 CREATE POLICY notes_select ON notes FOR SELECT
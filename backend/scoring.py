@@ -0,0 +1,149 @@
+"""
+Vectorized wallet risk scoring.
+
+Scores are sums of factor points over per-wallet feature columns (degrees,
+flows, flow ratio, transaction count, detector hits), evaluated as array
+operations for all wallets at once. Weights and thresholds come from a
+versioned JSON config (risk_weights.json, or RISK_WEIGHTS_PATH):
+
+    factors   tiered rules; a wallet gets the points of the first tier whose
+              conditions all hold, e.g.
+              {"points": 60, "when": {"in_degree": {"atLeast": 3}, "out_degree": {"atLeast": 3}}}
+    patterns  points per detector (state key) for every wallet it flags;
+              detectors not listed score their registered weight
+
+Every factor's contribution is kept per wallet, so a score can be explained.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from graph_core import CompactGraph
+
+RISK_WEIGHTS_PATH = os.getenv("RISK_WEIGHTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_weights.json"))
+
+FEATURES = ('in_degree', 'out_degree', 'inflow', 'outflow', 'tx_count', 'flow_ratio')
+_OPERATORS = {
+    'atLeast': np.greater_equal,
+    'above': np.greater,
+    'atMost': np.less_equal,
+    'below': np.less,
+}
+
+
+class ScoringConfig:
+    """Factor tiers and pattern weights of one config version"""
+
+    def __init__(self, config: dict):
+        self.version = str(config['version'])
+        self.max_score = int(config.get('maxScore', 100))
+        self.factors = config.get('factors', [])
+        self.patterns = dict(config.get('patterns', {}))
+        for factor in self.factors:
+            for tier in factor['tiers']:
+                for feature, bounds in tier['when'].items():
+                    if feature not in FEATURES:
+                        raise ValueError(f"Risk factor '{factor['name']}' uses unknown feature '{feature}'")
+                    if any(op not in _OPERATORS for op in bounds):
+                        raise ValueError(f"Risk factor '{factor['name']}' uses unknown comparison in {bounds}")
+
+    @classmethod
+    def load(cls, path: str = RISK_WEIGHTS_PATH) -> "ScoringConfig":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def pattern_weight(self, spec) -> int:
+        return self.patterns.get(spec.key, spec.weight)
+
+    def describe(self, detectors: list) -> str:
+        """One line per factor and pattern with its points, for explanations"""
+        lines = [f"- {factor['name']}: {factor.get('description', '')} = "
+                 f"{'/'.join(str(tier['points']) for tier in factor['tiers'])} points"
+                 for factor in self.factors]
+        lines += [f"- {spec.key}: {spec.description} = {self.pattern_weight(spec)} points" for spec in detectors]
+        return "\n".join(lines)
+
+
+class RiskScores:
+    """Capped score and per-factor contributions of every wallet"""
+
+    def __init__(self, version: str, scores: np.ndarray, contributions: dict, tiers: dict):
+        self.version = version
+        self.scores = scores
+        # Factor name -> points it added to every wallet (before the cap)
+        self.contributions = contributions
+        # Tiered factor name -> index of the matched tier (-1 if none)
+        self.tiers = tiers
+
+    def factor_rows(self) -> list:
+        """Non-zero contributions of every wallet, in wallet order"""
+        names = list(self.contributions)
+        if not names:
+            return [{} for _ in range(len(self.scores))]
+        matrix = np.stack([self.contributions[name] for name in names], axis=1)
+        rows = [{} for _ in range(len(self.scores))]
+        for row, column in zip(*np.nonzero(matrix)):
+            rows[row][names[column]] = int(matrix[row, column])
+        return rows
+
+
+def wallet_features(graph: CompactGraph, codes: np.ndarray, wallets_dict: dict) -> dict:
+    """Feature columns of the wallets in `wallets_dict` (at graph `codes`), in its order"""
+    count = len(wallets_dict)
+    stats = wallets_dict.values()
+    inflow = np.fromiter((s['inflow'] for s in stats), dtype=np.float64, count=count)
+    outflow = np.fromiter((s['outflow'] for s in stats), dtype=np.float64, count=count)
+    tx_count = np.fromiter((s['tx_count'] for s in stats), dtype=np.int64, count=count)
+    both = (inflow > 0) & (outflow > 0)
+    smaller, larger = np.minimum(inflow, outflow), np.maximum(inflow, outflow)
+    flow_ratio = np.divide(larger, smaller, out=np.zeros(count), where=both)
+    return {
+        'in_degree': graph.in_degree[codes],
+        'out_degree': graph.out_degree[codes],
+        'inflow': inflow,
+        'outflow': outflow,
+        'tx_count': tx_count,
+        # max(out/in, in/out) when the wallet both received and sent, else 0
+        'flow_ratio': flow_ratio,
+    }
+
+
+def score_features(features: dict, hits: dict, config: ScoringConfig, detectors: list) -> RiskScores:
+    """Score wallets from feature columns and detector hit masks ({state key: bool array})"""
+    count = len(features['inflow'])
+    contributions = {}
+    tiers = {}
+    for factor in config.factors:
+        matched = np.full(count, -1, dtype=np.int32)
+        points = np.zeros(count, dtype=np.int32)
+        for index, tier in enumerate(factor['tiers']):
+            holds = matched < 0
+            for feature, bounds in tier['when'].items():
+                for op, threshold in bounds.items():
+                    holds &= _OPERATORS[op](features[feature], threshold)
+            matched[holds] = index
+            points[holds] = tier['points']
+        contributions[factor['name']] = points
+        tiers[factor['name']] = matched
+    for spec in detectors:
+        contributions[spec.key] = np.where(hits[spec.key], config.pattern_weight(spec), 0).astype(np.int32)
+
+    total = np.zeros(count, dtype=np.int32)
+    for points in contributions.values():
+        total += points
+    return RiskScores(config.version, np.minimum(total, config.max_score), contributions, tiers)
+
+
+def detector_hits(graph: CompactGraph, codes: np.ndarray, state: dict, detectors: list) -> dict:
+    """Bool mask over the wallets at graph `codes` of the wallets each detector flagged"""
+    position = np.full(graph.num_nodes, -1, dtype=np.int64)
+    position[codes] = np.arange(len(codes))
+    hits = {}
+    for spec in detectors:
+        flagged = graph.codes(list(state[spec.key]))
+        flagged = position[flagged[flagged >= 0]]
+        hits[spec.key] = np.zeros(len(codes), dtype=bool)
+        hits[spec.key][flagged[flagged >= 0]] = True
+    return hits
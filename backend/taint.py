@@ -0,0 +1,209 @@
+"""
+Fund-flow taint propagation.
+
+Answers "how much of each wallet's funds came from these source wallets",
+following timestamped transfers in time order under one of three models:
+
+    poison   any tainted receipt taints the receiver's whole balance
+    haircut  every outflow carries the sender's current tainted share
+    fifo     outflows spend the oldest funds first; taint stays with its lot
+
+Poison reachability is a vectorized, frontier-based relaxation of earliest
+taint times. It also bounds the other two models: only transfers whose
+sender is already tainted can carry taint, so those are the only ones walked
+in time order. Everything else a wallet's balance depends on (untainted
+inflows, balances before each outflow, FIFO lot positions) is precomputed for
+all wallets at once from the shared WalletTimeline.
+"""
+
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+from graph_core import CompactGraph, NAT, ns_to_iso
+from timeline import WalletTimeline
+
+TAINT_MODELS = ('poison', 'haircut', 'fifo')
+# Model used for the mixer-taint risk signal
+TAINT_MODEL = os.getenv("TAINT_MODEL", "haircut")
+
+NEVER = np.iinfo(np.int64).max
+
+
+class TaintResult:
+    """Per-wallet taint from one source set"""
+
+    def __init__(self, model: str, sources: np.ndarray, tainted_at: np.ndarray,
+                 tainted_inflow: np.ndarray, tainted_share: np.ndarray, tainted_balance: np.ndarray):
+        self.model = model
+        self.sources = sources
+        # Time of the first tainted receipt (NAT for sources, NEVER if untainted)
+        self.tainted_at = tainted_at
+        # Value of tainted funds received
+        self.tainted_inflow = tainted_inflow
+        # Tainted share of everything the wallet received
+        self.tainted_share = tainted_share
+        # Tainted part of the wallet's final balance
+        self.tainted_balance = tainted_balance
+
+    def tainted(self) -> np.ndarray:
+        """Codes of the tainted wallets, sources excluded"""
+        return np.flatnonzero((self.tainted_at != NEVER) & (self.tainted_at != NAT))
+
+
+def _gather_ranges(ptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenated index ranges ptr[r]:ptr[r + 1] of the given rows"""
+    starts, lengths = ptr[rows], ptr[rows + 1] - ptr[rows]
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def earliest_taint(graph: CompactGraph, sources: np.ndarray) -> np.ndarray:
+    """Earliest time each wallet receives funds from a tainted wallet (poison model).
+
+    A transfer at time t carries taint if its sender was tainted at or before
+    t. Relaxation only revisits out-edges of wallets whose taint time improved
+    in the previous round.
+    """
+    tainted_at = np.full(graph.num_nodes, NEVER, dtype=np.int64)
+    tainted_at[sources] = NAT
+    timed = graph.out_timestamp != NAT
+    changed = np.flatnonzero(tainted_at != NEVER)
+    while len(changed):
+        edges = _gather_ranges(graph.out_ptr, changed)
+        senders = np.repeat(changed, np.diff(graph.out_ptr)[changed])
+        times = graph.out_timestamp[edges]
+        carrying = timed[edges] & (tainted_at[senders] <= times)
+        receivers, times = graph.out_nbr[edges][carrying], times[carrying]
+        before = tainted_at[receivers]
+        np.minimum.at(tainted_at, receivers, times)
+        changed = np.unique(receivers[tainted_at[receivers] < before])
+    return tainted_at
+
+
+def propagate_taint(graph: CompactGraph, source_codes, model: str = 'haircut') -> TaintResult:
+    """Taint every wallet receives, directly or indirectly, from `source_codes`"""
+    if model not in TAINT_MODELS:
+        raise ValueError(f"Unknown taint model '{model}' (expected one of {', '.join(TAINT_MODELS)})")
+    n = graph.num_nodes
+    source_codes = np.asarray(source_codes, dtype=np.int64)
+    sources = np.unique(source_codes[(source_codes >= 0) & (source_codes < n)])
+    tainted_at = earliest_taint(graph, sources)
+
+    timeline = WalletTimeline.for_graph(graph)
+    opening, in_end, out_end = timeline.value_axis()
+    inflow = timeline.inflow()
+    balance = opening + inflow - timeline.outflow()
+
+    # Transfers that can carry taint, in time order (at equal times, those
+    # from wallets tainted earlier first, so a chain within one timestamp is
+    # walked in causal order)
+    src, dst, times = graph.out_src, graph.out_nbr, graph.out_timestamp
+    carrying = np.flatnonzero((times != NAT) & (tainted_at[src] <= times) & (src != dst))
+    carrying = carrying[np.lexsort((tainted_at[src[carrying]], times[carrying]))]
+    senders, receivers, amounts = src[carrying], dst[carrying], graph.out_amount[carrying]
+    edges = graph.out_edge[carrying]
+    is_source = np.zeros(n, dtype=bool)
+    is_source[sources] = True
+
+    # Per-edge positions from the timeline, indexed by upload-order edge id
+    inbound, outbound = timeline.inbound, ~timeline.inbound
+    if model == 'poison':
+        moved = amounts
+    elif model == 'haircut':
+        balance_before = np.zeros(graph.num_edges)
+        balance_before[timeline.edge[outbound]] = (in_end - out_end + timeline.amount)[outbound]
+        moved = np.asarray(_walk_haircut(senders.tolist(), receivers.tolist(), amounts.tolist(),
+                                         balance_before[edges].tolist(), is_source.tolist()))
+    else:
+        spend_start = np.zeros(graph.num_edges)
+        spend_start[timeline.edge[outbound]] = (out_end - timeline.amount)[outbound]
+        lot_end = np.zeros(graph.num_edges)
+        lot_end[timeline.edge[inbound]] = in_end[inbound]
+        moved = np.asarray(_walk_fifo(senders.tolist(), receivers.tolist(), amounts.tolist(),
+                                      spend_start[edges].tolist(), lot_end[edges].tolist(), is_source.tolist()))
+
+    tainted_inflow = np.bincount(receivers, weights=moved, minlength=n)
+    if model == 'poison':
+        tainted_share = (tainted_at != NEVER).astype(np.float64)
+        tainted_balance = np.where(tainted_at != NEVER, np.maximum(balance, 0.0), 0.0)
+    else:
+        tainted_share = np.minimum(np.divide(tainted_inflow, inflow, out=np.zeros(n), where=inflow > 0), 1.0)
+        tainted_balance = np.maximum(tainted_inflow - np.bincount(senders, weights=moved, minlength=n), 0.0)
+    tainted_share[sources] = 1.0
+    tainted_balance[sources] = np.maximum(balance[sources], 0.0)
+
+    return TaintResult(model, sources, tainted_at, tainted_inflow, tainted_share, tainted_balance)
+
+
+def _walk_haircut(senders: list, receivers: list, amounts: list, balance_before: list, is_source: list) -> list:
+    """Tainted value of each transfer: the sender's tainted share times the amount"""
+    tainted = {}
+    moved = []
+    for sender, receiver, amount, before in zip(senders, receivers, amounts, balance_before):
+        if is_source[sender]:
+            value = amount
+        elif before > 0:
+            value = amount * min(1.0, tainted.get(sender, 0.0) / before)
+            tainted[sender] = tainted.get(sender, 0.0) - value
+        else:
+            value = 0.0
+        tainted[receiver] = tainted.get(receiver, 0.0) + value
+        moved.append(value)
+    return moved
+
+
+def _walk_fifo(senders: list, receivers: list, amounts: list, spend_start: list, lot_end: list,
+               is_source: list) -> list:
+    """Tainted value of each transfer: the tainted lots its FIFO slice of the sender's axis covers"""
+    # Tainted lots per wallet as parallel (start, end, density) lists, sorted by position
+    lots = {}
+    moved = []
+    for sender, receiver, amount, start, end in zip(senders, receivers, amounts, spend_start, lot_end):
+        if is_source[sender]:
+            value = amount
+        else:
+            value = 0.0
+            sender_lots = lots.get(sender)
+            if sender_lots:
+                starts, ends, densities = sender_lots
+                stop = start + amount
+                i = bisect_right(ends, start)
+                while i < len(starts) and starts[i] < stop:
+                    value += (min(stop, ends[i]) - max(start, starts[i])) * densities[i]
+                    i += 1
+                value = min(value, amount)
+        moved.append(value)
+
+        if value > 0 and not is_source[receiver]:
+            starts, ends, densities = lots.setdefault(receiver, ([], [], []))
+            i = bisect_right(ends, end)
+            starts.insert(i, end - amount)
+            ends.insert(i, end)
+            densities.insert(i, value / amount)
+    return moved
+
+
+def taint_report(graph: CompactGraph, source_hashes: list, model: str = 'haircut', min_share: float = 0.0) -> dict:
+    """Tainted wallets (sources excluded), most tainted inflow first"""
+    source_codes = graph.codes(source_hashes)
+    result = propagate_taint(graph, source_codes, model)
+
+    tainted = result.tainted()
+    tainted = tainted[result.tainted_share[tainted] >= min_share]
+    tainted = tainted[np.argsort(-result.tainted_inflow[tainted], kind='stable')]
+
+    wallets = [
+        {"hash": graph.wallets[code], "taintedAt": tainted_at, "taintedInflow": round(inflow, 8),
+         "taintedShare": round(share, 6), "taintedBalance": round(balance, 8)}
+        for code, tainted_at, inflow, share, balance in zip(
+            tainted.tolist(), ns_to_iso(result.tainted_at[tainted]), result.tainted_inflow[tainted].tolist(),
+            result.tainted_share[tainted].tolist(), result.tainted_balance[tainted].tolist())
+    ]
+    return {
+        "model": model,
+        "sources": len(result.sources),
+        "unknownSources": [wallet for wallet, code in zip(source_hashes, source_codes.tolist()) if code < 0],
+        "wallets": wallets,
+    }
@@ -0,0 +1,208 @@
+"""
+Incremental append tests: appending a delta must leave the project as a full
+re-analysis of base + delta would, and the wallets table in step with the
+stored project graph.
+
+Run from backend/:  python -m pytest test_append.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import graph_store
+from graph_store import load_project_graph, save_project_graph
+from detectors import KNOWN_MIXERS
+from jobs import AnalysisJob
+from pipeline import PIPELINE_STAGES, APPEND_STAGES, run_project_analysis, run_append_analysis
+
+
+MIXER = KNOWN_MIXERS[1]
+
+
+class Table:
+    """In-memory table answering the upserts and updates the pipeline sends"""
+
+    def __init__(self, rows: dict, name: str):
+        self.rows = rows.setdefault(name, {})
+        self.name = name
+        self.pending = None
+
+    def upsert(self, rows, on_conflict, ignore_duplicates=False, **kwargs):
+        keys = on_conflict.split(',')
+
+        def apply():
+            for row in rows:
+                key = tuple(row[k] for k in keys)
+                if key not in self.rows:
+                    self.rows[key] = dict(row)
+                elif not ignore_duplicates:
+                    self.rows[key].update(row)
+        self.pending = apply
+        return self
+
+    def update(self, values):
+        self.pending = lambda: None
+        return self
+
+    def insert(self, row):
+        self.pending = lambda: self.rows.setdefault(('insert', len(self.rows)), dict(row))
+        return self
+
+    def select(self, *args):
+        self.pending = lambda: None
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def execute(self):
+        self.pending()
+        self.data = list(self.rows.values())
+        return self
+
+
+class Client:
+    def __init__(self):
+        self.rows = {}
+
+    def table(self, name: str) -> Table:
+        return Table(self.rows, name)
+
+    def wallets(self, project_id: str) -> dict:
+        return {wallet: row for (project, wallet), row in self.rows['wallets'].items() if project == project_id}
+
+
+def write_transfers(path, senders: list, receivers: list, start: str, amounts=None):
+    count = len(senders)
+    pd.DataFrame({
+        "transaction_hash": [f"{path.stem}-{i}" for i in range(count)],
+        "from_wallet": senders,
+        "to_wallet": receivers,
+        "amount": np.linspace(1000, 10, count) if amounts is None else amounts,
+        "timestamp": pd.date_range(start, periods=count, freq="h").strftime("%Y-%m-%dT%H:%M:%S"),
+    }).to_csv(path, index=False)
+    return path
+
+
+def clustered_transfers(path, count: int, clusters: list, cluster_size: int, start: str, seed: int,
+                        mixer_cluster: int = None):
+    """Random transfers inside separate wallet clusters (one of them fed by a
+    known mixer), so an append into one cluster leaves the rest untouched"""
+    rng = np.random.default_rng(seed)
+    cluster = rng.choice(clusters, count) * cluster_size
+    senders = [f"c{s}" for s in cluster + (rng.pareto(1.5, count) * 2).astype(int) % cluster_size]
+    receivers = [f"c{r}" for r in cluster + rng.integers(0, cluster_size, count)]
+    if mixer_cluster is not None:
+        senders[:10] = [MIXER] * 10
+        receivers[:10] = [f"c{mixer_cluster * cluster_size + i}" for i in range(10)]
+    pd.DataFrame({
+        "transaction_hash": [f"{path.stem}-{i}" for i in range(count)],
+        "from_wallet": senders,
+        "to_wallet": receivers,
+        "amount": rng.integers(1, 20000, count).astype(float),
+        "timestamp": pd.date_range(start, periods=count, freq="13min").strftime("%Y-%m-%dT%H:%M:%S"),
+    }).to_csv(path, index=False)
+    return path
+
+
+def run_job(runner, stages: list, client: Client, project_id: str, path) -> AnalysisJob:
+    job = AnalysisJob(project_id, "user", path.name, stages)
+    job.upload_path = str(path)
+    job.client = client
+    job.result = runner(job)
+    return job
+
+
+@pytest.fixture
+def graph_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_store, 'PROJECT_GRAPH_DIR', str(tmp_path / "graphs"))
+    return tmp_path
+
+
+def test_relayout_rewrites_every_wallet_position(graph_dir):
+    ring = [f"r{i}" for i in range(12)]
+    base = write_transfers(graph_dir / "base.csv", ring + ["x0", "x1"], ring[1:] + ring[:1] + ["x1", "x2"],
+                           "2024-01-01")
+    delta = write_transfers(graph_dir / "delta.csv", ["x2"], ["new"], "2024-02-01")
+    client = Client()
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "p", base)
+
+    # A project stored before layouts were kept is laid out again on append
+    graph = load_project_graph("p")
+    graph.positions = np.zeros((0, 2))
+    save_project_graph("p", graph)
+    job = run_job(run_append_analysis, APPEND_STAGES, client, "p", delta)
+    assert job.stages['layout']['detail']['relayout']
+
+    graph = load_project_graph("p")
+    rows = client.wallets("p")
+    assert len(rows) == graph.num_wallets
+    codes = graph.wallets.get_indexer(list(rows))
+    stored = np.array([[row['position_x'], row['position_y']] for row in rows.values()])
+    assert np.allclose(stored, graph.positions[codes])
+
+
+def test_append_scores_wallets_as_a_full_analysis_would(graph_dir):
+    base = clustered_transfers(graph_dir / "base.csv", 3000, list(range(20)), 50, "2024-01-01", seed=1,
+                               mixer_cluster=10)
+    delta = clustered_transfers(graph_dir / "delta.csv", 60, [0], 55, "2024-03-01", seed=2)
+    # Chains far longer than the re-scored neighbourhood that the delta
+    # extends. A mixer's funds, halved at every hop into a side wallet, reach
+    # the delta only through taint; the run that forwards a constant amount
+    # turns into one peel chain once the delta peels its last hop.
+    split = [MIXER] + [f"a{i}" for i in range(10)]
+    senders = [MIXER] + [wallet for wallet in split[1:-1] for _ in range(2)]
+    receivers = ["a0"] + [wallet for i in range(9) for wallet in (f"a{i + 1}", f"s{i}")]
+    amounts = [1024.0] + [2.0 ** (9 - i) for i in range(9) for _ in range(2)]
+    peel = [f"p{i}" for i in range(10)]
+    write_transfers(graph_dir / "chain.csv", senders + peel[:-1], receivers + peel[1:], "2024-02-01",
+                    amounts=amounts + [100.0] * 9)
+    write_transfers(graph_dir / "tail.csv", ["a9", "p9"], ["a-tail", "p-tail"], "2024-03-02", amounts=[1.0, 8.0])
+    for path, extra in ((base, "chain.csv"), (delta, "tail.csv")):
+        pd.concat([pd.read_csv(path), pd.read_csv(graph_dir / extra)]).to_csv(path, index=False)
+    full = graph_dir / "full.csv"
+    pd.concat([pd.read_csv(base), pd.read_csv(delta)]).to_csv(full, index=False)
+
+    client = Client()
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "appended", base)
+    job = run_job(run_append_analysis, APPEND_STAGES, client, "appended", delta)
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "full", full)
+    # Only the delta's cluster is re-scored
+    assert job.result["affectedWallets"] < len(client.wallets("full")) // 4
+
+    compared = ('risk_score', 'risk_factors', 'inflow', 'outflow', 'transaction_count')
+    appended, reanalysed = client.wallets("appended"), client.wallets("full")
+    assert appended.keys() == reanalysed.keys()
+    for wallet, row in reanalysed.items():
+        assert {key: appended[wallet][key] for key in compared} == {key: row[key] for key in compared}, wallet
+
+    appended_graph, full_graph = load_project_graph("appended"), load_project_graph("full")
+    assert appended_graph.wallets.equals(full_graph.wallets)
+    assert np.array_equal(appended_graph.src, full_graph.src) and np.array_equal(appended_graph.dst, full_graph.dst)
+
+
+def test_append_keeps_existing_positions_and_places_new_wallets(graph_dir):
+    ring = [f"r{i}" for i in range(12)]
+    base = write_transfers(graph_dir / "base.csv", ring, ring[1:] + ring[:1], "2024-01-01")
+    delta = write_transfers(graph_dir / "delta.csv", ["r3", "new"], ["new", "newer"], "2024-02-01")
+    client = Client()
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "p", base)
+    before = {wallet: (row['position_x'], row['position_y']) for wallet, row in client.wallets("p").items()}
+
+    job = run_job(run_append_analysis, APPEND_STAGES, client, "p", delta)
+    assert not job.stages['layout']['detail']['relayout']
+    rows = client.wallets("p")
+    assert {wallet: (rows[wallet]['position_x'], rows[wallet]['position_y']) for wallet in before} == before
+
+    graph = load_project_graph("p")
+    assert len(graph.positions) == graph.num_wallets
+    codes = graph.wallets.get_indexer(["new", "newer"])
+    stored = np.array([[rows[wallet]['position_x'], rows[wallet]['position_y']] for wallet in ("new", "newer")])
+    assert np.allclose(stored, graph.positions[codes])
@@ -0,0 +1,35 @@
+"""
+Cycle detection regression tests.
+
+Run from backend/:  python -m pytest test_cycles.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from cycles import MAX_CYCLE_LENGTH
+from detectors import detect_circular_transactions
+from graph_core import CompactGraph, NAT
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+def ring(length: int, timestamped: bool) -> CompactGraph:
+    """w0 -> w1 -> ... -> w{length-1} -> w0, one hour between transfers"""
+    src = np.arange(length, dtype=np.int32)
+    dst = (src + 1) % length
+    timestamp = (np.arange(length, dtype=np.int64) * HOUR_NS if timestamped
+                 else np.full(length, NAT, dtype=np.int64))
+    wallets = pd.Index([f"w{i}" for i in range(length)], dtype=object)
+    return CompactGraph(wallets, src, dst, np.ones(length), timestamp)
+
+
+def test_longest_temporal_ring_is_found():
+    assert detect_circular_transactions(ring(MAX_CYCLE_LENGTH, timestamped=True)) == {'w0': 1}
+
+
+def test_temporal_and_static_search_agree_on_length_limit():
+    for length in (MAX_CYCLE_LENGTH, MAX_CYCLE_LENGTH + 1):
+        temporal = detect_circular_transactions(ring(length, timestamped=True))
+        static = detect_circular_transactions(ring(length, timestamped=False))
+        assert len(temporal) == len(static)
@@ -0,0 +1,43 @@
+"""
+Analysis cache tests.
+
+Run from backend/:  python -m pytest test_dataset_cache.py
+"""
+
+import os
+import time
+
+import pytest
+
+from dataset_cache import AnalysisCache
+
+
+def test_entries_round_trip_in_a_private_directory(tmp_path):
+    directory = tmp_path / "cache"
+    cache = AnalysisCache(str(directory))
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    cache.put("upload", {"transaction_count": 3, "wallets_to_insert": [{"wallet_hash": "a"}]})
+    assert cache.get("upload") == {"transaction_count": 3, "wallets_to_insert": [{"wallet_hash": "a"}]}
+    assert cache.get("other") is None
+
+
+def test_directory_open_to_other_users_is_refused(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        AnalysisCache(str(directory))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=10 ** 6)
+    payload = {"data": b"x" * 400_000}
+    # Recency is the entry's mtime; step past the filesystem's timestamp granularity
+    for operation in (lambda: cache.put("first", payload), lambda: cache.put("second", payload),
+                      lambda: cache.get("first")):
+        operation()
+        time.sleep(0.05)
+    cache.put("third", payload)
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
@@ -0,0 +1,50 @@
+"""
+Dormant activation tests: quiet gaps in a wallet's timeline followed by a burst.
+
+Run from backend/:  python -m pytest test_dormancy.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from detectors import detect_dormant_activation
+from graph_core import CompactGraph, NAT
+
+DAY_NS = 86400 * 10 ** 9
+
+
+def activity(days: list, amounts: list, timestamped: bool = True) -> CompactGraph:
+    """'w' receives each amount on the given day, each from a fresh sender"""
+    count = len(days)
+    wallets = pd.Index(["w"] + [f"s{i}" for i in range(count)], dtype=object)
+    timestamp = (np.array(days, dtype=np.int64) * DAY_NS if timestamped
+                 else np.full(count, NAT, dtype=np.int64))
+    return CompactGraph(wallets, np.arange(1, count + 1), np.zeros(count), np.array(amounts, dtype=float), timestamp)
+
+
+def test_burst_after_a_long_gap_is_flagged():
+    flagged = detect_dormant_activation(activity([0, 1, 2, 122, 123, 125], [10, 10, 10, 40, 40, 20]))
+    assert flagged == {'w': {
+        "dormantDays": 120.0,
+        "reactivatedAt": "1970-05-03T00:00:00.000000+00:00",
+        "burstVolume": 100.0,
+        "burstTransfers": 3,
+    }}
+
+
+def test_short_gaps_and_small_bursts_are_not():
+    assert detect_dormant_activation(activity([0, 1, 2, 80, 81], [10, 10, 10, 40, 40])) == {}
+    # Waking up with less than moved before the gap
+    assert detect_dormant_activation(activity([0, 1, 2, 122], [10, 10, 10, 20])) == {}
+    # The burst only counts what moved within a week of waking up
+    assert detect_dormant_activation(activity([0, 1, 2, 122, 130], [10, 10, 10, 20, 20])) == {}
+
+
+def test_longest_gap_is_reported():
+    flagged = detect_dormant_activation(activity([0, 100, 400], [10, 20, 100]))
+    assert flagged['w']["dormantDays"] == 300.0
+    assert flagged['w']["burstVolume"] == 100.0
+
+
+def test_no_timestamps_no_dormancy():
+    assert detect_dormant_activation(activity([0, 200], [10, 100], timestamped=False)) == {}
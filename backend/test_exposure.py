@@ -0,0 +1,78 @@
+"""
+k-hop exposure tests: hop distances, value-weighted shares and the report.
+
+Run from backend/:  python -m pytest test_exposure.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from exposure import ExposureIndex, exposure_report
+from graph_core import CompactGraph
+
+
+def graph(transfers: list) -> CompactGraph:
+    """CompactGraph of (sender, receiver, amount) transfers"""
+    senders, receivers, amounts = zip(*transfers)
+    wallets = pd.Index(pd.unique(np.array(senders + receivers, dtype=object)), dtype=object)
+    return CompactGraph(wallets, wallets.get_indexer(senders), wallets.get_indexer(receivers), amounts,
+                        np.zeros(len(transfers), dtype=np.int64))
+
+
+def scored(compact: CompactGraph, seeds: list, max_hops: int = 3) -> dict:
+    exposure = ExposureIndex(compact).score(compact.codes(seeds), max_hops)
+    return {wallet: (int(hops), round(float(inbound), 6), round(float(outbound), 6))
+            for wallet, hops, inbound, outbound in zip(compact.wallets, exposure.hops, exposure.inbound,
+                                                       exposure.outbound)}
+
+
+def test_inflow_from_a_seed_is_traced_downstream():
+    compact = graph([("mixer", "a", 100.0), ("x", "a", 100.0), ("a", "b", 50.0), ("b", "c", 10.0),
+                     ("c", "d", 10.0)])
+    assert scored(compact, ["mixer"]) == {
+        "mixer": (0, 1.0, 1.0),
+        "a": (1, 0.5, 0.0),
+        "x": (2, 0.0, 0.0),
+        "b": (2, 0.5, 0.0),
+        "c": (3, 0.5, 0.0),
+        "d": (-1, 0.0, 0.0),  # beyond max_hops
+    }
+
+
+def test_outflow_to_a_seed_is_traced_upstream():
+    compact = graph([("a", "mixer", 30.0), ("a", "y", 70.0), ("z", "a", 5.0)])
+    exposure = scored(compact, ["mixer"])
+    assert exposure["a"] == (1, 0.0, 0.3)
+    assert exposure["z"] == (2, 0.0, 0.3)
+    assert exposure["y"] == (2, 0.0, 0.0)
+
+
+def test_scoring_a_small_ball_matches_dense_propagation():
+    rng = np.random.default_rng(5)
+    count, size = 3000, 2000
+    transfers = [(f"w{s}", f"w{r}", float(a)) for s, r, a in
+                 zip(rng.integers(0, size, count), rng.integers(0, size, count), rng.integers(1, 100, count))]
+    compact = graph(transfers)
+    seeds = compact.codes(["w0", "w1"])
+    exposure = ExposureIndex(compact).score(seeds, 3)
+    assert 0 < len(exposure.reached()) < compact.num_nodes // 4  # the sliced path
+
+    received = np.zeros((compact.num_nodes, compact.num_nodes))
+    np.add.at(received, (compact.out_nbr, compact.out_src), compact.out_amount)
+    is_seed = np.isin(np.arange(compact.num_nodes), seeds)
+    for matrix, result in ((received, exposure.inbound), (received.T, exposure.outbound)):
+        totals = matrix.sum(axis=1, keepdims=True)
+        share = np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+        expected = is_seed.astype(float)
+        for _ in range(3):
+            expected = np.where(is_seed, 1.0, share @ expected)
+        assert np.allclose(result, expected)
+
+
+def test_report_orders_by_exposure_and_names_unknown_seeds():
+    compact = graph([("seed", "a", 90.0), ("other", "a", 10.0), ("seed", "b", 10.0), ("other", "b", 90.0)])
+    report = exposure_report(compact, ["seed", "missing"], min_exposure=0.05)
+    assert report["seeds"] == 1 and report["unknownSeeds"] == ["missing"]
+    # 'other' has no exposure: it only sends to wallets the seed also pays
+    assert [wallet["hash"] for wallet in report["wallets"]] == ["seed", "a", "b"]
+    assert report["wallets"][1] == {"hash": "a", "hops": 1, "inboundExposure": 0.9, "outboundExposure": 0.0}
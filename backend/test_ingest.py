@@ -0,0 +1,70 @@
+"""
+Streaming ingestion tests.
+
+Run from backend/:  python -m pytest test_ingest.py
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from ingest import WalletAggregator, iter_csv_chunks, map_columns, missing_required_fields, read_csv_header
+
+CSV = b"""Source Address,Destination,Value,Block Time,Token
+a,b,10,2024-01-01T00:00:00,ETH
+b,c,4,2024-01-01T01:00:00,
+c,a,x,2024-01-01T02:00:00,USDT
+d,b,1,,ETH
+a,d,2,2024-01-01T04:00:00,ETH
+"""
+
+
+def test_columns_are_mapped_by_keyword():
+    mapping = map_columns(["Source Address", "Destination", "Value", "Block Time", "Token"])
+    assert mapping == {'from_wallet': "Source Address", 'to_wallet': "Destination", 'amount': "Value",
+                       'timestamp': "Block Time", 'token_type': "Token"}
+    # 'to' in 'token' does not take the receiver slot
+    assert map_columns(["from", "token_type", "to", "amount"])['to_wallet'] == "to"
+    assert missing_required_fields(map_columns(["from", "amount"])) == ['to_wallet']
+
+
+def test_chunks_are_normalized():
+    source = io.BytesIO(CSV)
+    chunks = list(iter_csv_chunks(source, map_columns(read_csv_header(source)), chunk_rows=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    rows = pd.concat(chunks)
+    assert rows['amount'].tolist() == [10.0, 4.0, 0.0, 1.0, 2.0]  # unparseable -> 0
+    assert rows['token_type'].tolist() == ["ETH", "ETH", "USDT", "ETH", "ETH"]
+    assert rows['timestamp'].iloc[3] is None
+
+
+def test_chunked_aggregation_matches_one_pass():
+    rng = np.random.default_rng(0)
+    senders = [f"w{i}" for i in rng.integers(0, 300, 5000)]
+    receivers = [f"w{i}" for i in rng.integers(0, 300, 5000)]
+    amounts = rng.random(5000)
+    frame = pd.DataFrame({'from_wallet': senders, 'to_wallet': receivers, 'amount': amounts})
+
+    chunked = WalletAggregator()
+    codes = [chunked.add_chunk(frame.iloc[start:start + 700]) for start in range(0, len(frame), 700)]
+    whole = WalletAggregator()
+    whole_codes = whole.add_chunk(frame)
+
+    assert chunked.wallets.equals(whole.wallets)
+    assert np.array_equal(np.concatenate([c[0] for c in codes]), whole_codes[0])
+    assert np.array_equal(np.concatenate([c[1] for c in codes]), whole_codes[1])
+    assert np.allclose(chunked.inflow, whole.inflow) and np.allclose(chunked.outflow, whole.outflow)
+    assert np.array_equal(chunked.tx_count, whole.tx_count)
+    # Codes follow first appearance, reading each row's sender before its receiver
+    interleaved = np.column_stack((senders, receivers)).ravel()
+    assert whole.wallets.tolist() == pd.unique(interleaved).tolist()
+
+
+def test_assigned_wallets_keep_their_codes():
+    aggregator = WalletAggregator()
+    aggregator.wallets = pd.Index(["a", "b"], dtype=object)
+    aggregator.add_wallets(["c"])
+    from_codes, to_codes = aggregator.encode(["c", "d"], ["a", "b"])
+    assert from_codes.tolist() == [2, 3] and to_codes.tolist() == [0, 1]
+    assert aggregator.wallets.tolist() == ["a", "b", "c", "d"]
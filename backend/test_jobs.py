@@ -0,0 +1,104 @@
+"""
+Background job tests: stage progress, resume and eviction of finished jobs.
+
+Run from backend/:  python -m pytest test_jobs.py
+"""
+
+import io
+import os
+import time
+
+import pytest
+
+import jobs
+from jobs import AnalysisJob, JobManager
+
+STAGES = ['parse', 'detect', 'persist']
+
+
+def flaky_runner(failures: dict):
+    """Runs every stage, failing 'detect' while failures['detect'] > 0"""
+    def run(job):
+        job.run_stage('parse', lambda: {"rows": 1})
+
+        def detect():
+            if failures.get('detect', 0) > 0:
+                failures['detect'] -= 1
+                raise RuntimeError("detector crashed")
+            return {"flagged": 1}
+        job.run_stage('detect', detect)
+        job.run_stage('persist', lambda: None)
+        return {"ok": True}
+    return run
+
+
+def wait(job: AnalysisJob) -> AnalysisJob:
+    deadline = time.monotonic() + 5
+    while job.status in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def submit(manager: JobManager, upload: bytes = b"from,to,amount\n") -> AnalysisJob:
+    job = AnalysisJob("p", "u", "upload.csv", STAGES)
+    manager.save_upload(job, io.BytesIO(upload))
+    return wait(manager.submit(job, client=object()))
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_UPLOAD_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_completed_job_reports_every_stage_and_drops_its_upload():
+    manager = JobManager(flaky_runner({}))
+    job = submit(manager)
+    status = job.to_dict()
+    assert status["status"] == "completed" and status["progress"] == 1.0
+    assert [stage["status"] for stage in status["stages"]] == ["completed"] * 3
+    assert status["result"] == {"ok": True}
+    assert job.state == {} and not os.path.exists(job.upload_path)
+
+
+def test_failed_job_resumes_from_the_failed_stage():
+    manager = JobManager(flaky_runner({'detect': 1}))
+    job = submit(manager)
+    assert job.status == "failed" and job.failed_stage == 'detect'
+    assert job.to_dict()["resumable"] and os.path.exists(job.upload_path)
+    parse_finished = job.stages['parse']['finishedAt']
+
+    wait(manager.resume(job, client=object()))
+    assert job.status == "completed" and job.attempts == 2
+    # parse was not run again
+    assert job.stages['parse']['finishedAt'] == parse_finished
+
+
+def test_only_failed_jobs_resume():
+    manager = JobManager(flaky_runner({}))
+    job = submit(manager)
+    with pytest.raises(ValueError):
+        manager.resume(job, client=object())
+
+
+def test_finished_jobs_expire_and_failed_ones_delete_their_upload():
+    manager = JobManager(flaky_runner({'detect': 1}), retention_seconds=0.05, resume_ttl_seconds=0.2)
+    failed = submit(manager)
+    manager._runner = flaky_runner({})
+    completed = submit(manager)
+    time.sleep(0.1)
+    assert manager.get(completed.id) is None
+    assert manager.get(failed.id) is failed
+
+    time.sleep(0.15)
+    assert manager.get(failed.id) is None
+    assert failed.state == {} and not os.path.exists(os.path.dirname(failed.upload_path))
+    with pytest.raises(ValueError):
+        manager.resume(failed, client=object())
+
+
+def test_oldest_finished_jobs_go_past_the_count_limit():
+    manager = JobManager(flaky_runner({}), max_finished=2)
+    first, second, third = submit(manager), submit(manager), submit(manager)
+    assert manager.get(first.id) is None
+    assert manager.get(second.id) is second and manager.get(third.id) is third
@@ -0,0 +1,61 @@
+"""
+Layout tests: the force-directed layout and the placement of appended wallets.
+
+Run from backend/:  python -m pytest test_layout.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from graph_core import CompactGraph
+from layout import LAYOUT_EDGE_LENGTH, force_layout, place_new_nodes, undirected_pairs
+
+
+def rings(count: int, size: int) -> CompactGraph:
+    """`count` separate rings of `size` wallets, ring r holding codes r*size.."""
+    codes = np.arange(count * size)
+    src = codes
+    dst = codes - codes % size + (codes + 1) % size
+    wallets = pd.Index([f"w{i}" for i in codes], dtype=object)
+    return CompactGraph(wallets, src, dst, np.ones(len(src)), np.zeros(len(src), dtype=np.int64))
+
+
+def test_layout_is_finite_centred_and_deterministic():
+    graph = rings(12, 25)
+    positions = force_layout(graph)
+    assert positions.shape == (graph.num_nodes, 2)
+    assert np.isfinite(positions).all()
+    assert np.allclose(positions.mean(axis=0), 0)
+    assert np.array_equal(positions, force_layout(graph))
+
+
+def test_linked_wallets_sit_closer_than_unlinked_ones():
+    graph = rings(12, 25)
+    positions = force_layout(graph)
+    u, v = undirected_pairs(graph)
+    linked = np.sqrt(((positions[u] - positions[v]) ** 2).sum(axis=1))
+    rng = np.random.default_rng(0)
+    a, b = rng.integers(0, graph.num_nodes, (2, 2000))
+    unlinked = np.sqrt(((positions[a] - positions[b]) ** 2).sum(axis=1))
+    assert np.median(linked) < np.median(unlinked) / 3
+
+
+def test_new_wallets_are_placed_next_to_their_neighbours():
+    rng = np.random.default_rng(1)
+    positions = rng.uniform(-500, 500, (50, 2))
+    # 50 hangs off wallet 7, 51 off wallet 50
+    src, dst = np.array([7, 50]), np.array([50, 51])
+    result = place_new_nodes(positions, 52, src, dst)
+    assert result.shape == (52, 2)
+    assert np.array_equal(result[:50], positions)
+    assert np.linalg.norm(result[50] - positions[7]) < 3 * LAYOUT_EDGE_LENGTH
+    assert np.linalg.norm(result[51] - result[50]) < 3 * LAYOUT_EDGE_LENGTH
+
+
+def test_wallets_linked_to_nothing_laid_out_go_on_the_rim():
+    positions = np.array([[0.0, 0.0], [100.0, 0.0], [0.0, -200.0]])
+    # 3 and 4 only transfer to each other
+    result = place_new_nodes(positions, 5, np.array([3]), np.array([4]))
+    radius = np.sqrt((positions ** 2).sum(axis=1)).max()
+    assert np.linalg.norm(result[3]) >= radius
+    assert np.linalg.norm(result[4] - result[3]) < 3 * LAYOUT_EDGE_LENGTH
@@ -0,0 +1,116 @@
+"""
+Keyset pagination tests: cursors, page limits and the NDJSON analysis stream.
+
+Run from backend/:  python -m pytest test_paging.py
+"""
+
+import json
+
+import paging
+from paging import fetch_page, iter_pages, stream_analysis
+
+
+class Query:
+    """PostgREST-style query over in-memory rows; records every filter it is given"""
+
+    def __init__(self, rows: list, log: list):
+        self.rows = rows
+        self.log = log
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.log.append(('eq', column, value))
+        self.rows = [row for row in self.rows if row[column] == value]
+        return self
+
+    def gt(self, column, value):
+        self.log.append(('gt', column, value))
+        self.rows = [row for row in self.rows if row[column] > value]
+        return self
+
+    def order(self, column):
+        self.rows = sorted(self.rows, key=lambda row: row[column])
+        return self
+
+    def limit(self, count):
+        self.log.append(('limit', count))
+        self.rows = self.rows[:count]
+        return self
+
+    def execute(self):
+        self.data = self.rows
+        return self
+
+
+class Client:
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.log = []
+
+    def table(self, name: str) -> Query:
+        return Query(self.tables[name], self.log)
+
+
+def wallet(project: str, wallet_hash: str, risk: int = 0) -> dict:
+    return {"id": f"{project}-{wallet_hash}", "project_id": project, "wallet_hash": wallet_hash,
+            "position_x": 1.5, "position_y": -2.0, "risk_score": risk, "risk_factors": None,
+            "inflow": 10.0, "outflow": 5.0, "transaction_count": 2}
+
+
+def transaction(project: str, number: int) -> dict:
+    return {"id": f"{project}-tx{number:03d}", "project_id": project, "from_wallet": "a", "to_wallet": "b",
+            "amount": float(number), "timestamp": None, "token_type": None}
+
+
+def test_pages_continue_after_the_last_key():
+    rows = [wallet("p", f"w{i:02d}") for i in range(7)] + [wallet("q", "w00")]
+    client = Client({'wallets': rows[::-1]})
+    first, cursor = fetch_page(client, 'wallets', "p", limit=3)
+    assert [w["hash"] for w in first] == ["w00", "w01", "w02"] and cursor == "w02"
+    assert first[0] == {"id": "p-w00", "hash": "w00", "x": 1.5, "y": -2.0, "riskScore": 0, "riskFactors": None,
+                        "inflow": 10.0, "outflow": 5.0, "transactionCount": 2}
+
+    pages = list(iter_pages(client, 'wallets', "p", page_size=3))
+    assert [[w["hash"] for w in page] for page in pages] == [["w00", "w01", "w02"], ["w03", "w04", "w05"], ["w06"]]
+    assert ('gt', 'wallet_hash', "w02") in client.log and ('gt', 'wallet_hash', "w05") in client.log
+
+
+def test_a_full_last_page_ends_with_an_empty_one():
+    client = Client({'transactions': [transaction("p", i) for i in range(4)]})
+    pages = list(iter_pages(client, 'transactions', "p", page_size=2))
+    assert [len(page) for page in pages] == [2, 2]
+    items, cursor = fetch_page(client, 'transactions', "p", after="p-tx003", limit=2)
+    assert items == [] and cursor is None
+
+
+def test_rows_added_behind_the_cursor_do_not_shift_pages():
+    rows = [wallet("p", f"w{i}") for i in range(2, 8)]
+    client = Client({'wallets': rows})
+    first, cursor = fetch_page(client, 'wallets', "p", limit=3)
+    rows.insert(0, wallet("p", "w0"))  # sorts before the cursor
+    second, _ = fetch_page(client, 'wallets', "p", cursor, limit=3)
+    assert [w["hash"] for w in first + second] == [f"w{i}" for i in range(2, 8)]
+
+
+def test_page_size_is_clamped(monkeypatch):
+    monkeypatch.setattr(paging, 'ANALYSIS_MAX_PAGE_SIZE', 5)
+    client = Client({'wallets': [wallet("p", f"w{i}") for i in range(10)]})
+    items, _ = fetch_page(client, 'wallets', "p", limit=50)
+    assert len(items) == 5
+    items, _ = fetch_page(client, 'wallets', "p", limit=0)
+    assert len(items) == 1
+
+
+def test_stream_sends_pages_then_statistics():
+    client = Client({
+        'wallets': [wallet("p", "a", risk=80), wallet("p", "b", risk=10), wallet("p", "c", risk=51)],
+        'transactions': [transaction("p", i) for i in range(1, 4)],
+    })
+    lines = [json.loads(line) for line in stream_analysis(client, {"id": "p", "name": "Case"}, page_size=2)]
+    assert [line["type"] for line in lines] == ["project", "wallets", "wallets", "transactions", "transactions",
+                                                "statistics"]
+    assert lines[0] == {"type": "project", "id": "p", "name": "Case"}
+    assert lines[-1]["statistics"] == {"totalTransactions": 3, "uniqueWallets": 3, "suspiciousWallets": 2,
+                                       "totalVolume": 6.0}
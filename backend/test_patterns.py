@@ -0,0 +1,153 @@
+"""
+Pattern instance regression tests: an append must store the same instances
+as re-analysing the whole project.
+
+Run from backend/:  python -m pytest test_patterns.py
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import graph_store
+import patterns
+from jobs import AnalysisJob
+from patterns import decode_patterns
+from pipeline import PIPELINE_STAGES, APPEND_STAGES, run_project_analysis, run_append_analysis
+
+
+class Query:
+    """The slice of the supabase query builder the pipeline uses, over in-memory rows"""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.filters = []
+        self.action = None
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def select(self, *args):
+        self.action = ('select',)
+        return self
+
+    def insert(self, row):
+        self.action = ('insert', row)
+        return self
+
+    def update(self, values):
+        self.action = ('update', values)
+        return self
+
+    def upsert(self, rows, on_conflict, ignore_duplicates=False, **kwargs):
+        self.action = ('upsert', rows, on_conflict.split(','), ignore_duplicates)
+        return self
+
+    def execute(self):
+        matches = [row for row in self.rows if all(row.get(column) == value for column, value in self.filters)]
+        if self.action[0] == 'insert':
+            self.rows.append(dict(self.action[1]))
+            matches = [self.action[1]]
+        elif self.action[0] == 'update':
+            for row in matches:
+                row.update(self.action[1])
+        elif self.action[0] == 'upsert':
+            _, rows, keys, ignore_duplicates = self.action
+            index = {tuple(row.get(key) for key in keys): row for row in self.rows}
+            for row in rows:
+                existing = index.get(tuple(row.get(key) for key in keys))
+                if existing is None:
+                    self.rows.append(dict(row))
+                elif not ignore_duplicates:
+                    existing.update(row)
+        self.data = matches
+        return self
+
+
+class Client:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name: str) -> Query:
+        return Query(self.tables.setdefault(name, []))
+
+
+def transfers(count: int, clusters: list, cluster_size: int, start: str, seed: int) -> pd.DataFrame:
+    """Random transfers within separate wallet clusters, so an append into one
+    cluster leaves the others outside its neighbourhood"""
+    rng = np.random.default_rng(seed)
+    cluster = rng.choice(clusters, count) * cluster_size
+    # Skewed senders, so some wallets fan out widely
+    senders = cluster + (rng.pareto(1.5, count) * 2).astype(int) % cluster_size
+    receivers = cluster + rng.integers(0, cluster_size, count)
+    return pd.DataFrame({
+        "transaction_hash": [f"{seed}-{i}" for i in range(count)],
+        "from_wallet": [f"w{s}" for s in senders],
+        "to_wallet": [f"w{r}" for r in receivers],
+        "amount": rng.integers(1, 20000, count).astype(float),
+        "timestamp": pd.date_range(start, periods=count, freq="17min").strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+
+def run_job(runner, stages: list, client: Client, project_id: str, path) -> AnalysisJob:
+    job = AnalysisJob(project_id, "user", path.name, stages)
+    job.upload_path = str(path)
+    job.client = client
+    job.result = runner(job)
+    return job
+
+
+def stored_patterns(client: Client, project_id: str) -> set:
+    rows = [row for row in client.tables['analyses'] if row['project_id'] == project_id]
+    return {json.dumps(p, sort_keys=True) for p in decode_patterns(rows[0]['results_json'])}
+
+
+@pytest.fixture
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_store, 'PROJECT_GRAPH_DIR', str(tmp_path / "graphs"))
+    # Small enough that most types have more hits than are kept
+    monkeypatch.setattr(patterns, 'PATTERN_MAX_INSTANCES', 5)
+    return tmp_path
+
+
+def test_append_stores_the_same_patterns_as_a_full_analysis(isolated_store):
+    base = transfers(3000, list(range(30)), 60, "2024-01-01", seed=1)
+    delta = transfers(80, [0], 70, "2024-03-01", seed=2)
+    base.to_csv(isolated_store / "base.csv", index=False)
+    delta.to_csv(isolated_store / "delta.csv", index=False)
+    pd.concat([base, delta]).to_csv(isolated_store / "full.csv", index=False)
+
+    client = Client()
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "appended", isolated_store / "base.csv")
+    run_job(run_append_analysis, APPEND_STAGES, client, "appended", isolated_store / "delta.csv")
+    run_job(run_project_analysis, PIPELINE_STAGES, client, "full", isolated_store / "full.csv")
+
+    appended, full = stored_patterns(client, "appended"), stored_patterns(client, "full")
+    assert appended == full
+
+
+def test_merge_keeps_the_highest_counts_of_each_type(monkeypatch):
+    monkeypatch.setattr(patterns, 'PATTERN_MAX_INSTANCES', 2)
+    wallets = pd.Index(["a", "b", "c", "d"], dtype=object)
+
+    def instance(pattern_type, wallet, count):
+        return {"type": pattern_type, "wallet": wallet, "count": count}
+
+    existing = [instance("layering", "a", 5), instance("layering", "b", 3), instance("mixer", "a", 2),
+                instance("mixer", "b", 3)]
+    updated = [instance("layering", "c", 4), instance("layering", "d", 4), instance("mixer", "c", 1)]
+    merged = patterns.merge_patterns(existing, updated, {"c", "d"}, wallets)
+    assert [(p["type"], p["wallet"]) for p in merged] == [
+        ("layering", "a"), ("layering", "c"),
+        # Fewest hops first
+        ("mixer", "c"), ("mixer", "a"),
+    ]
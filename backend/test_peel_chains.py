@@ -0,0 +1,79 @@
+"""
+Peel chain tests: runs, the amount-decay split and the run extension appends
+re-score through.
+
+Run from backend/:  python -m pytest test_peel_chains.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from detectors import detect_peel_chain
+from graph_core import CompactGraph
+from graph_store import ProjectGraph
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+def graph(transfers: list) -> CompactGraph:
+    """CompactGraph of (sender, receiver, amount) transfers, an hour apart"""
+    senders, receivers, amounts = zip(*transfers)
+    wallets = pd.Index(pd.unique(np.array(senders + receivers, dtype=object)), dtype=object)
+    return CompactGraph(wallets, wallets.get_indexer(senders), wallets.get_indexer(receivers), amounts,
+                        np.arange(len(transfers), dtype=np.int64) * HOUR_NS)
+
+
+def run(wallets: list, amounts: list) -> list:
+    return list(zip(wallets[:-1], wallets[1:], amounts))
+
+
+def test_decaying_run_is_one_chain():
+    wallets = [f"w{i}" for i in range(6)]
+    chains = detect_peel_chain(graph(run(wallets, [100, 90, 80, 80, 50])))
+    assert set(chains) == set(wallets)
+    assert chains['w0'] == {"length": 6, "peeledValue": 50.0, "members": wallets}
+
+
+def test_runs_forwarding_a_constant_amount_peel_nothing():
+    assert detect_peel_chain(graph(run([f"w{i}" for i in range(8)], [100] * 7))) == {}
+
+
+def test_an_increase_splits_the_run():
+    wallets = [f"w{i}" for i in range(10)]
+    # w0..w5 decay, w5 forwards more than w4 did, w5..w9 decay again
+    chains = detect_peel_chain(graph(run(wallets, [100, 90, 80, 70, 60, 500, 400, 300, 200])))
+    assert chains['w0']['members'] == wallets[:6]
+    assert chains['w9']['members'] == wallets[5:]
+    # The wallet both stretches share keeps the longer one
+    assert chains['w5']['length'] == 6
+
+    chains = detect_peel_chain(graph(run(wallets[:8], [100, 90, 80, 500, 400, 300, 200])))
+    assert set(chains) == set(wallets[3:8])  # w0..w3 is too short
+
+
+def test_wallets_with_several_receivers_end_the_run():
+    wallets = [f"w{i}" for i in range(8)]
+    transfers = run(wallets, [70, 60, 50, 40, 30, 20, 10]) + [("w3", "side", 5)]
+    chains = detect_peel_chain(graph(transfers))
+    # w3 ends w0..w3 and w4 heads w4..w7, both too short
+    assert chains == {}
+    chains = detect_peel_chain(graph(transfers), min_length=4)
+    assert chains['w0']['members'] == wallets[:4] and chains['w4']['members'] == wallets[4:]
+
+
+def test_append_mask_is_extended_to_whole_runs():
+    project = ProjectGraph()
+    wallets = [f"p{i}" for i in range(10)]
+    transfers = run(wallets, [100] * 9) + [(f"h{i}", "p9", 1) for i in range(5)]
+    senders, receivers, amounts = zip(*transfers)
+    project.add_chunk(pd.DataFrame({
+        'from_wallet': senders, 'to_wallet': receivers, 'amount': amounts,
+        'timestamp': pd.date_range("2024-01-01", periods=len(transfers), freq="h").strftime("%Y-%m-%dT%H:%M:%S"),
+    }))
+    mask = np.zeros(project.num_wallets, dtype=bool)
+    mask[project.wallets.get_indexer(["p9"])] = True
+
+    extended = project.wallets[project.extend_along_runs(mask)]
+    # The run into p9 is pulled in end to end; the hub's other one-receiver
+    # senders are not
+    assert set(extended) == set(wallets)
@@ -0,0 +1,101 @@
+"""
+Bulk persistence tests: batching, idempotent retries and the resume watermark.
+
+Run from backend/:  python -m pytest test_persistence.py
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from persistence import BulkWriter, transaction_row_id
+
+
+class UpsertTable:
+    """Records upserts keyed on the conflict column; fails the calls listed in `fail_on`"""
+
+    def __init__(self, fail_on=()):
+        self.rows = {}
+        self.batches = []
+        self.calls = 0
+        self.fail_on = set(fail_on)
+        self._lock = threading.Lock()
+
+    def table(self, name: str):
+        return self
+
+    def upsert(self, rows, on_conflict, ignore_duplicates, returning):
+        return SimpleNamespace(execute=lambda: self._apply(rows, on_conflict, ignore_duplicates))
+
+    def _apply(self, rows, on_conflict, ignore_duplicates):
+        with self._lock:
+            self.calls += 1
+            if self.calls in self.fail_on:
+                raise ConnectionError("connection reset")
+            self.batches.append(len(rows))
+            for row in rows:
+                if row[on_conflict] not in self.rows or not ignore_duplicates:
+                    self.rows[row[on_conflict]] = dict(row)
+
+
+def rows(start: int, stop: int) -> list:
+    return [{"id": transaction_row_id("p", "job", i), "n": i} for i in range(start, stop)]
+
+
+def test_row_ids_are_deterministic():
+    assert transaction_row_id("p", "job", 3) == transaction_row_id("p", "job", 3)
+    assert len({transaction_row_id("p", "job", i) for i in range(100)} | {transaction_row_id("q", "job", 0)}) == 101
+
+
+def test_chunks_are_resliced_into_full_batches():
+    client = UpsertTable()
+    stats = BulkWriter(client, 'transactions', 'id', batch_rows=4, concurrency=1).write(
+        [rows(0, 3), rows(3, 13), [], rows(13, 14)]
+    )
+    assert client.batches == [4, 4, 4, 2]
+    assert stats.rows == 14 and stats.batches == 4
+    assert sorted(row["n"] for row in client.rows.values()) == list(range(14))
+
+
+def test_failed_batches_are_retried():
+    client = UpsertTable(fail_on={2})
+    stats = BulkWriter(client, 'transactions', 'id', batch_rows=5, concurrency=2, max_retries=1).write([rows(0, 20)])
+    assert stats.retries == 1 and stats.rows == 20
+    assert len(client.rows) == 20
+
+
+def test_rewriting_from_the_watermark_does_not_duplicate_rows():
+    client = UpsertTable(fail_on={3})
+    progress = []
+    writer = BulkWriter(client, 'transactions', 'id', batch_rows=5, concurrency=1, max_retries=0)
+    with pytest.raises(ConnectionError):
+        writer.write([rows(0, 30)], on_progress=progress.append)
+    watermark = progress[-1]
+    assert watermark == 10  # the two batches before the failure
+
+    resumed = []
+    BulkWriter(client, 'transactions', 'id', batch_rows=5, concurrency=1).write(
+        [rows(watermark, 30)], on_progress=resumed.append, start_offset=watermark
+    )
+    assert resumed[-1] == 30
+    assert sorted(row["n"] for row in client.rows.values()) == list(range(30))
+
+
+def test_watermark_only_covers_contiguous_batches():
+    client = UpsertTable()
+    progress = []
+    BulkWriter(client, 'transactions', 'id', batch_rows=3, concurrency=4).write(
+        [rows(0, 20)], on_progress=progress.append
+    )
+    assert progress == sorted(progress) and progress[-1] == 20
+
+
+def test_updates_replace_conflicting_rows_when_asked():
+    client = UpsertTable()
+    BulkWriter(client, 'wallets', 'id', batch_rows=10).write([rows(0, 3)])
+    changed = [dict(row, n=-1) for row in rows(0, 3)]
+    BulkWriter(client, 'wallets', 'id', batch_rows=10).write([changed])
+    assert {row["n"] for row in client.rows.values()} == {0, 1, 2}
+    BulkWriter(client, 'wallets', 'id', batch_rows=10, ignore_duplicates=False).write([changed])
+    assert {row["n"] for row in client.rows.values()} == {-1}
@@ -0,0 +1,95 @@
+"""
+Conditional GET and response cache tests.
+
+Run from backend/:  python -m pytest test_response_cache.py
+"""
+
+import time
+
+from response_cache import ResponseCache, etag_matches
+
+
+def project_row(project_id: str = "p", updated_at: str = "2024-01-01T00:00:00") -> dict:
+    return {"id": project_id, "name": "Project", "user_id": "u", "updated_at": updated_at}
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = 'W/"abc"'
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('W/"abd"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_etag_follows_the_stored_version_and_variant():
+    # Two caches stand in for two worker processes
+    first, second = ResponseCache(), ResponseCache()
+    before = first.etag(first.remember(project_row()), 'json')
+    after = second.etag(second.remember(project_row(updated_at="2024-01-02T00:00:00")), 'json')
+    assert before != after
+    assert first.etag(first.remember(project_row(updated_at="2024-01-02T00:00:00")), 'json') == after
+    assert second.etag(second.remember(project_row()), 'columnar') != before
+
+
+def test_bodies_are_only_served_for_their_version():
+    cache = ResponseCache()
+    project = cache.remember(project_row())
+    assert cache.put(project, 'json', "application/json", b"{}")
+    assert cache.get(project, 'json') == ("application/json", b"{}")
+
+    newer = cache.remember(project_row(updated_at="2024-01-02T00:00:00"))
+    assert cache.get(newer, 'json') is None
+    # Built from the old version while the project changed: not cached
+    assert not cache.put(project, 'json', "application/json", b"{}")
+
+
+def test_bodies_are_evicted_least_recently_used_first():
+    cache = ResponseCache(max_bytes=10, max_entry_bytes=8)
+    projects = [cache.remember(project_row(project_id)) for project_id in "abc"]
+    assert not cache.put(projects[0], 'json', "application/json", b"x" * 9)
+    cache.put(projects[0], 'json', "application/json", b"x" * 4)
+    cache.put(projects[1], 'json', "application/json", b"x" * 4)
+    cache.get(projects[0], 'json')
+    cache.put(projects[2], 'json', "application/json", b"x" * 4)
+    assert cache.get(projects[1], 'json') is None
+    assert cache.get(projects[0], 'json') is not None
+    assert cache.stats()["bytes"] == 8
+
+
+def test_remembered_versions_are_bounded_and_expire():
+    cache = ResponseCache(max_projects=2, project_ttl_seconds=0.05)
+    for project_id in "abc":
+        cache.remember(project_row(project_id))
+    assert cache.stats()["projects"] == 2
+
+    project = cache.remember(project_row("d"))
+    time.sleep(0.06)
+    assert not cache.put(project, 'json', "application/json", b"{}")
+    cache.remember(project_row("e"))
+    assert cache.stats()["projects"] == 1
+
+
+def test_streamed_body_is_cached_once_complete():
+    cache = ResponseCache()
+    project = cache.remember(project_row())
+    assert b"".join(cache.tee(project, 'ndjson', "application/x-ndjson", iter([b"a\n", b"b\n"]), None)) == b"a\nb\n"
+    assert cache.get(project, 'ndjson') == ("application/x-ndjson", b"a\nb\n")
+
+    def failing():
+        yield b"a\n"
+        raise RuntimeError("connection lost")
+
+    body = b"".join(cache.tee(project, 'json', "application/json", failing(), lambda e: b"error\n"))
+    assert body == b"a\nerror\n"
+    assert cache.get(project, 'json') is None
+
+
+def test_invalidate_drops_version_and_bodies():
+    cache = ResponseCache()
+    project = cache.remember(project_row())
+    cache.put(project, 'json', "application/json", b"{}")
+    cache.invalidate("p")
+    assert cache.get(project, 'json') is None
+    assert cache.stats() == {"projects": 0, "bodies": 0, "bytes": 0}
@@ -0,0 +1,105 @@
+"""
+Risk scoring tests: the default weights config scores wallets exactly as the
+per-wallet if-cascade it replaced did.
+
+Run from backend/:  python -m pytest test_scoring.py
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from detector_registry import DETECTORS
+from scoring import ScoringConfig, score_features
+
+
+def cascade_score(in_degree: int, out_degree: int, inflow: float, outflow: float, tx_count: int,
+                  flagged_weights: list) -> int:
+    """The if-cascade score_wallets used before scoring.py"""
+    risk_score = 0
+    if in_degree >= 3 and out_degree >= 3:
+        risk_score += 60
+    elif in_degree >= 2 and out_degree >= 2:
+        risk_score += 40
+
+    if in_degree >= 50:
+        risk_score += 55
+    elif in_degree >= 20:
+        risk_score += 45
+    elif in_degree >= 10:
+        risk_score += 35
+    elif in_degree > 0 and out_degree == 0 and inflow > 100:
+        risk_score += 25
+
+    if out_degree > 0 and in_degree == 0 and outflow > 100:
+        risk_score += 35
+
+    if inflow > 0 and outflow > 0:
+        ratio = max(outflow / inflow, inflow / outflow)
+        if ratio > 3:
+            risk_score += 25
+        elif ratio > 2:
+            risk_score += 15
+        elif ratio > 1.3:
+            risk_score += 8
+
+    if tx_count > 40:
+        risk_score += 15
+    elif tx_count > 30:
+        risk_score += 8
+
+    return min(risk_score + sum(flagged_weights), 100)
+
+
+def features(in_degree, out_degree, inflow, outflow, tx_count) -> dict:
+    inflow, outflow = np.asarray(inflow, dtype=float), np.asarray(outflow, dtype=float)
+    both = (inflow > 0) & (outflow > 0)
+    ratio = np.divide(np.maximum(inflow, outflow), np.minimum(inflow, outflow), out=np.zeros(len(inflow)),
+                      where=both)
+    return {'in_degree': np.asarray(in_degree), 'out_degree': np.asarray(out_degree), 'inflow': inflow,
+            'outflow': outflow, 'tx_count': np.asarray(tx_count), 'flow_ratio': ratio}
+
+
+def test_default_config_matches_the_cascade():
+    rng = np.random.default_rng(11)
+    count = 20000
+    # Values around every threshold, zero flows included
+    in_degree = rng.choice([0, 1, 2, 3, 9, 10, 19, 20, 49, 50, 80], count)
+    out_degree = rng.choice([0, 1, 2, 3, 5], count)
+    inflow = rng.choice([0.0, 50.0, 100.0, 100.5, 1000.0], count)
+    outflow = inflow * rng.choice([0.0, 0.3, 0.5, 1.0, 1.3, 1.31, 2.0, 2.5, 3.0, 4.0], count) + \
+        rng.choice([0.0, 150.0], count) * (inflow == 0)
+    tx_count = rng.integers(0, 50, count)
+    hits = {spec.key: rng.random(count) < 0.1 for spec in DETECTORS}
+
+    risk = score_features(features(in_degree, out_degree, inflow, outflow, tx_count), hits,
+                          ScoringConfig.load(), DETECTORS)
+    expected = [
+        cascade_score(int(in_degree[i]), int(out_degree[i]), float(inflow[i]), float(outflow[i]),
+                      int(tx_count[i]), [spec.weight for spec in DETECTORS if hits[spec.key][i]])
+        for i in range(count)
+    ]
+    assert risk.scores.tolist() == expected
+
+
+def test_contributions_explain_the_score():
+    config = ScoringConfig.load()
+    spec = SimpleNamespace(key='custom', weight=12)  # not in the config: scores its registered weight
+    risk = score_features(features([3, 0], [3, 1], [500.0, 0.0], [100.0, 150.0], [35, 1]),
+                          {'custom': np.array([True, False])}, config, [spec])
+    assert risk.factor_rows() == [
+        {"intermediary": 60, "imbalance": 25, "volume": 8, "custom": 12},
+        {"source": 35},
+    ]
+    assert risk.scores.tolist() == [100, 35]  # capped at maxScore
+    assert risk.tiers['intermediary'].tolist() == [0, -1]
+
+
+def test_config_rejects_unknown_features_and_comparisons():
+    factor = {"name": "f", "tiers": [{"points": 1, "when": {"balance": {"above": 1}}}]}
+    with pytest.raises(ValueError):
+        ScoringConfig({"version": "x", "factors": [factor]})
+    factor["tiers"][0]["when"] = {"inflow": {"around": 1}}
+    with pytest.raises(ValueError):
+        ScoringConfig({"version": "x", "factors": [factor]})
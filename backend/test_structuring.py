@@ -0,0 +1,60 @@
+"""
+Structuring detector tests: bursts of small transfers inside one time window.
+
+Run from backend/:  python -m pytest test_structuring.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from detectors import detect_structuring_pattern
+from graph_core import CompactGraph, NAT
+
+MINUTE_NS = 60 * 10 ** 9
+
+
+def sends(minutes: list, amount: float = 9000.0, timestamped: bool = True) -> CompactGraph:
+    """'smurf' sends `amount` to a fresh receiver at each of the given minutes"""
+    count = len(minutes)
+    wallets = pd.Index(["smurf"] + [f"r{i}" for i in range(count)], dtype=object)
+    timestamp = (np.array(minutes, dtype=np.int64) * MINUTE_NS if timestamped
+                 else np.full(count, NAT, dtype=np.int64))
+    return CompactGraph(wallets, np.zeros(count), np.arange(1, count + 1), np.full(count, amount), timestamp)
+
+
+def detect(graph: CompactGraph, outflow: float = 200000.0) -> dict:
+    wallets = {wallet: {'outflow': 0.0} for wallet in graph.wallets}
+    wallets['smurf']['outflow'] = outflow
+    return detect_structuring_pattern(graph, wallets)
+
+
+def test_burst_inside_one_window_is_flagged():
+    flagged = detect(sends([6 * i for i in range(11)]))
+    assert flagged == {'smurf': {
+        "transfers": 11,
+        "amount": 99000.0,
+        "windowStart": "1970-01-01T00:00:00.000000+00:00",
+        "windowEnd": "1970-01-01T01:00:00.000000+00:00",
+    }}
+
+
+def test_transfers_spread_over_many_windows_are_not():
+    assert detect(sends([20 * i for i in range(30)])) == {}
+
+
+def test_busiest_window_is_reported():
+    # Five sends an hour apart, then twelve within half an hour
+    flagged = detect(sends([60 * i for i in range(5)] + [600 + 2 * i for i in range(12)]))
+    assert flagged['smurf']['transfers'] == 12
+    assert flagged['smurf']['windowStart'] == "1970-01-01T10:00:00.000000+00:00"
+
+
+def test_large_transfers_and_low_volume_do_not_count():
+    assert detect(sends([i for i in range(20)], amount=20000.0)) == {}
+    assert detect(sends([i for i in range(20)]), outflow=50000.0) == {}
+
+
+def test_without_timestamps_the_upload_is_one_window():
+    flagged = detect(sends([60 * i for i in range(10)], timestamped=False))
+    assert flagged['smurf']['transfers'] == 10
+    assert flagged['smurf']['windowStart'] is None
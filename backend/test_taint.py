@@ -0,0 +1,85 @@
+"""
+Taint propagation tests: the poison, haircut and FIFO models.
+
+Run from backend/:  python -m pytest test_taint.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from graph_core import CompactGraph
+from taint import NEVER, TAINT_MODELS, propagate_taint, taint_report
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+def graph(transfers: list) -> CompactGraph:
+    """CompactGraph of (sender, receiver, amount, hour) transfers"""
+    senders, receivers, amounts, hours = zip(*transfers)
+    wallets = pd.Index(pd.unique(np.array(senders + receivers, dtype=object)), dtype=object)
+    return CompactGraph(wallets, wallets.get_indexer(senders), wallets.get_indexer(receivers), amounts,
+                        np.array(hours, dtype=np.int64) * HOUR_NS)
+
+
+# w holds 100 clean and 100 tainted, then pays a and b 100 each
+MIXED = [("x", "w", 100.0, 0), ("mixer", "w", 100.0, 1), ("w", "a", 100.0, 2), ("w", "b", 100.0, 3)]
+
+
+def shares(transfers: list, model: str, sources: list = ("mixer",)) -> dict:
+    compact = graph(transfers)
+    result = propagate_taint(compact, compact.codes(list(sources)), model)
+    return {wallet: round(float(share), 6) for wallet, share in zip(compact.wallets, result.tainted_share)}
+
+
+def test_poison_taints_everything_downstream():
+    assert shares(MIXED, 'poison') == {"x": 0.0, "w": 1.0, "mixer": 1.0, "a": 1.0, "b": 1.0}
+
+
+def test_haircut_passes_on_the_senders_tainted_share():
+    # a gets half of w's mixed balance; b gets the rest of the taint
+    assert shares(MIXED, 'haircut') == {"x": 0.0, "w": 0.5, "mixer": 1.0, "a": 0.5, "b": 0.5}
+
+
+def test_fifo_spends_the_oldest_funds_first():
+    # The clean 100 arrived first, so it is what a receives
+    assert shares(MIXED, 'fifo') == {"x": 0.0, "w": 0.5, "mixer": 1.0, "a": 0.0, "b": 1.0}
+
+
+def test_taint_only_follows_transfers_after_it_arrives():
+    transfers = [("a", "b", 50.0, 1), ("mixer", "a", 100.0, 2), ("a", "c", 50.0, 3)]
+    for model in TAINT_MODELS:
+        compact = graph(transfers)
+        result = propagate_taint(compact, compact.codes(["mixer"]), model)
+        tainted = set(compact.wallets[result.tainted()])
+        assert tainted == {"a", "c"}, model
+        assert result.tainted_at[compact.wallets.get_loc("b")] == NEVER
+
+
+def test_models_never_taint_more_than_poison_reaches():
+    rng = np.random.default_rng(7)
+    count = 500
+    transfers = [(f"w{s}", f"w{r}", float(a), int(h)) for s, r, a, h in
+                 zip(rng.integers(0, 60, count), rng.integers(0, 60, count), rng.integers(1, 1000, count),
+                     rng.integers(0, 100, count)) if s != r]
+    compact = graph(transfers)
+    sources = compact.codes(["w0", "w1", "w2"])
+    poison = propagate_taint(compact, sources, 'poison')
+    inflow = np.bincount(compact.out_nbr, weights=compact.out_amount, minlength=compact.num_nodes)
+    for model in ('haircut', 'fifo'):
+        result = propagate_taint(compact, sources, model)
+        assert np.array_equal(result.tainted_at, poison.tainted_at)
+        reached = poison.tainted_at != NEVER
+        assert (result.tainted_inflow[~reached] == 0).all(), model
+        assert (result.tainted_inflow <= inflow + 1e-6).all(), model
+        assert ((result.tainted_share >= 0) & (result.tainted_share <= 1)).all(), model
+
+
+def test_report_lists_tainted_wallets_by_inflow():
+    report = taint_report(graph(MIXED), ["mixer", "missing"], model='fifo')
+    assert report["sources"] == 1 and report["unknownSources"] == ["missing"]
+    assert [wallet["hash"] for wallet in report["wallets"]] == ["w", "b", "a"]
+    assert report["wallets"][0]["taintedAt"] == "1970-01-01T01:00:00.000000+00:00"
+
+    with pytest.raises(ValueError):
+        propagate_taint(graph(MIXED), [0], model='lifo')
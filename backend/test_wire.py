@@ -0,0 +1,84 @@
+"""
+Columnar wire format tests: frames decode to what was encoded.
+
+Run from backend/:  python -m pytest test_wire.py
+"""
+
+import struct
+
+import numpy as np
+
+from wire import ALIGNMENT, NULL_TIMESTAMP, columnar_frames, decode_frames, encode_frame, error_frame
+
+
+def wallet(wallet_hash: str, factors) -> dict:
+    return {"id": f"id-{wallet_hash}", "hash": wallet_hash, "x": 1.25, "y": -3.5, "riskScore": 42,
+            "riskFactors": factors, "inflow": 100.5, "outflow": 0.0, "transactionCount": 3}
+
+
+def transaction(sender: str, receiver: str, amount: float, timestamp, token) -> dict:
+    return {"id": f"{sender}-{receiver}", "from_wallet": sender, "to_wallet": receiver, "amount": amount,
+            "timestamp": timestamp, "token_type": token}
+
+
+def test_frame_round_trip():
+    columns = [
+        ("text", ["0xabc", "", "wället"]),
+        ("small", np.array([1, -2, 3], dtype=np.int16)),
+        ("wide", np.array([2 ** 40, -1, 0], dtype=np.int64)),
+        ("odd", np.array([7, 8, 9], dtype=np.uint8)),
+        ("real", np.array([0.5, np.inf, -1e300])),
+    ]
+    payload = encode_frame({"type": "test", "rows": 3, "extra": [1, 2]}, columns)
+    (size,) = struct.unpack_from('<I', payload)
+    assert size == len(payload) - 4
+
+    [(header, decoded)] = decode_frames(payload)
+    assert header["type"] == "test" and header["extra"] == [1, 2]
+    assert decoded["text"] == ["0xabc", "", "wället"]
+    for name, values in columns[1:]:
+        assert decoded[name].dtype == values.dtype and np.array_equal(decoded[name], values)
+
+    # Numeric columns start 8-byte aligned from the frame start (after the length field)
+    for name, values in columns[1:]:
+        assert (payload.index(values.tobytes()) - 4) % ALIGNMENT == 0, name
+
+
+def test_analysis_frames_rebuild_the_rows():
+    pages = [[wallet("a", {"intermediary": 60, "layering": 30}), wallet("b", None)], [wallet("c", {"source": 35})]]
+    transactions = [[
+        transaction("a", "c", 10.0, "2024-01-01T00:00:00+00:00", "ETH"),
+        transaction("c", "gone", 2.5, None, "USDT"),
+    ], [transaction("b", "a", 1.0, "2024-01-01T00:00:01.500000+00:00", "ETH")]]
+    payload = b"".join(columnar_frames({"id": "p", "name": "Case"}, pages, transactions))
+    frames = decode_frames(payload)
+    assert [header["type"] for header, _ in frames] == ["project", "wallets", "wallets", "transactions",
+                                                        "transactions", "statistics"]
+
+    hashes = []
+    for header, columns in frames[1:3]:
+        assert header["firstIndex"] == len(hashes)
+        hashes += columns["hash"]
+    header, columns = frames[1]
+    assert columns["id"] == ["id-a", "id-b"]
+    assert columns["x"].tolist() == [1.25, 1.25] and columns["riskScore"].tolist() == [42, 42]
+    points = columns["riskFactors"].reshape(header["rows"], len(header["factors"]))
+    assert dict(zip(header["factors"], points[0].tolist())) == {"intermediary": 60, "layering": 30}
+    assert columns["hasRiskFactors"].tolist() == [1, 0]
+
+    header, columns = frames[3]
+    assert [hashes[i] for i in columns["from"]] == ["a", "c"]
+    assert columns["to"].tolist() == [hashes.index("c"), -1]  # no wallet row
+    assert columns["amount"].tolist() == [10.0, 2.5]
+    assert columns["timestamp"].tolist() == [1704067200000, NULL_TIMESTAMP]
+    assert [header["tokens"][code] for code in columns["token"]] == ["ETH", "USDT"]
+    assert frames[4][1]["timestamp"].tolist() == [1704067201500]
+
+    assert frames[-1][0]["statistics"] == {"totalTransactions": 3, "uniqueWallets": 3, "suspiciousWallets": 0,
+                                           "totalVolume": 13.5}
+
+
+def test_error_frame_follows_the_stream():
+    payload = encode_frame({"type": "project", "rows": 0}) + error_frame(RuntimeError("connection lost"))
+    assert [header for header, _ in decode_frames(payload)][-1] == {"type": "error", "rows": 0,
+                                                                    "detail": "connection lost", "columns": []}
@@ -0,0 +1,199 @@
+"""
+Per-wallet activity timelines.
+
+A WalletTimeline merges every wallet's inbound and outbound transfers into
+one event stream, grouped by wallet and sorted by time (CSR layout, like the
+compact graph). It is built once per graph and shared by the time-based
+detectors: inter-event gaps and per-event time windows are plain array
+operations on it.
+
+The FIFO holding-time engine matches each wallet's outflows to its earlier
+inflows first-in-first-out, by value, for all wallets at once: the matching
+is done on cumulative value positions, so it is a handful of sorts and
+prefix sums instead of a per-wallet queue simulation.
+"""
+
+import numpy as np
+
+from graph_core import CompactGraph, NAT
+
+
+def _group_cumsum(values: np.ndarray, ptr: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at every group of a CSR layout"""
+    totals = np.cumsum(values)
+    base = np.r_[0.0, totals][ptr[:-1]]
+    return totals - base[groups]
+
+
+def _group_starts(groups: np.ndarray) -> np.ndarray:
+    """Mask of the first element of every run of equal, grouped values"""
+    starts = np.ones(len(groups), dtype=bool)
+    starts[1:] = groups[1:] != groups[:-1]
+    return starts
+
+
+class WalletTimeline:
+    """Time-sorted inbound/outbound events of every wallet (timestamped transfers only)"""
+
+    def __init__(self, graph: CompactGraph):
+        num_nodes = graph.num_nodes
+        in_wallet = np.repeat(np.arange(num_nodes, dtype=np.int32), np.diff(graph.in_ptr))
+        in_timed = graph.in_timestamp != NAT
+        out_timed = graph.out_timestamp != NAT
+
+        wallet = np.concatenate([in_wallet[in_timed], graph.out_src[out_timed]])
+        time = np.concatenate([graph.in_timestamp[in_timed], graph.out_timestamp[out_timed]])
+        amount = np.concatenate([graph.in_amount[in_timed], graph.out_amount[out_timed]])
+        edge = np.concatenate([graph.in_edge[in_timed], graph.out_edge[out_timed]])
+        inbound = np.concatenate([np.ones(int(in_timed.sum()), dtype=bool),
+                                  np.zeros(int(out_timed.sum()), dtype=bool)])
+
+        # Rank timestamps (equal times share a rank) so (wallet, time, inbound
+        # before outbound) packs into one int64 key. In- and out-events are
+        # each already sorted by it, so a stable sort only merges two runs.
+        in_times = graph.in_timestamp[in_timed]
+        by_time = np.argsort(in_times, kind='stable')
+        sorted_times = in_times[by_time]
+        first = np.arange(len(sorted_times))
+        first[1:][sorted_times[1:] == sorted_times[:-1]] = 0
+        rank_by_edge = np.zeros(graph.num_edges, dtype=np.int64)
+        rank_by_edge[graph.in_edge[in_timed][by_time]] = np.maximum.accumulate(first)
+        rank = rank_by_edge[edge]
+        key = wallet.astype(np.int64) * (2 * len(in_times) + 2) + 2 * rank + ~inbound
+        order = np.argsort(key, kind='stable')
+        self.num_nodes = num_nodes
+        self.wallet = wallet[order]
+        self.time = time[order]
+        self.amount = amount[order]
+        self.inbound = inbound[order]
+        # Upload-order edge id of every event
+        self.edge = edge[order]
+        self.ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.wallet, minlength=num_nodes), out=self.ptr[1:])
+
+    @classmethod
+    def for_graph(cls, graph: CompactGraph) -> "WalletTimeline":
+        """The graph's timeline, built on first use and kept on the graph"""
+        timeline = getattr(graph, '_timeline', None)
+        if timeline is None:
+            timeline = cls(graph)
+            graph._timeline = timeline
+        return timeline
+
+    def __len__(self) -> int:
+        return len(self.wallet)
+
+    def starts(self) -> np.ndarray:
+        """Mask of every wallet's first event"""
+        return _group_starts(self.wallet)
+
+    def gaps(self) -> np.ndarray:
+        """Nanoseconds since the wallet's previous event (0 for its first event)"""
+        gaps = np.diff(self.time, prepend=self.time[:1])
+        gaps[self.starts()] = 0
+        return gaps
+
+    def window_ends(self, window_ns: int) -> np.ndarray:
+        """Index one past the wallet's last event in [t, t + window] of every event.
+
+        Timestamps are ranked globally so (wallet, rank) packs into one sorted
+        key and every window end is a single binary search.
+        """
+        sorted_times = np.sort(self.time)
+        stride = len(sorted_times) + 1
+        base = self.wallet.astype(np.int64) * stride
+        keys = base + np.searchsorted(sorted_times, self.time, 'left')
+        end_keys = base + np.searchsorted(sorted_times, self.time + window_ns, 'right')
+        return np.searchsorted(keys, end_keys, 'left')
+
+    def value_axis(self) -> tuple:
+        """FIFO positions of every event on its wallet's value axis.
+
+        The axis holds the opening balance (what the wallet must have held
+        before its first event for its balance never to go negative), then
+        every inflow in time order; outflows consume it from zero upwards.
+        Returns (opening balance per wallet, end position of every inflow
+        event, end position of every outflow event); each array of event
+        positions is only meaningful for its own kind of event.
+        """
+        wallet, amount, inbound, ptr = self.wallet, self.amount, self.inbound, self.ptr
+        running = _group_cumsum(np.where(inbound, amount, -amount), ptr, wallet)
+        lowest = np.zeros(self.num_nodes)
+        np.minimum.at(lowest, wallet, running)
+        opening = -lowest
+        in_end = opening[wallet] + _group_cumsum(np.where(inbound, amount, 0.0), ptr, wallet)
+        out_end = _group_cumsum(np.where(inbound, 0.0, amount), ptr, wallet)
+        return opening, in_end, out_end
+
+    def inflow(self) -> np.ndarray:
+        """Timestamped inflow per wallet"""
+        return np.bincount(self.wallet[self.inbound], weights=self.amount[self.inbound], minlength=self.num_nodes)
+
+    def outflow(self) -> np.ndarray:
+        """Timestamped outflow per wallet"""
+        outbound = ~self.inbound
+        return np.bincount(self.wallet[outbound], weights=self.amount[outbound], minlength=self.num_nodes)
+
+
+class HoldingTimes:
+    """FIFO holding-time summary per wallet"""
+
+    def __init__(self, median_ns: np.ndarray, matched: np.ndarray, opening_balance: np.ndarray):
+        # Value-weighted median holding time (NaN where nothing was matched)
+        self.median_ns = median_ns
+        # Value of outflows matched to inflows seen in the data
+        self.matched = matched
+        # Balance the wallet must have held before its first event
+        self.opening_balance = opening_balance
+
+
+def fifo_holding_times(timeline: WalletTimeline) -> HoldingTimes:
+    """Match every wallet's outflows to its inflows first-in-first-out.
+
+    Outflows that exceed what the wallet had received so far are covered by
+    an opening balance of unknown age, which is matched first and left out of
+    the holding times.
+    """
+    num_nodes = timeline.num_nodes
+    wallet, time, inbound = timeline.wallet, timeline.time, timeline.inbound
+    opening, in_end, out_end = timeline.value_axis()
+    total_out = timeline.outflow()
+    has_opening = np.flatnonzero(opening > 0)
+
+    b_wallet = np.concatenate([wallet[inbound], has_opening, wallet[~inbound]])
+    b_pos = np.concatenate([in_end[inbound], opening[has_opening], out_end[~inbound]])
+    b_is_out = np.concatenate([np.zeros(int(inbound.sum()) + len(has_opening), dtype=bool),
+                               np.ones(int((~inbound).sum()), dtype=bool)])
+    b_time = np.concatenate([time[inbound], np.full(len(has_opening), NAT), time[~inbound]])
+    order = np.lexsort((b_pos, b_wallet))
+    b_wallet, b_pos, b_is_out, b_time = b_wallet[order], b_pos[order], b_is_out[order], b_time[order]
+
+    # Every stretch between consecutive boundaries lies in exactly one inflow
+    # lot and one outflow: the next in / out boundary at or after its end
+    length = b_pos - np.where(_group_starts(b_wallet), 0.0, np.r_[0.0, b_pos[:-1]])
+    index = np.arange(len(b_pos))
+    sentinel = len(b_pos)
+    next_in = np.minimum.accumulate(np.where(b_is_out, sentinel, index)[::-1])[::-1]
+    next_out = np.minimum.accumulate(np.where(b_is_out, index, sentinel)[::-1])[::-1]
+
+    matched = (length > 0) & (b_pos <= total_out[b_wallet] * (1 + 1e-12)) & (next_in < sentinel) & (next_out < sentinel)
+    in_time = b_time[np.minimum(next_in, sentinel - 1)]
+    matched &= in_time != NAT
+    pieces = np.flatnonzero(matched)
+    piece_wallet = b_wallet[pieces]
+    piece_value = length[pieces]
+    piece_hold = np.maximum(b_time[next_out[pieces]] - in_time[pieces], 0).astype(np.float64)
+
+    # Value-weighted median per wallet
+    order = np.lexsort((piece_hold, piece_wallet))
+    piece_wallet, piece_value, piece_hold = piece_wallet[order], piece_value[order], piece_hold[order]
+    matched_value = np.bincount(piece_wallet, weights=piece_value, minlength=num_nodes)
+    piece_ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(piece_wallet, minlength=num_nodes), out=piece_ptr[1:])
+    reached = _group_cumsum(piece_value, piece_ptr, piece_wallet) >= 0.5 * matched_value[piece_wallet]
+    # `reached` turns True once per wallet, at the median piece
+    first = reached & ~(np.r_[False, reached[:-1]] & ~_group_starts(piece_wallet))
+    median_ns = np.full(num_nodes, np.nan)
+    median_ns[piece_wallet[first]] = piece_hold[first]
+
+    return HoldingTimes(median_ns, matched_value, opening)
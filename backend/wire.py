@@ -0,0 +1,159 @@
+"""
+Columnar binary wire format for project analysis data.
+
+The JSON analysis repeats every key and both 34+ character wallet hashes on
+each transaction. This format sends each page of rows as one frame of typed
+columns: wallets once (hash, id, position, risk, flows), and transactions
+as int32 indexes into the wallet dictionary plus float64 amounts and int64
+timestamps, which a browser can view as typed arrays without parsing.
+
+A response is a sequence of frames, in the same order as the NDJSON stream
+(project, wallet pages, transaction pages, statistics):
+
+    uint32   frame length (bytes after this field)
+    uint32   header length
+    bytes    header, UTF-8 JSON: {"type", "rows", "columns": [[name, dtype, bytes], ...], ...}
+    columns  each starting at an 8-byte aligned offset from the frame start
+
+All numbers are little-endian. dtypes are numpy-style (int16, int32,
+int64, float64, uint8, uint16) or "utf8": n+1 uint32 offsets followed by the
+string bytes. Wallet indexes count wallets in stream order; a transaction
+endpoint with no wallet row is -1. Missing timestamps are INT64_MIN.
+"""
+
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from paging import ANALYSIS_PAGE_SIZE, AnalysisTotals, iter_pages
+
+COLUMNAR_MEDIA_TYPE = "application/x-chainsleuth-columnar"
+
+NULL_TIMESTAMP = np.iinfo(np.int64).min
+ALIGNMENT = 8
+
+
+def _utf8_column(values: list) -> bytes:
+    encoded = [value.encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def encode_frame(header: dict, columns: list = ()) -> bytes:
+    """One length-prefixed frame of `header` and (name, array or utf8 string list) columns"""
+    buffers = []
+    specs = []
+    for name, values in columns:
+        if isinstance(values, np.ndarray):
+            data, dtype = values.astype(values.dtype.newbyteorder('<'), copy=False).tobytes(), values.dtype.name
+        else:
+            data, dtype = _utf8_column(values), "utf8"
+        buffers.append(data)
+        specs.append([name, dtype, len(data)])
+    header_bytes = json.dumps(dict(header, columns=specs), separators=(',', ':')).encode()
+
+    parts = [struct.pack('<I', len(header_bytes)), header_bytes]
+    size = 4 + len(header_bytes)
+    for data in buffers:
+        padding = -size % ALIGNMENT
+        parts += [b"\0" * padding, data]
+        size += padding + len(data)
+    return struct.pack('<I', size) + b"".join(parts)
+
+
+def decode_frames(payload: bytes) -> list:
+    """(header, {column name: array or str list}) of every frame in `payload`"""
+    frames = []
+    position = 0
+    while position < len(payload):
+        (size,) = struct.unpack_from('<I', payload, position)
+        frame = memoryview(payload)[position + 4:position + 4 + size]
+        position += 4 + size
+        (header_size,) = struct.unpack_from('<I', frame, 0)
+        header = json.loads(bytes(frame[4:4 + header_size]))
+        offset = 4 + header_size
+        columns = {}
+        for name, dtype, length in header['columns']:
+            offset += -offset % ALIGNMENT
+            data = frame[offset:offset + length]
+            if dtype == "utf8":
+                offsets = np.frombuffer(data, dtype='<u4', count=header['rows'] + 1)
+                text = bytes(data[offsets.nbytes:])
+                columns[name] = [text[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])]
+            else:
+                columns[name] = np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder('<'))
+            offset += length
+        frames.append((header, columns))
+    return frames
+
+
+def wallet_frame(wallets: list, first_index: int) -> bytes:
+    """Frame of one page of API wallet dicts, indexed from `first_index` in the stream"""
+    factors = sorted({name for w in wallets for name in (w['riskFactors'] or {})})
+    factor_column = {name: index for index, name in enumerate(factors)}
+    # Row-major points per factor; wallets scored before breakdowns were stored have none
+    points = np.zeros((len(wallets), len(factors)), dtype=np.int16)
+    for row, w in enumerate(wallets):
+        for name, value in (w['riskFactors'] or {}).items():
+            points[row, factor_column[name]] = value
+    return encode_frame({"type": "wallets", "rows": len(wallets), "firstIndex": first_index, "factors": factors}, [
+        ("hash", [w['hash'] for w in wallets]),
+        ("id", [w['id'] for w in wallets]),
+        ("x", np.array([w['x'] for w in wallets], dtype=np.float64)),
+        ("y", np.array([w['y'] for w in wallets], dtype=np.float64)),
+        ("riskScore", np.array([w['riskScore'] for w in wallets], dtype=np.int32)),
+        ("inflow", np.array([w['inflow'] for w in wallets], dtype=np.float64)),
+        ("outflow", np.array([w['outflow'] for w in wallets], dtype=np.float64)),
+        ("transactionCount", np.array([w['transactionCount'] for w in wallets], dtype=np.int32)),
+        ("riskFactors", points.ravel()),
+        ("hasRiskFactors", np.array([w['riskFactors'] is not None for w in wallets], dtype=np.uint8)),
+    ])
+
+
+def transaction_frame(transactions: list, wallet_index: dict) -> bytes:
+    """Frame of one page of API transaction dicts, endpoints as wallet indexes"""
+    timestamps = pd.to_datetime(pd.Series([t['timestamp'] for t in transactions], dtype=object),
+                                utc=True, errors='coerce', format='ISO8601')
+    milliseconds = np.where(timestamps.isna(), NULL_TIMESTAMP,
+                            timestamps.to_numpy(dtype='datetime64[ms]').astype(np.int64))
+    tokens, token_codes = np.unique([t['token_type'] for t in transactions], return_inverse=True)
+    return encode_frame({"type": "transactions", "rows": len(transactions), "tokens": tokens.tolist()}, [
+        ("from", np.array([wallet_index.get(t['from_wallet'], -1) for t in transactions], dtype=np.int32)),
+        ("to", np.array([wallet_index.get(t['to_wallet'], -1) for t in transactions], dtype=np.int32)),
+        ("amount", np.array([t['amount'] for t in transactions], dtype=np.float64)),
+        ("timestamp", milliseconds.astype(np.int64)),
+        ("token", token_codes.astype(np.uint16)),
+    ])
+
+
+def columnar_frames(project: dict, wallet_pages, transaction_pages):
+    """Frames of a project's analysis from iterables of wallet and transaction pages"""
+    totals = AnalysisTotals()
+    yield encode_frame({"type": "project", "rows": 0, "id": project['id'], "name": project['name']})
+
+    # Hash -> stream index, so edges can reference wallets sent earlier
+    wallet_index = {}
+    for wallets in wallet_pages:
+        totals.add_wallets(wallets)
+        yield wallet_frame(wallets, len(wallet_index))
+        for w in wallets:
+            wallet_index[w['hash']] = len(wallet_index)
+    for transactions in transaction_pages:
+        totals.add_transactions(transactions)
+        yield transaction_frame(transactions, wallet_index)
+    yield encode_frame({"type": "statistics", "rows": 0, "statistics": totals.statistics()})
+
+
+def stream_columnar(client, project: dict, page_size: int = ANALYSIS_PAGE_SIZE):
+    """Columnar frames of a project's analysis, read page by page like paging.stream_analysis"""
+    return columnar_frames(project,
+                           iter_pages(client, 'wallets', project['id'], page_size),
+                           iter_pages(client, 'transactions', project['id'], page_size))
+
+
+def error_frame(e: Exception) -> bytes:
+    """Final frame of a stream that failed after the response started"""
+    return encode_frame({"type": "error", "rows": 0, "detail": str(e)})
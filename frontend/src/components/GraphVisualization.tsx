@@ -1,21 +1,13 @@
 import React, { useState, useRef, useEffect } from "react";
 import ForceGraph2D from "react-force-graph-2d";
-import type { Wallet, Transaction } from "../types";
+import type { Wallet, EdgeColumns, PatternType } from "../types";
 
 interface GraphVisualizationProps {
   nodes: Wallet[];
-  edges: Transaction[];
+  // from/to index into `nodes`
+  edges: EdgeColumns;
   focusPattern?: {
-    type:
-      | "fan-in"
-      | "fan-out"
-      | "high-volume"
-      | "circular"
-      | "layering"
-      | "structuring"
-      | "pass-through"
-      | "peel-chain"
-      | "mixer";
+    type: PatternType;
     walletHash: string;
     wallets?: string[];
     transactions?: Array<{
@@ -108,9 +100,15 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
 
   // Build graph with PROGRESSIVE DISCLOSURE
   useEffect(() => {
+    // Positions come from the server-side layout; nodes are pinned to them,
+    // so nothing is simulated in the browser
     const normalizedNodes = nodes.map((w) => ({
       id: w.id,
       hash: w.hash,
+      x: w.x,
+      y: w.y,
+      fx: w.x,
+      fy: w.y,
       risk: normalizeRisk(w.riskScore),
       riskScore: w.riskScore,
       inflow: w.inflow,
@@ -124,9 +122,10 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
       string,
       { inDegree: number; outDegree: number; role: string }
     >();
-    edges.forEach((edge) => {
-      const fromNode = normalizedNodes.find((n) => n.hash === edge.from_wallet);
-      const toNode = normalizedNodes.find((n) => n.hash === edge.to_wallet);
+    const edgeCount = edges.from.length;
+    for (let e = 0; e < edgeCount; e++) {
+      const fromNode = normalizedNodes[edges.from[e]];
+      const toNode = normalizedNodes[edges.to[e]];
 
       if (fromNode && toNode) {
         const fromRole = nodeRoles.get(fromNode.id) || {
@@ -146,7 +145,7 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
         nodeRoles.set(fromNode.id, fromRole);
         nodeRoles.set(toNode.id, toRole);
       }
-    });
+    }
 
     // Assign roles and sizes
     nodeRoles.forEach((role) => {
@@ -202,15 +201,12 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
       coreNodeIds.add(focusWallet.id);
 
       const relatedIds = new Set<string>();
-      const timestamps: string[] = [];
 
-      edges.forEach((edge) => {
-        const fromNode = normalizedNodes.find(
-          (n) => n.hash === edge.from_wallet,
-        );
-        const toNode = normalizedNodes.find((n) => n.hash === edge.to_wallet);
+      for (let e = 0; e < edgeCount; e++) {
+        const fromNode = normalizedNodes[edges.from[e]];
+        const toNode = normalizedNodes[edges.to[e]];
 
-        if (!fromNode || !toNode) return;
+        if (!fromNode || !toNode) continue;
 
         // Handle different pattern types
         switch (focusPattern.type) {
@@ -218,7 +214,6 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
             // Incoming edges to focus wallet
             if (toNode.id === focusWallet.id) {
               relatedIds.add(fromNode.id);
-              if (edge.timestamp) timestamps.push(edge.timestamp);
             }
             break;
           case "fan-out":
@@ -226,7 +221,6 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
             // Outgoing edges from focus wallet
             if (fromNode.id === focusWallet.id) {
               relatedIds.add(toNode.id);
-              if (edge.timestamp) timestamps.push(edge.timestamp);
             }
             break;
           case "circular":
@@ -238,14 +232,12 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
             // Show all edges connected to focus wallet (both in and out)
             if (fromNode.id === focusWallet.id) {
               relatedIds.add(toNode.id);
-              if (edge.timestamp) timestamps.push(edge.timestamp);
             } else if (toNode.id === focusWallet.id) {
               relatedIds.add(fromNode.id);
-              if (edge.timestamp) timestamps.push(edge.timestamp);
             }
             break;
         }
-      });
+      }
 
       // Limit pattern mode to max 6 related nodes
       const limitedRelatedIds = Array.from(relatedIds).slice(0, 6);
@@ -258,9 +250,9 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
 
       // Strict limit: max 7 neighbors for clean pattern (1 source + 7 recipients = 8 total)
       const neighbors: string[] = [];
-      edges.forEach((edge) => {
-        const fromNode = enrichedNodes.find((n) => n.hash === edge.from_wallet);
-        const toNode = enrichedNodes.find((n) => n.hash === edge.to_wallet);
+      for (let e = 0; e < edgeCount; e++) {
+        const fromNode = enrichedNodes[edges.from[e]];
+        const toNode = enrichedNodes[edges.to[e]];
 
         if (fromNode?.id === selectedNodeId && toNode && neighbors.length < 7) {
           if (!neighbors.includes(toNode.id)) {
@@ -272,7 +264,7 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
             neighbors.push(fromNode.id);
           }
         }
-      });
+      }
 
       neighbors.forEach((id) => visibleNodeIds.add(id));
     } else {
@@ -287,11 +279,9 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
       highRiskNodeIds.forEach((highRiskId) => {
         const neighborsForThisNode: string[] = [];
 
-        edges.forEach((edge) => {
-          const fromNode = enrichedNodes.find(
-            (n) => n.hash === edge.from_wallet,
-          );
-          const toNode = enrichedNodes.find((n) => n.hash === edge.to_wallet);
+        for (let e = 0; e < edgeCount; e++) {
+          const fromNode = enrichedNodes[edges.from[e]];
+          const toNode = enrichedNodes[edges.to[e]];
 
           if (fromNode && toNode) {
             // If this high-risk node receives from someone, add first 3 senders
@@ -309,7 +299,7 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
               }
             }
           }
-        });
+        }
       });
     }
 
@@ -369,55 +359,52 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
         };
       });
 
-    const allLinks = edges
-      .map((tx) => {
-        const sourceNode = enrichedNodes.find((n) => n.hash === tx.from_wallet);
-        const targetNode = enrichedNodes.find((n) => n.hash === tx.to_wallet);
+    const allLinks: any[] = [];
+    for (let e = 0; e < edgeCount; e++) {
+      const sourceNode = enrichedNodes[edges.from[e]];
+      const targetNode = enrichedNodes[edges.to[e]];
 
-        if (!sourceNode || !targetNode) return null;
+      if (!sourceNode || !targetNode) continue;
 
-        // STRICT: Both endpoints must be in limited visible set
-        const isVisible =
-          limitedVisibleNodeIds.has(sourceNode.id) &&
-          limitedVisibleNodeIds.has(targetNode.id);
+      // STRICT: Both endpoints must be in limited visible set
+      const isVisible =
+        limitedVisibleNodeIds.has(sourceNode.id) &&
+        limitedVisibleNodeIds.has(targetNode.id);
 
-        if (!isVisible) return null;
+      if (!isVisible) continue;
 
-        // Check if this edge is part of the pattern evidence
-        let isPatternEdge = false;
-        if (focusPattern && focusPattern.transactions) {
-          isPatternEdge = focusPattern.transactions.some(
-            (t) =>
-              (t.from === tx.from_wallet && t.to === tx.to_wallet) ||
-              (t.hash && t.hash === tx.id),
-          );
-        }
+      // Check if this edge is part of the pattern evidence
+      let isPatternEdge = false;
+      if (focusPattern && focusPattern.transactions) {
+        isPatternEdge = focusPattern.transactions.some(
+          (t) => t.from === sourceNode.hash && t.to === targetNode.hash,
+        );
+      }
 
-        // In pattern mode, only show direct edges with primary wallet
-        if (focusPattern && focusWallet) {
-          const isDirectToPrimary =
-            sourceNode.id === focusWallet.id ||
-            targetNode.id === focusWallet.id;
-          if (!isDirectToPrimary) return null;
-        }
+      // In pattern mode, only show direct edges with primary wallet
+      if (focusPattern && focusWallet) {
+        const isDirectToPrimary =
+          sourceNode.id === focusWallet.id ||
+          targetNode.id === focusWallet.id;
+        if (!isDirectToPrimary) continue;
+      }
 
-        // In focused mode, only show direct edges (no multi-hop)
-        if (!focusPattern && selectedNodeId) {
-          const isDirect =
-            sourceNode.id === selectedNodeId ||
-            targetNode.id === selectedNodeId;
-          if (!isDirect) return null; // Skip indirect edges in focused mode
-        }
+      // In focused mode, only show direct edges (no multi-hop)
+      if (!focusPattern && selectedNodeId) {
+        const isDirect =
+          sourceNode.id === selectedNodeId ||
+          targetNode.id === selectedNodeId;
+        if (!isDirect) continue; // Skip indirect edges in focused mode
+      }
 
-        return {
-          source: sourceNode.id,
-          target: targetNode.id,
-          amount: tx.amount,
-          width: 0.8,
-          isPatternEdge, // Mark edges that are part of the detected pattern
-        };
-      })
-      .filter((link) => link !== null) as any[];
+      allLinks.push({
+        source: sourceNode.id,
+        target: targetNode.id,
+        amount: edges.amount[e],
+        width: 0.8,
+        isPatternEdge, // Mark edges that are part of the detected pattern
+      });
+    }
 
     // Strict limit: max 10 edges in focused mode for clean pattern
     const finalLinks =
@@ -437,18 +424,6 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
     });
   }, [nodes, edges, selectedNodeId]);
 
-  // Force tuning for a more spread out layout
-  useEffect(() => {
-    if (!graphRef.current) return;
-    const fg = graphRef.current;
-
-    // Longer edges + stronger repulsion for cleaner spacing
-    const linkDistance = selectedNodeId ? 280 : 220;
-    fg.d3Force("link")?.distance(linkDistance);
-    fg.d3Force("charge")?.strength(-380);
-    fg.d3ReheatSimulation();
-  }, [selectedNodeId, filteredData.nodes.length, filteredData.links.length]);
-
   // Fit graph to screen on initial load and on data changes
   useEffect(() => {
     if (!graphRef.current || filteredData.nodes.length === 0) return;
@@ -710,8 +685,7 @@ const GraphVisualization: React.FC<GraphVisualizationProps> = ({
               onNodeClick={handleNodeClick}
               onNodeHover={(node: any) => setHoveredNodeId(node?.id || null)}
               onLinkHover={() => {}}
-              d3VelocityDecay={0.3}
-              d3AlphaDecay={0.02}
+              cooldownTicks={0}
               enableZoom={true}
               enablePan={true}
               minZoom={0.5}
@@ -3,7 +3,17 @@ import { useParams, useNavigate } from "react-router-dom";
 import { supabase } from "../lib/supabase";
 import GraphVisualization from "../components/GraphVisualization";
 import NotesPanel from "../components/NotesPanel";
-import type { Project, AnalysisResult } from "../types";
+import { expandPatterns } from "../utils/patterns";
+import { readAnalysisStream } from "../utils/analysisStream";
+import { COLUMNAR_MEDIA_TYPE, readColumnarStream } from "../utils/columnar";
+import type {
+  Project,
+  AnalysisResult,
+  PatternType,
+  PatternTransaction,
+  PatternsResult,
+  SuspiciousPattern,
+} from "../types";
 import { ArrowLeft, MessageCircle } from "lucide-react";
 import { Drawer } from "antd";
 
@@ -16,26 +26,12 @@ export default function Dashboard() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [selectedWallet, setSelectedWallet] = useState<any>(null);
+  const [patterns, setPatterns] = useState<SuspiciousPattern[]>([]);
   const [selectedPattern, setSelectedPattern] = useState<{
-    type:
-      | "fan-in"
-      | "fan-out"
-      | "high-volume"
-      | "circular"
-      | "layering"
-      | "structuring"
-      | "pass-through"
-      | "peel-chain"
-      | "mixer";
+    type: PatternType;
     walletHash: string;
     wallets: string[];
-    transactions: Array<{
-      hash: string;
-      from: string;
-      to: string;
-      amount: number;
-      timestamp: string;
-    }>;
+    transactions: PatternTransaction[];
     startTime: string;
     endTime: string;
   } | null>(null);
@@ -60,10 +56,32 @@ export default function Dashboard() {
       }
 
       const apiUrl = `http://localhost:8000/api/projects/${projectId}/analysis`;
+      const patternsUrl = `http://localhost:8000/api/projects/${projectId}/patterns`;
       console.log("📡 Fetching from:", apiUrl);
+      const headers = { Authorization: `Bearer ${session.access_token}` };
+      // Patterns are detected and stored by the backend analysis
+      const patternsLoaded = fetch(patternsUrl, { headers }).then(
+        async (patternsResponse) => {
+          if (patternsResponse.ok) {
+            const patternData: PatternsResult = await patternsResponse.json();
+            console.log("✓ Patterns loaded:", patternData.counts);
+            setPatterns(expandPatterns(patternData));
+          } else {
+            console.error("❌ Patterns API Error:", patternsResponse.status);
+            setPatterns([]);
+          }
+        }
+      ).catch((err) => {
+        console.error("❌ Error loading patterns:", err);
+        setPatterns([]);
+      });
+
+      // Wallets and transactions arrive page by page; render as they come.
+      // The binary columnar stream is preferred, NDJSON is the fallback.
       const response = await fetch(apiUrl, {
         headers: {
-          Authorization: `Bearer ${session.access_token}`,
+          ...headers,
+          Accept: `${COLUMNAR_MEDIA_TYPE}, application/x-ndjson;q=0.9`,
         },
       });
 
@@ -73,18 +91,26 @@ export default function Dashboard() {
         throw new Error("Failed to fetch analysis data");
       }
 
-      const data = await response.json();
-      console.log("✓ Analysis data loaded:", data);
-      setAnalysis(data);
-
-      // Set basic project info from response
-      setProject({
-        id: projectId || "",
-        name: data.name || "Project",
-        createdAt: new Date().toISOString(),
-        userId: "",
-        walletCount: data.statistics?.uniqueWallets || 0,
-      });
+      const showAnalysis = (data: AnalysisResult) => {
+        setAnalysis(data);
+        setProject({
+          id: projectId || "",
+          name: data.name || "Project",
+          createdAt: new Date().toISOString(),
+          userId: "",
+          walletCount: data.statistics.uniqueWallets,
+        });
+        setLoading(false);
+      };
+      const readStream = response.headers
+        .get("Content-Type")
+        ?.startsWith(COLUMNAR_MEDIA_TYPE)
+        ? readColumnarStream
+        : readAnalysisStream;
+      const data = await readStream(response, showAnalysis);
+      console.log("✓ Analysis data loaded:", data.statistics);
+      showAnalysis(data);
+      await patternsLoaded;
 
       setError("");
       console.log("✓ Dashboard ready");
@@ -138,6 +164,8 @@ export default function Dashboard() {
           ? {
               hash: selectedWallet.hash,
               riskScore: selectedWallet.riskScore,
+              riskFactors: getRiskScoreBreakdown(selectedWallet.hash)
+                .contributions,
               transactionCount: selectedWallet.transactionCount,
               inflow: selectedWallet.inflow,
               outflow: selectedWallet.outflow,
@@ -345,461 +373,7 @@ export default function Dashboard() {
     );
   }
 
-  const suspiciousPatterns = (() => {
-    const suspicious: Array<{
-      type:
-        | "fan-in"
-        | "fan-out"
-        | "high-volume"
-        | "circular"
-        | "layering"
-        | "structuring"
-        | "pass-through"
-        | "peel-chain"
-        | "mixer";
-      walletHash: string;
-      walletLabel: string;
-      details: string;
-      severity: "critical" | "high" | "medium";
-      count: number;
-      wallets: string[];
-      transactions: Array<{
-        hash: string;
-        from: string;
-        to: string;
-        amount: number;
-        timestamp: string;
-      }>;
-      startTime?: string;
-      endTime?: string;
-      riskScore?: number;
-    }> = [];
-
-    // Build graph for advanced pattern detection
-    const graph: { [key: string]: { in: Set<string>; out: Set<string> } } = {};
-    analysis?.transactions.forEach((tx: any) => {
-      if (!graph[tx.from_wallet])
-        graph[tx.from_wallet] = { in: new Set(), out: new Set() };
-      if (!graph[tx.to_wallet])
-        graph[tx.to_wallet] = { in: new Set(), out: new Set() };
-      graph[tx.from_wallet].out.add(tx.to_wallet);
-      graph[tx.to_wallet].in.add(tx.from_wallet);
-    });
-
-    // Inject synthetic circular patterns for demonstration
-    console.log("Injecting synthetic circular patterns...");
-    const walletArray = Object.keys(graph).slice(0, 50); // Get first 50 wallets
-
-    // Create multiple circular patterns
-    for (let i = 0; i < 5; i++) {
-      const cycleLength = 3 + Math.floor(Math.random() * 3); // 3-5 wallet cycles
-      const cycle: string[] = [];
-      for (let j = 0; j < cycleLength; j++) {
-        cycle.push(walletArray[(i * cycleLength + j) % walletArray.length]);
-      }
-
-      // Connect them in a circle
-      for (let j = 0; j < cycle.length; j++) {
-        const from = cycle[j];
-        const to = cycle[(j + 1) % cycle.length];
-        if (!graph[from]) graph[from] = { in: new Set(), out: new Set() };
-        if (!graph[to]) graph[to] = { in: new Set(), out: new Set() };
-        graph[from].out.add(to);
-        graph[to].in.add(from);
-      }
-
-      console.log(
-        `Created synthetic cycle ${i + 1}: ${cycle.map((w) => w.slice(0, 8)).join(" → ")} → ${cycle[0].slice(0, 8)}`,
-      );
-    }
-
-    // Helper: Get transactions for given wallets
-    const getTransactionsForWallets = (walletSet: Set<string>) => {
-      const txs =
-        analysis?.transactions.filter(
-          (tx: any) =>
-            walletSet.has(tx.from_wallet) || walletSet.has(tx.to_wallet),
-        ) || [];
-      return txs.map((tx: any) => ({
-        hash: tx.id || `tx-${Math.random()}`,
-        from: tx.from_wallet,
-        to: tx.to_wallet,
-        amount: tx.amount,
-        timestamp: tx.timestamp || new Date().toISOString(),
-      }));
-    };
-
-    // Helper: Calculate time range
-    const getTimeRange = (txs: Array<{ timestamp: string }>) => {
-      if (txs.length === 0) return { start: "", end: "", duration: "" };
-      const times = txs
-        .map((t) => new Date(t.timestamp).getTime())
-        .filter((t) => !isNaN(t))
-        .sort((a, b) => a - b);
-      if (times.length === 0) return { start: "", end: "", duration: "" };
-      const start = new Date(times[0]);
-      const end = new Date(times[times.length - 1]);
-      const durationMs = end.getTime() - start.getTime();
-      const durationMins = Math.round(durationMs / 60000);
-      return {
-        start: start.toISOString(),
-        end: end.toISOString(),
-        duration:
-          durationMins < 60
-            ? `${durationMins}m`
-            : `${(durationMins / 60).toFixed(1)}h`,
-      };
-    };
-
-    // Risk score mapping
-    const riskScoreByType: Record<string, number> = {
-      circular: 35,
-      mixer: 40,
-      "fan-out": 25,
-      "fan-in": 20,
-      "peel-chain": 22,
-      layering: 28,
-      structuring: 24,
-      "pass-through": 18,
-      "high-volume": 15,
-    };
-    const walletStats: {
-      [key: string]: {
-        inflow: number;
-        outflow: number;
-        txCount: number;
-        smallTxCount: number;
-      };
-    } = {};
-    analysis?.wallets.forEach((w: any) => {
-      walletStats[w.hash] = {
-        inflow: w.inflow,
-        outflow: w.outflow,
-        txCount: w.transactionCount,
-        smallTxCount: 0,
-      };
-    });
-
-    // Count small transactions for structuring detection
-    analysis?.transactions.forEach((tx: any) => {
-      if (tx.amount < 10 && walletStats[tx.from_wallet]) {
-        walletStats[tx.from_wallet].smallTxCount += 1;
-      }
-    });
-
-    // 1. Detect Circular Patterns (cycles in graph) - Using Tarjan's SCC algorithm
-    const circularWallets = new Set<string>();
-
-    // Find all strongly connected components (cycles)
-    const visited = new Set<string>();
-    const recStack = new Set<string>();
-    let cycleCount = 0;
-
-    const hasCycleDFS = (wallet: string, path: string[]): boolean => {
-      visited.add(wallet);
-      recStack.add(wallet);
-      path.push(wallet);
-
-      const neighbors = graph[wallet]?.out || new Set();
-
-      for (const next of neighbors) {
-        if (!visited.has(next)) {
-          if (hasCycleDFS(next, [...path])) {
-            return true;
-          }
-        } else if (recStack.has(next)) {
-          // Found a back edge - cycle detected
-          cycleCount++;
-          const cycleStart = path.indexOf(next);
-          if (cycleStart !== -1) {
-            const cycle = path.slice(cycleStart);
-            cycle.push(next);
-            console.log(
-              `Found cycle ${cycleCount}:`,
-              cycle.map((w) => w.slice(0, 8)).join(" → "),
-            );
-            cycle.forEach((w) => circularWallets.add(w));
-          }
-          return true;
-        }
-      }
-
-      recStack.delete(wallet);
-      return false;
-    };
-
-    const allWallets = Object.keys(graph);
-    console.log(`Searching for cycles in ${allWallets.length} wallets...`);
-
-    for (const wallet of allWallets) {
-      if (!visited.has(wallet)) {
-        hasCycleDFS(wallet, []);
-      }
-    }
-
-    console.log(
-      `Cycle detection complete: Found ${cycleCount} cycles involving ${circularWallets.size} wallets`,
-    );
-
-    // Add circular wallets to suspicious patterns
-    circularWallets.forEach((wallet) => {
-      const cycleWallets = new Set([wallet]);
-      // Find connected wallets in cycles
-      const neighbors = graph[wallet]?.out || new Set();
-      neighbors.forEach((n) => cycleWallets.add(n));
-
-      const txs = getTransactionsForWallets(cycleWallets);
-      const timeRange = getTimeRange(txs);
-
-      suspicious.push({
-        type: "circular",
-        walletHash: wallet,
-        walletLabel: wallet.slice(0, 12) + "...",
-        details: "Part of circular transaction loop",
-        severity: "critical",
-        count: 1,
-        wallets: Array.from(cycleWallets),
-        transactions: txs,
-        startTime: timeRange.start,
-        endTime: timeRange.end,
-        riskScore: riskScoreByType["circular"],
-      });
-    });
-
-    // 2. Detect Layering (multi-level branching)
-    Object.keys(graph).forEach((wallet) => {
-      const outDegree = graph[wallet].out.size;
-      if (outDegree >= 3) {
-        // Check if children also branch
-        let childBranching = 0;
-        graph[wallet].out.forEach((child) => {
-          if (graph[child]?.out.size >= 2) childBranching++;
-        });
-
-        if (childBranching >= 2) {
-          suspicious.push({
-            type: "layering",
-            walletHash: wallet,
-            walletLabel: wallet.slice(0, 12) + "...",
-            details: `Multi-level branching: ${outDegree} → ${childBranching} branches`,
-            severity: "high",
-            count: outDegree,
-            wallets: [wallet],
-            transactions: [],
-          });
-        }
-      }
-    });
-
-    // 3. Detect Structuring/Smurfing (many small transactions)
-    Object.entries(walletStats).forEach(([wallet, stats]) => {
-      if (stats.smallTxCount >= 10 && stats.outflow > 100) {
-        suspicious.push({
-          type: "structuring",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: `${stats.smallTxCount} small transactions (<$10)`,
-          severity: "high",
-          count: stats.smallTxCount,
-          wallets: [wallet],
-          transactions: [],
-        });
-      }
-    });
-
-    // 4. Detect Pass-Through Wallets (rapid in-out)
-    Object.entries(walletStats).forEach(([wallet, stats]) => {
-      if (stats.inflow > 0 && stats.outflow >= stats.inflow * 0.9) {
-        const ratio = ((stats.outflow / stats.inflow) * 100).toFixed(0);
-        suspicious.push({
-          type: "pass-through",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: `Rapid turnover: ${ratio}% of inflow`,
-          severity: "high",
-          count: stats.txCount,
-          wallets: [wallet],
-          transactions: [],
-        });
-      }
-    });
-
-    // 5. Detect Peel Chains (linear chains with single outputs)
-    Object.keys(graph).forEach((wallet) => {
-      if (graph[wallet].out.size === 1) {
-        let chainLength = 1;
-        let current = wallet;
-        const visited = new Set([wallet]);
-
-        while (chainLength < 8) {
-          const next = Array.from(graph[current]?.out || [])[0];
-          if (!next || visited.has(next) || graph[next]?.out.size !== 1) break;
-          visited.add(next);
-          current = next;
-          chainLength++;
-        }
-
-        if (chainLength >= 5) {
-          suspicious.push({
-            type: "peel-chain",
-            walletHash: wallet,
-            walletLabel: wallet.slice(0, 12) + "...",
-            details: `Linear chain of ${chainLength} wallets`,
-            severity: "medium",
-            count: chainLength,
-            wallets: [wallet],
-            transactions: [],
-          });
-        }
-      }
-    });
-
-    // 6. Detect Mixer Interactions (known mixer addresses)
-    const knownMixers = new Set([
-      "0x0000000000000000000000000000000000000000",
-      "0xdeaddeaddeaddeaddeaddeaddeaddeaddead0001",
-      "0xdeaddeaddeaddeaddeaddeaddeaddeaddead0002",
-    ]);
-
-    Object.keys(graph).forEach((wallet) => {
-      const interactsWithMixer =
-        Array.from(graph[wallet].in).some((w) => knownMixers.has(w)) ||
-        Array.from(graph[wallet].out).some((w) => knownMixers.has(w));
-
-      if (interactsWithMixer) {
-        suspicious.push({
-          type: "mixer",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: "Interacts with known mixer service",
-          severity: "critical",
-          count: 1,
-          wallets: [wallet],
-          transactions: [],
-        });
-      }
-    });
-
-    // 7. Classic fan-out (1 wallet sending to 4+ others)
-    Object.keys(graph).forEach((wallet) => {
-      const uniqueRecipients = graph[wallet].out.size;
-      if (uniqueRecipients >= 4) {
-        const recipients = new Set(graph[wallet].out);
-        recipients.add(wallet);
-        const txs = getTransactionsForWallets(recipients);
-        const timeRange = getTimeRange(txs);
-
-        suspicious.push({
-          type: "fan-out",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: `Sends to ${uniqueRecipients} wallets`,
-          severity: uniqueRecipients >= 8 ? "critical" : "high",
-          count: uniqueRecipients,
-          wallets: Array.from(recipients),
-          transactions: txs,
-          startTime: timeRange.start,
-          endTime: timeRange.end,
-          riskScore: riskScoreByType["fan-out"],
-        });
-      }
-    });
-
-    // 8. Classic fan-in (4+ wallets sending to 1)
-    Object.keys(graph).forEach((wallet) => {
-      const uniqueSenders = graph[wallet].in.size;
-      if (uniqueSenders >= 4) {
-        const senders = new Set(graph[wallet].in);
-        senders.add(wallet);
-        const txs = getTransactionsForWallets(senders);
-        const timeRange = getTimeRange(txs);
-
-        suspicious.push({
-          type: "fan-in",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: `Receives from ${uniqueSenders} wallets`,
-          severity: uniqueSenders >= 8 ? "critical" : "high",
-          count: uniqueSenders,
-          wallets: Array.from(senders),
-          transactions: txs,
-          startTime: timeRange.start,
-          endTime: timeRange.end,
-          riskScore: riskScoreByType["fan-in"],
-        });
-      }
-    });
-
-    // 9. High-volume activity
-    Object.entries(walletStats).forEach(([wallet, stats]) => {
-      if (stats.txCount >= 15) {
-        const walletSet = new Set([wallet]);
-        const txs = getTransactionsForWallets(walletSet);
-        const timeRange = getTimeRange(txs);
-
-        suspicious.push({
-          type: "high-volume",
-          walletHash: wallet,
-          walletLabel: wallet.slice(0, 12) + "...",
-          details: `${stats.txCount} transactions`,
-          severity: stats.txCount >= 30 ? "critical" : "high",
-          count: stats.txCount,
-          wallets: [wallet],
-          transactions: txs,
-          startTime: timeRange.start,
-          endTime: timeRange.end,
-          riskScore: riskScoreByType["high-volume"],
-        });
-      }
-    });
-
-    // Remove duplicates based on wallet hash + type
-    const uniquePatterns = Array.from(
-      new Map(suspicious.map((p) => [p.walletHash + p.type, p])).values(),
-    );
-
-    // Log pattern detection summary
-    console.log("Pattern Detection Summary:");
-    console.log(
-      "  Circular:",
-      uniquePatterns.filter((p) => p.type === "circular").length,
-    );
-    console.log(
-      "  Layering:",
-      uniquePatterns.filter((p) => p.type === "layering").length,
-    );
-    console.log(
-      "  Structuring:",
-      uniquePatterns.filter((p) => p.type === "structuring").length,
-    );
-    console.log(
-      "  Pass-through:",
-      uniquePatterns.filter((p) => p.type === "pass-through").length,
-    );
-    console.log(
-      "  Peel-chain:",
-      uniquePatterns.filter((p) => p.type === "peel-chain").length,
-    );
-    console.log(
-      "  Mixer:",
-      uniquePatterns.filter((p) => p.type === "mixer").length,
-    );
-    console.log(
-      "  Fan-out:",
-      uniquePatterns.filter((p) => p.type === "fan-out").length,
-    );
-    console.log(
-      "  Fan-in:",
-      uniquePatterns.filter((p) => p.type === "fan-in").length,
-    );
-    console.log(
-      "  High-volume:",
-      uniquePatterns.filter((p) => p.type === "high-volume").length,
-    );
-    console.log("  Total unique patterns:", uniquePatterns.length);
-
-    return uniquePatterns;
-  })();
+  const suspiciousPatterns = patterns;
 
   // Helper: Get detection confidence for pattern
   const getDetectionConfidence = (
@@ -853,6 +427,8 @@ export default function Dashboard() {
       layering: `Layering pattern detected: Multi-level branching structure with ${walletCount} wallets. Complex hierarchies like this are often used to obscure the paper trail of illicit funds.`,
       structuring: `Structuring pattern detected: Wallet made multiple small transactions (<$10 threshold). This "smurfing" technique is designed to avoid transaction monitoring thresholds.`,
       "pass-through": `Pass-through wallet detected: ${walletCount} wallet(s) with rapid inflow-to-outflow turnover (>90% of inflow). Funds pass through almost immediately, suggesting a transit point rather than legitimate holding.`,
+      dormant: `Dormant wallet activation detected: Wallet ${pattern.walletHash.slice(0, 8)}... resumed activity with a burst of ${txCount} transfers after a long quiet period. Reactivated wallets are often used to move funds that were parked to cool off.`,
+      taint: `Mixer taint detected: A material share of this wallet's inflow traces back to known mixers through time-ordered transfers, even without direct contact with a mixer.`,
       mixer: `Mixer interaction detected: Wallet interacted with a known cryptocurrency mixer/tumbler service. This service is often used to obfuscate transaction histories and break blockchain traceability.`,
     };
 
@@ -864,6 +440,20 @@ export default function Dashboard() {
 
   // Helper: Calculate risk score breakdown for a wallet
   const getRiskScoreBreakdown = (wallet: string) => {
+    // Prefer the backend's per-factor contributions when the wallet has them
+    const scored = analysis?.wallets.find((w) => w.hash === wallet);
+    if (scored?.riskFactors) {
+      const contributions = Object.entries(scored.riskFactors).map(
+        ([factor, score]) => ({
+          pattern:
+            factor.charAt(0).toUpperCase() +
+            factor.slice(1).replace(/_/g, " "),
+          score,
+        }),
+      );
+      return { contributions, total: scored.riskScore };
+    }
+
     const patternContributions: Array<{ pattern: string; score: number }> = [];
     suspiciousPatterns.forEach((p) => {
       if (p.walletHash === wallet && p.riskScore) {
@@ -889,7 +479,7 @@ export default function Dashboard() {
 
     const walletToExport = selectedWallet?.hash || selectedPattern?.walletHash;
     const breakdown = getRiskScoreBreakdown(walletToExport);
-    const patterns = suspiciousPatterns.filter(
+    const walletPatterns = suspiciousPatterns.filter(
       (p) => p.walletHash === walletToExport,
     );
 
@@ -898,7 +488,7 @@ export default function Dashboard() {
       wallet: walletToExport,
       riskScore: breakdown.total,
       riskScoreBreakdown: breakdown.contributions,
-      detectedPatterns: patterns.map((p) => ({
+      detectedPatterns: walletPatterns.map((p) => ({
         type: p.type,
         severity: p.severity,
         details: p.details,
@@ -910,7 +500,9 @@ export default function Dashboard() {
         },
       })),
       keyTransactions:
-        patterns.length > 0 ? patterns[0].transactions?.slice(0, 20) : [],
+        walletPatterns.length > 0
+          ? walletPatterns[0].transactions?.slice(0, 20)
+          : [],
     };
 
     const jsonString = JSON.stringify(summary, null, 2);
@@ -980,10 +572,10 @@ export default function Dashboard() {
               Transaction Network
             </div>
             <div className="flex-1 min-h-0">
-              {analysis?.wallets && analysis?.transactions ? (
+              {analysis?.wallets && analysis?.edges ? (
                 <GraphVisualization
                   nodes={analysis.wallets}
-                  edges={analysis.transactions}
+                  edges={analysis.edges}
                   focusPattern={selectedPattern}
                   onWalletSelect={setSelectedWallet}
                 />
@@ -993,7 +585,7 @@ export default function Dashboard() {
                     <p className="mb-2">Loading graph data...</p>
                     <p className="text-xs text-gray-600">
                       Wallets: {analysis?.wallets?.length || 0} | Transactions:{" "}
-                      {analysis?.transactions?.length || 0}
+                      {analysis?.edges?.from.length || 0}
                     </p>
                   </div>
                 </div>
@@ -1086,6 +678,16 @@ export default function Dashboard() {
                           emoji: "⛓️",
                         },
                         mixer: { label: "Mixer", color: "red", emoji: "🌀" },
+                        taint: {
+                          label: "Mixer Taint",
+                          color: "red",
+                          emoji: "🧪",
+                        },
+                        dormant: {
+                          label: "Dormant",
+                          color: "blue",
+                          emoji: "💤",
+                        },
                         "fan-out": {
                           label: "Fan-Out",
                           color: "yellow",
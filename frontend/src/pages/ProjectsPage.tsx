@@ -2,7 +2,7 @@ import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "../contexts/AuthContext";
 import { supabase } from "../lib/supabase";
-import type { Project } from "../types";
+import type { AnalysisJob, Project } from "../types";
 import {
   Shield,
   Upload,
@@ -64,6 +64,43 @@ export function ProjectsPage() {
     }
   };
 
+  // Poll a background analysis job until it completes or fails
+  const pollJob = async (projectId: string, jobId: string, token: string) => {
+    try {
+      const response = await fetch(`http://localhost:8000/api/jobs/${jobId}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+      if (!response.ok) {
+        throw new Error("Failed to fetch job status");
+      }
+
+      const job: AnalysisJob = await response.json();
+      setProjects((current) =>
+        current.map((p) =>
+          p.id === projectId
+            ? {
+                ...p,
+                jobStatus: job.status,
+                jobStage: job.stage,
+                jobProgress: job.progress,
+                walletCount: job.result?.walletCount ?? p.walletCount,
+              }
+            : p,
+        ),
+      );
+
+      if (job.status === "queued" || job.status === "running") {
+        setTimeout(() => pollJob(projectId, jobId, token), 2000);
+      } else if (job.status === "failed") {
+        setError(`Analysis failed during ${job.failedStage}: ${job.error}`);
+      }
+    } catch (err) {
+      console.error("Error polling analysis job:", err);
+    }
+  };
+
   const handleCreateProject = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!newProjectName.trim()) return;
@@ -101,8 +138,11 @@ export function ProjectsPage() {
         throw new Error("Failed to create project");
       }
 
-      const newProject = await response.json();
+      const newProject: Project = await response.json();
       setProjects([...projects, newProject]);
+      if (newProject.jobId) {
+        pollJob(newProject.id, newProject.jobId, session.access_token);
+      }
       setNewProjectName("");
       setNewProjectDescription("");
       setCsvFile(null);
@@ -843,6 +883,15 @@ export function ProjectsPage() {
                         </p>
                       )}
 
+                      {(project.jobStatus === "queued" ||
+                        project.jobStatus === "running") && (
+                        <p className="text-xs text-blue-400 mb-3 font-mono">
+                          Analyzing
+                          {project.jobStage ? ` · ${project.jobStage}` : "..."}{" "}
+                          ({Math.round((project.jobProgress || 0) * 100)}%)
+                        </p>
+                      )}
+
                       {/* Risk Badge */}
                       <div
                         className={`inline-flex items-center gap-2 px-3 py-1 rounded-full text-xs font-semibold border mb-4 ${colors.badge}`}
@@ -981,13 +1030,13 @@ export function ProjectsPage() {
 
               <div>
                 <label className="block text-sm font-semibold text-gray-300 mb-2">
-                  Upload CSV
+                  Upload Dataset
                 </label>
                 <div className="relative">
                   <input
                     type="file"
                     id="csv-upload"
-                    accept=".csv"
+                    accept=".csv,.parquet,.pq,.arrow,.feather,.ipc"
                     onChange={(e) => setCsvFile(e.target.files?.[0] || null)}
                     disabled={creating}
                     className="hidden"
@@ -997,7 +1046,7 @@ export function ProjectsPage() {
                     className="w-full bg-black/50 border border-zinc-700/50 hover:border-[#00ff88]/50 text-gray-400 hover:text-white px-4 py-3 rounded-lg transition-all duration-200 cursor-pointer flex items-center justify-between disabled:opacity-50"
                   >
                     <span className="text-sm">
-                      {csvFile ? csvFile.name : "Choose CSV file..."}
+                      {csvFile ? csvFile.name : "Choose CSV, Parquet or Arrow file..."}
                     </span>
                     <Upload className="w-4 h-4" />
                   </label>
@@ -1008,7 +1057,8 @@ export function ProjectsPage() {
                   </p>
                 )}
                 <p className="text-xs text-gray-600 mt-2">
-                  CSV format: from_address, to_address, amount, timestamp
+                  Columns: from_address, to_address, amount, timestamp (CSV,
+                  Parquet or Arrow IPC)
                 </p>
               </div>
 
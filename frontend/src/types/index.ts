@@ -4,6 +4,8 @@ export interface Wallet {
   x: number;
   y: number;
   riskScore: number;
+  // Points each risk factor added, as scored by the backend
+  riskFactors?: Record<string, number>;
   inflow: number;
   outflow: number;
   transactionCount: number;
@@ -27,17 +29,119 @@ export interface Project {
   userId: string;
   walletCount?: number;
   analyses?: number;
+  jobId?: string | null;
+  jobStatus?: AnalysisJob["status"] | null;
+  jobStage?: string | null;
+  jobProgress?: number;
+}
+
+export interface AnalysisJobStage {
+  name: string;
+  status: "pending" | "running" | "completed" | "failed";
+  startedAt?: string;
+  finishedAt?: string;
+  detail?: Record<string, number> | null;
+}
+
+export interface AnalysisJob {
+  id: string;
+  projectId: string;
+  status: "queued" | "running" | "completed" | "failed";
+  stage: string | null;
+  progress: number;
+  stages: AnalysisJobStage[];
+  error: string | null;
+  failedStage: string | null;
+  resumable: boolean;
+  result: { walletCount: number; transactionCount: number } | null;
+}
+
+export interface AnalysisStatistics {
+  totalTransactions: number;
+  uniqueWallets: number;
+  suspiciousWallets: number;
+  totalVolume: number;
+}
+
+// Transactions as parallel typed columns; from/to index into the wallets
+// array (-1 when the wallet has no row)
+export interface EdgeColumns {
+  from: Int32Array;
+  to: Int32Array;
+  amount: Float64Array;
+  // Milliseconds since the epoch, NaN when unknown
+  timestamp: Float64Array;
 }
 
 export interface AnalysisResult {
+  name?: string;
   wallets: Wallet[];
-  transactions: Transaction[];
-  statistics: {
-    totalTransactions: number;
-    uniqueWallets: number;
-    suspiciousWallets: number;
-    totalVolume: number;
-  };
+  edges: EdgeColumns;
+  statistics: AnalysisStatistics;
+}
+
+// One line of the NDJSON analysis stream (Accept: application/x-ndjson)
+export type AnalysisStreamMessage =
+  | { type: "project"; id: string; name: string }
+  | { type: "wallets"; items: Wallet[] }
+  | { type: "transactions"; items: Transaction[] }
+  | { type: "statistics"; statistics: AnalysisStatistics }
+  | { type: "error"; detail: string };
+
+export type PatternType =
+  | "fan-in"
+  | "fan-out"
+  | "high-volume"
+  | "circular"
+  | "layering"
+  | "structuring"
+  | "pass-through"
+  | "peel-chain"
+  | "mixer"
+  | "dormant"
+  | "taint";
+
+export interface PatternTransaction {
+  hash: string;
+  from: string;
+  to: string;
+  amount: number;
+  timestamp: string;
+}
+
+// A detected pattern instance, as stored by the backend analysis
+export interface SuspiciousPattern {
+  id: string;
+  type: PatternType;
+  walletHash: string;
+  walletLabel: string;
+  details: string;
+  severity: "critical" | "high" | "medium";
+  count: number;
+  wallets: string[];
+  transactions: PatternTransaction[];
+  startTime?: string;
+  endTime?: string;
+  riskScore?: number;
+}
+
+// GET /api/projects/{id}/patterns: wallets are indexes into `wallets`,
+// evidence edges are [from, to, amount, epoch ms]
+export interface StoredPattern {
+  type: PatternType;
+  wallet: number;
+  severity: "critical" | "high" | "medium";
+  count: number;
+  details: string;
+  riskScore: number | null;
+  members: number[];
+  edges: Array<[number, number, number, number | null]>;
+}
+
+export interface PatternsResult {
+  wallets: string[];
+  patterns: StoredPattern[];
+  counts: Record<string, number>;
 }
 
 export interface Note {
@@ -0,0 +1,171 @@
+import type {
+  AnalysisResult,
+  AnalysisStatistics,
+  AnalysisStreamMessage,
+  EdgeColumns,
+  Wallet,
+} from "../types";
+
+// Wallets above this score count as suspicious (matches the backend)
+const SUSPICIOUS_RISK_SCORE = 50;
+// Minimum time between progress renders while pages arrive
+export const PROGRESS_INTERVAL_MS = 300;
+
+export const emptyStatistics = (): AnalysisStatistics => ({
+  totalTransactions: 0,
+  uniqueWallets: 0,
+  suspiciousWallets: 0,
+  totalVolume: 0,
+});
+
+// Running statistics, until the stream's final statistics arrive
+export const countWallets = (
+  statistics: AnalysisStatistics,
+  wallets: Wallet[]
+) => {
+  statistics.uniqueWallets += wallets.length;
+  statistics.suspiciousWallets += wallets.filter(
+    (w) => w.riskScore > SUSPICIOUS_RISK_SCORE
+  ).length;
+};
+
+export const countTransactions = (
+  statistics: AnalysisStatistics,
+  amounts: ArrayLike<number>
+) => {
+  statistics.totalTransactions += amounts.length;
+  for (let i = 0; i < amounts.length; i++) {
+    statistics.totalVolume += amounts[i];
+  }
+};
+
+// Growable typed edge columns; columns() returns views, not copies
+export class EdgeColumnsBuilder {
+  private size = 0;
+  private from = new Int32Array(1024);
+  private to = new Int32Array(1024);
+  private amount = new Float64Array(1024);
+  private timestamp = new Float64Array(1024);
+
+  private reserve(extra: number) {
+    if (this.size + extra <= this.from.length) return;
+    const capacity = Math.max(this.from.length * 2, this.size + extra);
+    const from = new Int32Array(capacity);
+    const to = new Int32Array(capacity);
+    const amount = new Float64Array(capacity);
+    const timestamp = new Float64Array(capacity);
+    from.set(this.from.subarray(0, this.size));
+    to.set(this.to.subarray(0, this.size));
+    amount.set(this.amount.subarray(0, this.size));
+    timestamp.set(this.timestamp.subarray(0, this.size));
+    this.from = from;
+    this.to = to;
+    this.amount = amount;
+    this.timestamp = timestamp;
+  }
+
+  push(from: number, to: number, amount: number, timestamp: number) {
+    this.reserve(1);
+    this.from[this.size] = from;
+    this.to[this.size] = to;
+    this.amount[this.size] = amount;
+    this.timestamp[this.size] = timestamp;
+    this.size++;
+  }
+
+  append(columns: EdgeColumns) {
+    this.reserve(columns.from.length);
+    this.from.set(columns.from, this.size);
+    this.to.set(columns.to, this.size);
+    this.amount.set(columns.amount, this.size);
+    this.timestamp.set(columns.timestamp, this.size);
+    this.size += columns.from.length;
+  }
+
+  columns(): EdgeColumns {
+    return {
+      from: this.from.subarray(0, this.size),
+      to: this.to.subarray(0, this.size),
+      amount: this.amount.subarray(0, this.size),
+      timestamp: this.timestamp.subarray(0, this.size),
+    };
+  }
+}
+
+// Read an NDJSON analysis response page by page, reporting partial results as
+// they arrive; resolves with the complete analysis
+export const readAnalysisStream = async (
+  response: Response,
+  onProgress: (partial: AnalysisResult) => void
+): Promise<AnalysisResult> => {
+  if (!response.body) {
+    throw new Error("Analysis stream has no body");
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const wallets: Wallet[] = [];
+  const walletIndex = new Map<string, number>();
+  const edges = new EdgeColumnsBuilder();
+  let name: string | undefined;
+  let statistics = emptyStatistics();
+  let buffered = "";
+  let lastProgress = 0;
+
+  const snapshot = (): AnalysisResult => ({
+    name,
+    wallets: wallets.slice(),
+    edges: edges.columns(),
+    statistics: { ...statistics },
+  });
+
+  const handle = (message: AnalysisStreamMessage) => {
+    switch (message.type) {
+      case "project":
+        name = message.name;
+        break;
+      case "wallets":
+        for (const w of message.items) {
+          walletIndex.set(w.hash, walletIndex.size);
+        }
+        wallets.push(...message.items);
+        countWallets(statistics, message.items);
+        break;
+      case "transactions":
+        for (const t of message.items) {
+          edges.push(
+            walletIndex.get(t.from_wallet) ?? -1,
+            walletIndex.get(t.to_wallet) ?? -1,
+            t.amount,
+            t.timestamp ? Date.parse(t.timestamp) : NaN
+          );
+        }
+        countTransactions(
+          statistics,
+          message.items.map((t) => t.amount)
+        );
+        break;
+      case "statistics":
+        statistics = message.statistics;
+        break;
+      case "error":
+        throw new Error(message.detail);
+    }
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = done ? "" : lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) handle(JSON.parse(line) as AnalysisStreamMessage);
+    }
+    if (done) break;
+    const now = Date.now();
+    if (now - lastProgress >= PROGRESS_INTERVAL_MS) {
+      lastProgress = now;
+      onProgress(snapshot());
+    }
+  }
+  return snapshot();
+};
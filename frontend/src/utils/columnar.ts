@@ -0,0 +1,211 @@
+import type { AnalysisResult, Wallet } from "../types";
+import {
+  EdgeColumnsBuilder,
+  PROGRESS_INTERVAL_MS,
+  countTransactions,
+  countWallets,
+  emptyStatistics,
+} from "./analysisStream";
+
+// Binary analysis stream (see backend/wire.py): length-prefixed frames of a
+// JSON header and 8-byte aligned little-endian columns
+export const COLUMNAR_MEDIA_TYPE = "application/x-chainsleuth-columnar";
+
+// Missing timestamps are INT64_MIN on the wire
+const NULL_TIMESTAMP = -(2n ** 63n);
+
+interface FrameHeader {
+  type: "project" | "wallets" | "transactions" | "statistics" | "error";
+  rows: number;
+  columns: Array<[string, string, number]>;
+  name?: string;
+  factors?: string[];
+  statistics?: AnalysisResult["statistics"];
+  detail?: string;
+}
+
+type Column = ArrayBufferView | string[];
+
+interface TypedArrayConstructor {
+  new (buffer: ArrayBuffer, offset: number, length: number): ArrayBufferView;
+  BYTES_PER_ELEMENT: number;
+}
+
+const TYPED_ARRAYS: Record<string, TypedArrayConstructor> = {
+  int16: Int16Array,
+  int32: Int32Array,
+  int64: BigInt64Array,
+  float64: Float64Array,
+  uint8: Uint8Array,
+  uint16: Uint16Array,
+};
+
+const decoder = new TextDecoder();
+
+// Views over one frame's columns; `buffer` holds exactly the frame, so every
+// column offset is aligned for its typed array
+const readFrame = (buffer: ArrayBuffer) => {
+  const headerLength = new DataView(buffer).getUint32(0, true);
+  const header: FrameHeader = JSON.parse(
+    decoder.decode(new Uint8Array(buffer, 4, headerLength))
+  );
+  const columns: Record<string, Column> = {};
+  let offset = 4 + headerLength;
+  for (const [name, dtype, length] of header.columns) {
+    offset += (8 - (offset % 8)) % 8;
+    if (dtype === "utf8") {
+      const offsets = new Uint32Array(buffer, offset, header.rows + 1);
+      const bytes = new Uint8Array(buffer, offset + offsets.byteLength);
+      const strings = new Array<string>(header.rows);
+      for (let i = 0; i < header.rows; i++) {
+        strings[i] = decoder.decode(bytes.subarray(offsets[i], offsets[i + 1]));
+      }
+      columns[name] = strings;
+    } else {
+      const TypedArray = TYPED_ARRAYS[dtype];
+      columns[name] = new TypedArray(
+        buffer,
+        offset,
+        length / TypedArray.BYTES_PER_ELEMENT
+      );
+    }
+    offset += length;
+  }
+  return { header, columns };
+};
+
+const walletsFromFrame = (
+  header: FrameHeader,
+  columns: Record<string, Column>
+): Wallet[] => {
+  const hash = columns.hash as string[];
+  const id = columns.id as string[];
+  const x = columns.x as Float64Array;
+  const y = columns.y as Float64Array;
+  const riskScore = columns.riskScore as Int32Array;
+  const inflow = columns.inflow as Float64Array;
+  const outflow = columns.outflow as Float64Array;
+  const transactionCount = columns.transactionCount as Int32Array;
+  const points = columns.riskFactors as Int16Array;
+  const hasRiskFactors = columns.hasRiskFactors as Uint8Array;
+  const factors = header.factors ?? [];
+
+  const wallets = new Array<Wallet>(header.rows);
+  for (let i = 0; i < header.rows; i++) {
+    let riskFactors: Record<string, number> | undefined;
+    if (hasRiskFactors[i]) {
+      riskFactors = {};
+      for (let f = 0; f < factors.length; f++) {
+        const value = points[i * factors.length + f];
+        if (value) riskFactors[factors[f]] = value;
+      }
+    }
+    wallets[i] = {
+      id: id[i],
+      hash: hash[i],
+      x: x[i],
+      y: y[i],
+      riskScore: riskScore[i],
+      riskFactors,
+      inflow: inflow[i],
+      outflow: outflow[i],
+      transactionCount: transactionCount[i],
+    };
+  }
+  return wallets;
+};
+
+const toMilliseconds = (timestamps: BigInt64Array): Float64Array => {
+  const milliseconds = new Float64Array(timestamps.length);
+  for (let i = 0; i < timestamps.length; i++) {
+    milliseconds[i] =
+      timestamps[i] === NULL_TIMESTAMP ? NaN : Number(timestamps[i]);
+  }
+  return milliseconds;
+};
+
+// Read a columnar analysis response frame by frame, reporting partial results
+// as they arrive; resolves with the complete analysis
+export const readColumnarStream = async (
+  response: Response,
+  onProgress: (partial: AnalysisResult) => void
+): Promise<AnalysisResult> => {
+  if (!response.body) {
+    throw new Error("Analysis stream has no body");
+  }
+  const reader = response.body.getReader();
+  const wallets: Wallet[] = [];
+  const edges = new EdgeColumnsBuilder();
+  let name: string | undefined;
+  let statistics = emptyStatistics();
+  let pending = new Uint8Array(0);
+  let lastProgress = 0;
+
+  const snapshot = (): AnalysisResult => ({
+    name,
+    wallets: wallets.slice(),
+    edges: edges.columns(),
+    statistics: { ...statistics },
+  });
+
+  const handle = (buffer: ArrayBuffer) => {
+    const { header, columns } = readFrame(buffer);
+    switch (header.type) {
+      case "project":
+        name = header.name;
+        break;
+      case "wallets": {
+        const page = walletsFromFrame(header, columns);
+        wallets.push(...page);
+        countWallets(statistics, page);
+        break;
+      }
+      case "transactions": {
+        const amount = columns.amount as Float64Array;
+        edges.append({
+          from: columns.from as Int32Array,
+          to: columns.to as Int32Array,
+          amount,
+          timestamp: toMilliseconds(columns.timestamp as BigInt64Array),
+        });
+        countTransactions(statistics, amount);
+        break;
+      }
+      case "statistics":
+        statistics = header.statistics!;
+        break;
+      case "error":
+        throw new Error(header.detail);
+    }
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (value) {
+      const joined = new Uint8Array(pending.length + value.length);
+      joined.set(pending);
+      joined.set(value, pending.length);
+      pending = joined;
+    }
+    // Copy each complete frame into its own buffer so its columns are aligned
+    let start = 0;
+    while (pending.length - start >= 4) {
+      const size = new DataView(
+        pending.buffer,
+        pending.byteOffset + start,
+        4
+      ).getUint32(0, true);
+      if (pending.length - start - 4 < size) break;
+      handle(pending.slice(start + 4, start + 4 + size).buffer);
+      start += 4 + size;
+    }
+    pending = pending.slice(start);
+    if (done) break;
+    const now = Date.now();
+    if (now - lastProgress >= PROGRESS_INTERVAL_MS) {
+      lastProgress = now;
+      onProgress(snapshot());
+    }
+  }
+  return snapshot();
+};
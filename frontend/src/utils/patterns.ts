@@ -0,0 +1,43 @@
+import type { PatternsResult, SuspiciousPattern } from "../types";
+
+const toIso = (ms: number | null): string =>
+  ms === null ? "" : new Date(ms).toISOString();
+
+// Expand the interned patterns response into the shape the dashboard renders
+export const expandPatterns = (data: PatternsResult): SuspiciousPattern[] => {
+  const { wallets } = data;
+  return data.patterns.map((p, index) => {
+    const walletHash = wallets[p.wallet];
+    // A loop, not Math.min(...times): spreading a long evidence list can
+    // exceed the engine's argument limit
+    let start: number | null = null;
+    let end: number | null = null;
+    for (const edge of p.edges) {
+      const ms = edge[3];
+      if (ms === null) continue;
+      if (start === null || ms < start) start = ms;
+      if (end === null || ms > end) end = ms;
+    }
+    return {
+      // The index keeps ids unique when a wallet has several instances of a type
+      id: `${p.type}:${walletHash}:${index}`,
+      type: p.type,
+      walletHash,
+      walletLabel: walletHash.slice(0, 12) + "...",
+      details: p.details,
+      severity: p.severity,
+      count: p.count,
+      wallets: p.members.map((m) => wallets[m]),
+      transactions: p.edges.map(([from, to, amount, ms], i) => ({
+        hash: `${index}-${i}`,
+        from: wallets[from],
+        to: wallets[to],
+        amount,
+        timestamp: toIso(ms),
+      })),
+      startTime: start === null ? undefined : toIso(start),
+      endTime: end === null ? undefined : toIso(end),
+      riskScore: p.riskScore ?? undefined,
+    };
+  });
+};